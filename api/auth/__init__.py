@@ -1,6 +1,7 @@
 from flask_jwt_extended import JWTManager
 
-from api.models.user import User
+from api.auth.blacklist import blacklist
+from api.auth.identity import identity_cache
 
 
 jwt = JWTManager()
@@ -8,14 +9,19 @@ jwt = JWTManager()
 
 @jwt.user_loader_callback_loader
 def user_loader(identity):
-    return User.find_by_username(username=identity)
+    return identity_cache.get(identity)
 
 
 @jwt.user_claims_loader
 def add_claims_to_access_token(identity):
-    user = User.find_by_username(username=identity)
+    user = identity_cache.get(identity)
 
     if user and user.is_admin:
         return {"is_admin": True}
     else:
         return {"is_admin": False}
+
+
+@jwt.token_in_blacklist_loader
+def check_if_token_in_blacklist(decrypted_token):
+    return blacklist.is_revoked(decrypted_token["jti"])
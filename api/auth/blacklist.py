@@ -1 +1,186 @@
-BLACKLIST = set()
+import mmap
+import os
+import struct
+import threading
+from time import monotonic, time
+from typing import List, Tuple
+
+from api.auth.bloom import BloomFilter
+from api.auth.resp import RespClient
+from api.utils.processes import SQLiteConnections
+
+
+class SQLiteRevocationStore:
+    """Revoked token ids in a SQLite file shared by all workers on the host.
+
+    The latest revocation sequence number is mirrored into a small memory
+    mapped file, so a worker notices new revocations without running a query.
+    """
+
+    sync_interval = 0  # reading the generation is a memory read
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connections = SQLiteConnections(path)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS revoked_tokens ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "jti TEXT NOT NULL UNIQUE, expires_at INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at "
+            "ON revoked_tokens (expires_at)"
+        )
+        with open(path + ".gen", "a+b") as f:
+            if os.fstat(f.fileno()).st_size < 8:
+                f.write(b"\0" * 8)
+                f.flush()
+            self._generation = mmap.mmap(f.fileno(), 8)
+
+    def _connection(self):
+        return self._connections.get()
+
+    def revoke(self, jti: str, expires_at: int) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (int(time()),))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                (jti, expires_at),
+            )
+            if cursor.rowcount:
+                struct.pack_into("<q", self._generation, 0, cursor.lastrowid)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def contains(self, jti: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM revoked_tokens WHERE jti = ? AND expires_at > ?",
+            (jti, int(time())),
+        ).fetchone()
+        return row is not None
+
+    def generation(self) -> int:
+        return struct.unpack_from("<q", self._generation, 0)[0]
+
+    def changes_since(self, seq: int) -> Tuple[int, List[str]]:
+        rows = self._connection().execute(
+            "SELECT seq, jti FROM revoked_tokens WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+        return (rows[-1][0] if rows else seq), [jti for _, jti in rows]
+
+
+class RedisRevocationStore:
+    """Revoked token ids in Redis (or anything speaking its protocol), shared across hosts.
+
+    Every revocation is keyed with a TTL up to the token's `exp` and logged in
+    a sorted set scored by a sequence number that workers poll for changes.
+    """
+
+    def __init__(self, url: str, sync_interval: float, prefix: str = "revoked", log_size: int = 100000):
+        self.client = RespClient(url)
+        self.sync_interval = sync_interval
+        self.prefix = prefix
+        self.log_size = log_size
+
+    def revoke(self, jti: str, expires_at: int) -> None:
+        ttl = max(1, expires_at - int(time()))
+        seq = self.client.execute("INCR", f"{self.prefix}:seq")
+        self.client.execute("SET", f"{self.prefix}:jti:{jti}", 1, "EX", ttl)
+        self.client.execute("ZADD", f"{self.prefix}:log", seq, jti)
+        self.client.execute(
+            "ZREMRANGEBYSCORE", f"{self.prefix}:log", "-inf", seq - self.log_size
+        )
+
+    def contains(self, jti: str) -> bool:
+        return self.client.execute("EXISTS", f"{self.prefix}:jti:{jti}") == 1
+
+    def generation(self) -> int:
+        return int(self.client.execute("GET", f"{self.prefix}:seq") or 0)
+
+    def changes_since(self, seq: int) -> Tuple[int, List[str]]:
+        reply = self.client.execute(
+            "ZRANGEBYSCORE", f"{self.prefix}:log", f"({seq}", "+inf", "WITHSCORES"
+        )
+        jtis = [member.decode() for member in reply[0::2]]
+        scores = [int(float(score)) for score in reply[1::2]]
+        return (scores[-1] if scores else seq), jtis
+
+
+class TokenBlacklist:
+    """Revoked JWT ids, checked on every authenticated request.
+
+    A per-worker bloom filter of all revoked ids answers the common "not
+    revoked" case in memory. Only ids it might contain are confirmed against
+    the store. The filter follows other workers' revocations through the
+    store's sequence number and is rebuilt periodically so expired ids drop out.
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        self._bloom = None
+        self._seq = 0
+        self._next_sync = 0.0
+        self._rebuild_at = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        backend = app.config["JWT_REVOCATION_BACKEND"]
+        if backend == "sqlite":
+            self.store = SQLiteRevocationStore(app.config["JWT_REVOCATION_SQLITE_PATH"])
+        elif backend == "redis":
+            self.store = RedisRevocationStore(
+                app.config["JWT_REVOCATION_REDIS_URL"],
+                app.config["JWT_REVOCATION_SYNC_INTERVAL"],
+            )
+        else:
+            raise ValueError(f"Unknown JWT_REVOCATION_BACKEND {backend!r}")
+        self.capacity = app.config["JWT_REVOCATION_BLOOM_CAPACITY"]
+        self.rebuild_interval = app.config["JWT_REVOCATION_REBUILD_INTERVAL"]
+        self.default_ttl = app.config["JWT_REVOCATION_DEFAULT_TTL"]
+        self._bloom = None
+        app.extensions["token_blacklist"] = self
+
+    def revoke(self, jti: str, expires_at: int = None) -> None:
+        if expires_at is None:
+            expires_at = int(time()) + self.default_ttl
+        self.store.revoke(jti, expires_at)
+        self._sync()
+        self._bloom.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        self._sync()
+        if not self._bloom.might_contain(jti):
+            return False
+        return self.store.contains(jti)
+
+    def _sync(self) -> None:
+        now = monotonic()
+        if self._bloom is not None and not self._bloom.is_full and now < self._rebuild_at:
+            if now < self._next_sync:
+                return
+            if self.store.generation() == self._seq:
+                self._next_sync = now + self.store.sync_interval
+                return
+        with self._lock:
+            if self._bloom is None or self._bloom.is_full or now >= self._rebuild_at:
+                self._seq, jtis = self.store.changes_since(0)
+                bloom = BloomFilter(max(self.capacity, 2 * len(jtis)))
+                for jti in jtis:
+                    bloom.add(jti)
+                self._bloom = bloom
+                self._rebuild_at = now + self.rebuild_interval
+            elif self.store.generation() != self._seq:
+                self._seq, jtis = self.store.changes_since(self._seq)
+                for jti in jtis:
+                    self._bloom.add(jti)
+            self._next_sync = now + self.store.sync_interval
+
+
+blacklist = TokenBlacklist()
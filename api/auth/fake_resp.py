@@ -0,0 +1,181 @@
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class FakeRespServer:
+    """Local stand-in for Redis, speaking the protocol RespClient uses.
+
+    Implements the commands the revocation store needs, with key expiry, so
+    the redis backend can be exercised end to end by pointing
+    JWT_REVOCATION_REDIS_URL at `server.url`. Data lives in memory only.
+    `clock` is what expiry is measured against, tests may replace it.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.clock = time.time
+        self.commands: List[str] = []  # names of the commands received, in order
+        self._values: Dict[bytes, bytes] = {}
+        self._expires: Dict[bytes, float] = {}
+        self._zsets: Dict[bytes, Dict[bytes, float]] = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    command = _read_command(self.rfile)
+                    if command is None:
+                        return
+                    self.wfile.write(server._execute(command))
+
+        self._tcp = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._tcp.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._tcp.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "FakeRespServer":
+        self._thread = threading.Thread(target=self._tcp.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._tcp.shutdown()
+        self._tcp.server_close()
+
+    def serve_forever(self) -> None:
+        self._tcp.serve_forever()
+
+    def __enter__(self) -> "FakeRespServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _execute(self, command: List[bytes]) -> bytes:
+        name, args = command[0].decode().upper(), command[1:]
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            return _error(f"ERR unknown command '{name}'")
+        with self._lock:
+            self.commands.append(name)
+            self._expire(self.clock())
+            try:
+                return handler(*args)
+            except (TypeError, ValueError):
+                return _error(f"ERR wrong arguments for '{name}'")
+
+    def _expire(self, now: float) -> None:
+        for key in [k for k, at in self._expires.items() if at <= now]:
+            del self._expires[key]
+            self._values.pop(key, None)
+
+    def _cmd_ping(self) -> bytes:
+        return b"+PONG\r\n"
+
+    def _cmd_auth(self, password) -> bytes:
+        return b"+OK\r\n"
+
+    def _cmd_select(self, db) -> bytes:
+        return b"+OK\r\n"
+
+    def _cmd_get(self, key) -> bytes:
+        return _bulk(self._values.get(key))
+
+    def _cmd_set(self, key, value, *options) -> bytes:
+        self._values[key] = value
+        self._expires.pop(key, None)
+        if options:
+            if len(options) != 2 or options[0].upper() != b"EX":
+                raise ValueError(options)
+            self._expires[key] = self.clock() + int(options[1])
+        return b"+OK\r\n"
+
+    def _cmd_incr(self, key) -> bytes:
+        value = int(self._values.get(key, b"0")) + 1
+        self._values[key] = str(value).encode()
+        return _integer(value)
+
+    def _cmd_exists(self, *keys) -> bytes:
+        return _integer(sum(key in self._values or key in self._zsets for key in keys))
+
+    def _cmd_ttl(self, key) -> bytes:
+        if key not in self._values:
+            return _integer(-2)
+        if key not in self._expires:
+            return _integer(-1)
+        return _integer(int(self._expires[key] - self.clock()))
+
+    def _cmd_zadd(self, key, score, member) -> bytes:
+        members = self._zsets.setdefault(key, {})
+        added = member not in members
+        members[member] = float(score)
+        return _integer(int(added))
+
+    def _cmd_zrangebyscore(self, key, low, high, *options) -> bytes:
+        scores = options and options[0].upper() == b"WITHSCORES"
+        reply = []
+        for member, score in self._range(key, low, high):
+            reply.append(member)
+            if scores:
+                reply.append(_format_score(score))
+        return b"*%d\r\n" % len(reply) + b"".join(_bulk(item) for item in reply)
+
+    def _cmd_zremrangebyscore(self, key, low, high) -> bytes:
+        members = self._zsets.get(key, {})
+        removed = self._range(key, low, high)
+        for member, _ in removed:
+            del members[member]
+        return _integer(len(removed))
+
+    def _range(self, key, low, high) -> List[Tuple[bytes, float]]:
+        above, below = _bound(low), _bound(high)
+        members = sorted(self._zsets.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+        return [
+            (member, score)
+            for member, score in members
+            if (score > above[0] if above[1] else score >= above[0])
+            and (score < below[0] if below[1] else score <= below[0])
+        ]
+
+
+def _read_command(rfile) -> Optional[List[bytes]]:
+    line = rfile.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()  # inline command, e.g. from telnet
+    args = []
+    for _ in range(int(line[1:-2])):
+        length = int(rfile.readline()[1:-2])
+        args.append(rfile.read(length + 2)[:-2])
+    return args
+
+
+def _bound(value: bytes) -> Tuple[float, bool]:
+    """(score, exclusive) of a ZRANGEBYSCORE bound such as `5`, `(5` or `-inf`."""
+    exclusive = value.startswith(b"(")
+    return float(value[1:] if exclusive else value), exclusive
+
+
+def _format_score(score: float) -> bytes:
+    return (str(int(score)) if score.is_integer() else repr(score)).encode()
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _integer(value: int) -> bytes:
+    return b":%d\r\n" % value
+
+
+def _error(message: str) -> bytes:
+    return f"-{message}\r\n".encode()
@@ -0,0 +1,59 @@
+from typing import NamedTuple, Optional
+
+from api.models.user import User
+from api.utils.cache import CacheStats, LocalBackend
+from api.utils.database import db
+
+
+class UserSnapshot(NamedTuple):
+    """Detached copy of what authentication needs to know about a user."""
+
+    id: int
+    username: str
+    is_admin: bool
+
+
+class IdentityCache:
+    """Bounded, TTL based cache of JWT identity -> UserSnapshot.
+
+    Saves the user SELECT that every authenticated request and every token
+    issue would otherwise run. Each worker keeps its own copy, so changes made
+    on another worker are picked up at the latest when the entry expires.
+    """
+
+    def __init__(self, app=None):
+        self.stats = CacheStats()
+        self._users = LocalBackend(0, self.stats)
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self._users = LocalBackend(app.config["IDENTITY_CACHE_SIZE"], self.stats)
+        self.ttl = app.config["IDENTITY_CACHE_TTL"]
+        app.extensions["identity_cache"] = self
+
+    def get(self, username: str) -> Optional[UserSnapshot]:
+        snapshot = self._users.get(username)
+        if snapshot is not None:
+            self.stats.incr("hits")
+            return snapshot
+
+        self.stats.incr("misses")
+        row = (
+            db.session.query(User.id, User.username, User.is_admin)
+            .filter_by(username=username)
+            .first()
+        )
+        if row is None:
+            return None
+        snapshot = UserSnapshot(row.id, row.username, row.is_admin is True)
+        if self.ttl:
+            self._users.set(username, snapshot, username, self.ttl)
+        return snapshot
+
+    def invalidate(self, *usernames: str) -> None:
+        self._users.delete_groups(usernames)
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,83 @@
+import socket
+import threading
+from typing import Optional
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+
+
+class RespClient:
+    """Minimal client for the Redis protocol (RESP2).
+
+    Works against Redis or any stand-in speaking the same protocol, such as
+    api.auth.fake_resp, so the revocation store needs no extra dependency.
+    """
+
+    def __init__(self, url: str, timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = self._reader = None
+
+    def execute(self, *args):
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._call(*args)
+            except (OSError, EOFError):
+                self._close()
+                raise
+
+    def _call(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise EOFError("connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RespError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RespError(f"unexpected reply {line!r}")
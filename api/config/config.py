@@ -1,6 +1,8 @@
 import os
 
 basedir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+benchmark_dir = os.environ.get("BENCHMARK_DIR", os.path.join(basedir, "benchmark-data"))
+test_dir = os.environ.get("TEST_DIR", os.path.join(basedir, "test-data"))
 
 
 class Config:
@@ -11,12 +13,79 @@ class Config:
     JWT_BLACKLIST_ENABLED = True
     SECURITY_PASSWORD_SALT = os.environ.get("SECURITY_PASSWORD_SALT")
     JWT_BLACKLIST_TOKEN_CHECKS = ["access", "refresh"]
+    # "sqlite" shares revoked tokens between workers on one host, "redis" across hosts
+    JWT_REVOCATION_BACKEND = os.environ.get("JWT_REVOCATION_BACKEND", "sqlite")
+    JWT_REVOCATION_SQLITE_PATH = os.path.join(basedir, "revoked-tokens.sqlite")
+    JWT_REVOCATION_REDIS_URL = os.environ.get("JWT_REVOCATION_REDIS_URL", "redis://localhost:6379/0")
+    JWT_REVOCATION_SYNC_INTERVAL = 1  # seconds between polls of the redis store
+    JWT_REVOCATION_BLOOM_CAPACITY = 100000
+    JWT_REVOCATION_REBUILD_INTERVAL = 3600
+    JWT_REVOCATION_DEFAULT_TTL = 15 * 60  # for tokens without an exp claim
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:260000"  # older hashes are upgraded on login
+    PASSWORD_POOL_WORKERS = os.cpu_count() or 1
+    PASSWORD_POOL_MAX_QUEUE = 4 * (os.cpu_count() or 1)
+    # lock files of the pools' bounds, shared by the workers on the host
+    LOCK_DIR = os.environ.get("LOCK_DIR", os.path.join(basedir, "locks"))
+    EMAIL_OUTBOX_BATCH_SIZE = 50
+    EMAIL_OUTBOX_CONCURRENCY = 4  # parallel requests to the mail provider
+    EMAIL_OUTBOX_LEASE = 120  # seconds before a claimed email may be retried elsewhere
+    EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+    EMAIL_OUTBOX_BACKOFF = 30  # first retry delay in seconds, doubled per attempt
+    EMAIL_OUTBOX_BACKOFF_MAX = 3600
+    CONFIRMATION_RETENTION = 7 * 24 * 3600  # seconds an expired confirmation is kept
+    CONFIRMATION_SWEEP_INTERVAL = 3600
+    CONFIRMATION_SWEEP_BATCH_SIZE = 500  # rows deleted per transaction
+    CONFIRMATION_SWEEP_PAUSE = 0.05  # seconds between batches, lets other writers in
+    IDENTITY_CACHE_SIZE = 10000
+    IDENTITY_CACHE_TTL = 60
     UPLOADED_IMAGES_DEST = os.path.join("static", "images")
+    UPLOAD_MAX_SIZE = 10 * 1024 * 1024  # per file, enforced while it's received
+    # where uploads are received, outside the static folder and best on the same filesystem
+    # as UPLOADED_IMAGES_DEST, saving them is then a rename
+    UPLOAD_TMP_DIR = "uploads-tmp"
+    UPLOAD_TMP_MAX_AGE = 3600  # seconds before a partial upload is swept at startup
+    MAX_CONTENT_LENGTH = UPLOAD_MAX_SIZE + 64 * 1024  # whole body, room for the multipart framing
+    IMAGE_VARIANT_SIZES = (64, 256, 1024)  # longest side in pixels, served with ?size=
+    IMAGE_VARIANT_FORMAT = "webp"  # or "jpeg"
+    IMAGE_VARIANT_QUALITY = 80
+    IMAGE_VARIANT_WORKERS = 2  # 0 to never build variants
+    IMAGE_VARIANT_MAX_QUEUE = 100
+    AVATAR_MAX_AGE = 24 * 3600  # Cache-Control max-age of avatars, revalidated by ETag after
+    IMAGE_MAX_AGE = 300  # of a user's private images
+    # who sends image bytes: "app", "x-accel-redirect" (nginx) or "x-sendfile" (Apache, lighttpd)
+    IMAGE_DELIVERY = os.environ.get("IMAGE_DELIVERY", "app")
+    IMAGE_ACCEL_PREFIX = "/protected-images/"  # nginx internal location aliasing UPLOADED_IMAGES_DEST
 
     POSTS_PER_PAGE = 10
+    POSTS_BULK_MAX = 500  # posts accepted by one POST /posts/bulk
     USERS_PER_PAGE = 10
+    USER_EMBEDDED_POSTS = 10  # most recent posts in a user, the rest via posts_next
     TAGS_PER_PAGE = 10
     COMMENTS_PER_PAGE = 10
+    POST_EMBEDDED_COMMENTS = 20  # most recent comments in a post, the rest via comments_next
+    SEARCH_BACKEND = "auto"  # "sqlite" (FTS5), "postgresql" or "auto" to follow the database
+    PAGINATION_COUNT_TTL = 60  # seconds a ?count=cached total is reused
+    EXPORT_BATCH_SIZE = 1000  # rows read per query by the NDJSON exports
+
+    # "local" (per process LRU), "sqlite" (shared by all workers on the host) or "null"
+    # "sqlite" is shared by the workers on the host, so a write evicts stale entries for all
+    # of them, "local" only for a single worker process
+    RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "sqlite")
+    RESPONSE_CACHE_PATH = os.path.join(basedir, "response-cache.sqlite")
+    RESPONSE_CACHE_SIZE = 1024
+    RESPONSE_CACHE_TTL = 60
+    JSON_BACKEND = os.environ.get("JSON_BACKEND", "auto")  # "orjson", "json" or "auto" (orjson if installed)
+    JSON_AS_ASCII = False  # orjson only writes UTF-8, escaping falls back to the json module
+    COMPRESS_ENABLED = True  # gzip, or brotli if installed, for clients that accept it
+    COMPRESS_MIN_SIZE = 1024  # bytes, smaller bodies aren't worth the CPU
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5  # 0-11, higher costs a lot more CPU for little gain
+    METRICS_ENABLED = True
+    # one file per worker process, empty it before the server starts (flask reset-metrics)
+    METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(basedir, "metrics"))
+    METRICS_FLUSH_INTERVAL = 1  # seconds a worker's numbers may lag behind in /metrics
+    METRICS_SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING") == "1"
+    METRICS_AUTH_TOKEN = os.environ.get("METRICS_AUTH_TOKEN")  # bearer token for /metrics, if set
 
 
 class DevConfig(Config):
@@ -24,9 +93,38 @@ class DevConfig(Config):
     DEBUG = True
 
 
-class TestConfig:
+class TestConfig(Config):
+    """Used by the tests, keeps every file it writes under test_dir."""
+
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = "sqlite://" + os.path.join(basedir, "test-dev.sqlite")
+    SECRET_KEY = "test"
+    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(test_dir, "test.sqlite")
+    JWT_ACCESS_TOKEN_EXPIRES = False
+    JWT_REVOCATION_SQLITE_PATH = os.path.join(test_dir, "revoked-tokens.sqlite")
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:1000"  # fast, tests don't need strong hashes
+    PASSWORD_POOL_WORKERS = 0  # hash inline
+    LOCK_DIR = os.path.join(test_dir, "locks")
+    RESPONSE_CACHE_BACKEND = "null"
+    RESPONSE_CACHE_PATH = os.path.join(test_dir, "response-cache.sqlite")
+    UPLOADED_IMAGES_DEST = os.path.join(test_dir, "images")
+    UPLOAD_TMP_DIR = os.path.join(test_dir, "uploads-tmp")
+    IMAGE_VARIANT_WORKERS = 0
+    METRICS_DIR = os.path.join(test_dir, "metrics")
+
+
+class BenchmarkConfig(Config):
+    """Used by benchmarks.endpoints, keeps every file it writes under benchmark_dir."""
+
+    SECRET_KEY = os.environ.get("SECRET_KEY", "benchmark")
+    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(benchmark_dir, "benchmark.sqlite")
+    JWT_ACCESS_TOKEN_EXPIRES = False
+    JWT_REVOCATION_SQLITE_PATH = os.path.join(benchmark_dir, "revoked-tokens.sqlite")
+    RESPONSE_CACHE_BACKEND = "null"  # measure the endpoints, not the cache
+    RESPONSE_CACHE_PATH = os.path.join(benchmark_dir, "response-cache.sqlite")
+    UPLOADED_IMAGES_DEST = os.path.join(benchmark_dir, "images")
+    UPLOAD_TMP_DIR = os.path.join(benchmark_dir, "uploads-tmp")
+    LOCK_DIR = os.path.join(benchmark_dir, "locks")
+    METRICS_DIR = os.path.join(benchmark_dir, "metrics")
 
 
 class ProdConfig(Config):
@@ -39,5 +137,6 @@ config = {
     "development": DevConfig,
     "production": ProdConfig,
     "Testing": TestConfig,
+    "benchmark": BenchmarkConfig,
     "default": DevConfig,
 }
@@ -1,16 +1,24 @@
 from datetime import datetime
-from typing import List
+from typing import Iterable, List
 
 from api.utils.database import db, ma
+from api.utils.responses import version_etag
 
 
 class Comment(db.Model):
     __tablename__ = "comments"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("ix_comments_timestamp_id", "timestamp", "id"),
+        # a post's confirmed comments, newest first
+        db.Index("ix_comments_post_id_confirmed_timestamp", "post_id", "confirmed", "timestamp"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     body = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # for incremental exports
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     confirmed = db.Column(db.Boolean, default=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id'))
@@ -24,6 +32,10 @@ class Comment(db.Model):
         db.session.delete(self)
         db.session.commit()
 
+    @property
+    def etag(self) -> str:
+        return version_etag("comment", self.id, self.updated_at)
+
     @classmethod
     def find_by_id(cls, _id: int):
         return cls.query.get_or_404(_id)
@@ -49,3 +61,16 @@ class CommentSchema(ma.SQLAlchemyAutoSchema):
     post_id = ma.auto_field()
     body = ma.auto_field()
     timestamp = ma.auto_field()
+
+
+def dump_comments(comments: Iterable[Comment]) -> List[dict]:
+    """The same as `CommentSchema(many=True).dump(comments)`, without marshmallow's overhead."""
+    return [
+        {
+            "id": comment.id,
+            "body": comment.body,
+            "timestamp": comment.timestamp.isoformat() if comment.timestamp is not None else None,
+            "confirmed": comment.confirmed,
+        }
+        for comment in comments
+    ]
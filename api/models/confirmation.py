@@ -1,5 +1,9 @@
 from uuid import uuid4
 from time import time
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
 
 from api.utils.database import db, ma
 
@@ -8,6 +12,10 @@ CONFIRMATION_EXPIRATION_DELTA = 1800  # 30 min
 
 class Confirmation(db.Model):
     __tablename__ = "confirmations"
+    __table_args__ = (
+        # a user's confirmations by expiry, for the most recent one and the sweeper
+        db.Index("ix_confirmations_user_id_expire_at", "user_id", "expire_at"),
+    )
 
     id = db.Column(db.String(50), primary_key=True)
     expire_at = db.Column(db.Integer, nullable=False)
@@ -26,14 +34,72 @@ class Confirmation(db.Model):
     def find_by_id(cls, _id: str) -> "Confirmation":
         return cls.query.filter_by(id=_id).first()
 
+    @classmethod
+    def find_latest_by_users(cls, user_ids: Iterable[int]) -> Dict[int, "Confirmation"]:
+        """Each user's confirmation with the latest expire_at, for a page of users in one query."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        rank = func.row_number().over(partition_by=cls.user_id, order_by=cls.expire_at.desc())
+        ranked = (
+            db.session.query(cls.id.label("id"), rank.label("rank"))
+            .filter(cls.user_id.in_(user_ids))
+            .subquery()
+        )
+        latest = cls.query.join(ranked, cls.id == ranked.c.id).filter(ranked.c.rank == 1)
+        return {confirmation.user_id: confirmation for confirmation in latest}
+
+    @classmethod
+    def superseded(cls):
+        """Clause matching confirmations the same user has a newer one of."""
+        newer = aliased(cls)
+        return (
+            db.session.query(newer.id)
+            .filter(newer.user_id == cls.user_id, newer.expire_at > cls.expire_at)
+            .exists()
+        )
+
+    @classmethod
+    def expired_before(cls, timestamp: int):
+        """Clause matching confirmations that expired before `timestamp`."""
+        return cls.expire_at < timestamp
+
+    @classmethod
+    def delete_unconfirmed_batch(cls, condition, after: str, batch_size: int) -> Tuple[List[str], int]:
+        """Delete up to `batch_size` unconfirmed confirmations matching `condition`.
+
+        Only ids greater than `after` are considered, so a sweep walks the
+        primary key once. Returns the ids it looked at in id order and how
+        many rows it deleted; the caller commits and continues after the last id.
+        """
+        ids = [
+            _id
+            for (_id,) in db.session.query(cls.id)
+            .filter(cls.id > after, cls.confirmed.is_(False), condition)
+            .order_by(cls.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            return ids, 0
+        # rows confirmed since the select must stay
+        deleted = cls.query.filter(cls.id.in_(ids), cls.confirmed.is_(False)).delete(
+            synchronize_session=False
+        )
+        return ids, deleted
+
     @property
     def expired(self) -> bool:
         return time() > self.expire_at
 
-    def force_to_expire(self) -> None:
+    def force_to_expire(self, commit: bool = True) -> None:
         if not self.expired:
             self.expire_at = int(time())
-            self.save_to_db()
+            if commit:
+                self.save_to_db()
+
+    def add_to_session(self) -> "Confirmation":
+        db.session.add(self)
+        return self
 
     def save_to_db(self) -> None:
         db.session.add(self)
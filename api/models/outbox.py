@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from typing import List
+
+from api.utils.database import db
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class OutboxEmail(db.Model):
+    """An email waiting to be sent by the outbox worker.
+
+    Rows are written in the same transaction as whatever made the email
+    necessary, so an email is queued if and only if that change is committed.
+    """
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        db.Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+        {"extend_existing": True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    to = db.Column(db.String(64), nullable=False)
+    subject = db.Column(db.String(120), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def add_to_session(self) -> "OutboxEmail":
+        db.session.add(self)
+        return self
+
+    @classmethod
+    def claim_batch(cls, batch_size: int, lease: int) -> List["OutboxEmail"]:
+        """Lock up to `batch_size` due emails for this worker.
+
+        Each row is claimed with a conditional UPDATE, so concurrent workers
+        never send the same email. Claims not resolved within `lease` seconds
+        (a crashed worker) become due again.
+        """
+        now = datetime.utcnow()
+        due = (
+            db.session.query(cls.id)
+            .filter(cls.status.in_((PENDING, SENDING)), cls.next_attempt_at <= now)
+            .order_by(cls.next_attempt_at)
+            .limit(batch_size)
+            .all()
+        )
+        claimed = []
+        for (_id,) in due:
+            updated = cls.query.filter(
+                cls.id == _id,
+                cls.status.in_((PENDING, SENDING)),
+                cls.next_attempt_at <= now,
+            ).update(
+                {cls.status: SENDING, cls.next_attempt_at: now + timedelta(seconds=lease)},
+                synchronize_session=False,
+            )
+            if updated:
+                claimed.append(_id)
+        db.session.commit()
+        if not claimed:
+            return []
+        return cls.query.filter(cls.id.in_(claimed)).all()
+
+    def mark_sent(self) -> None:
+        self.status = SENT
+        self.sent_at = datetime.utcnow()
+        self.last_error = None
+
+    def mark_failed(self, error: str, max_attempts: int, backoff: int, backoff_max: int) -> None:
+        """Schedule a retry with exponential backoff, or give up after `max_attempts`."""
+        self.attempts += 1
+        self.last_error = error
+        if self.attempts >= max_attempts:
+            self.status = FAILED
+            return
+        delay = min(backoff * 2 ** (self.attempts - 1), backoff_max)
+        self.status = PENDING
+        self.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
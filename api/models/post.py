@@ -1,29 +1,42 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from marshmallow import pre_dump, fields
+from flask import current_app, url_for
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, load_only, selectinload
 
 from api.models.tag import Tag, TagSchema
-from api.models.user import UserSchema
-from api.models.comment import CommentSchema, Comment
+from api.models.user import User, UserSchema
+from api.models.comment import CommentSchema, Comment, dump_comments
 from api.utils.database import db, ma
+from api.utils.pagination import encode_cursor
+from api.utils.responses import version_etag
 
 post_tag = db.Table(
     "post_tag",
     db.Column("post_id", db.Integer, db.ForeignKey("posts.id"), primary_key=True),
     db.Column("tag_id", db.Integer, db.ForeignKey("tags.id"), primary_key=True),
+    # the primary key only serves lookups by post, this one serves lookups by tag
+    db.Index("ix_post_tag_tag_id_post_id", "tag_id", "post_id"),
 )
 
 
 class Post(db.Model):
     __tablename__ = "posts"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("ix_posts_timestamp_id", "timestamp", "id"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     body = db.Column(db.Text)
     title = db.Column(db.String(120))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every change that shows up in the post's response, including its comments
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    # Denormalized number of confirmed comments, see update_comments_count
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     tags = db.relationship(Tag, secondary=post_tag, backref=db.backref("posts_"))
@@ -38,6 +51,9 @@ class Post(db.Model):
     def add_to_session(self):
         db.session.add(self)
 
+    def db_flush(self):
+        db.session.flush()
+
     def db_commit(self):
         db.session.commit()
 
@@ -46,8 +62,163 @@ class Post(db.Model):
         db.session.commit()
 
     @property
-    def comments_count(self):
-        return self.comments.filter_by(confirmed=True).count()
+    def confirmed_comments(self) -> List[Comment]:
+        """The most recent confirmed comments, at most POST_EMBEDDED_COMMENTS of them."""
+        if getattr(self, "_confirmed_comments", None) is None:
+            self.prefetch_confirmed_comments([self])
+        return self._confirmed_comments
+
+    @property
+    def comments_next(self) -> Optional[str]:
+        """Link to the comments after confirmed_comments, None if there are no more."""
+        comments = self.confirmed_comments
+        if not self._more_comments:
+            return None
+        last = comments[-1]
+        cursor = encode_cursor([last.timestamp, last.id])
+        return url_for("post-comments", post_id=self.id, cursor=cursor)
+
+    @classmethod
+    def find_all_eager(cls):
+        """Query posts with their author and tags loaded in batch instead of per row."""
+        return cls.query.options(joinedload(cls.author), selectinload(cls.tags))
+
+    @classmethod
+    def find_summaries(cls):
+        """Like find_all_eager, but only loads what dump_post_summaries outputs, not the bodies."""
+        return cls.query.options(
+            load_only(cls.id, cls.title, cls.timestamp, cls.user_id, cls.comments_count),
+            joinedload(cls.author).load_only(User.id, User.username, User.email),
+            selectinload(cls.tags),
+        )
+
+    @classmethod
+    def filter_by_tags(cls, query, tag_ids: List[int], match_all: bool = False):
+        """Restrict a post query to posts having any (or all) of the given tags."""
+        tagged = db.select([post_tag.c.post_id]).where(post_tag.c.tag_id.in_(tag_ids))
+        if match_all:
+            tagged = tagged.group_by(post_tag.c.post_id).having(
+                func.count(post_tag.c.tag_id) == len(set(tag_ids))
+            )
+        return query.filter(cls.id.in_(tagged))
+
+    @classmethod
+    def update_comments_count(cls, post_id: int, delta: int) -> None:
+        """Shift the stored confirmed comment counter of a post.
+        Runs as an atomic UPDATE in the current transaction, the caller commits it.
+        """
+        if post_id is None or not delta:
+            return
+        cls.query.filter_by(id=post_id).update(
+            {
+                cls.comments_count: cls.comments_count + delta,
+                cls.updated_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+
+    @classmethod
+    def touch(cls, post_id: int) -> None:
+        """Mark a post as changed, e.g. when one of its embedded comments was edited."""
+        if post_id is None:
+            return
+        cls.query.filter_by(id=post_id).update(
+            {cls.updated_at: datetime.utcnow()}, synchronize_session=False
+        )
+
+    @classmethod
+    def touch_by_author(cls, user_id: int) -> List[int]:
+        """Mark a user's posts as changed, e.g. when the author they embed was renamed.
+        Returns their ids, the caller commits.
+        """
+        ids = [_id for (_id,) in db.session.query(cls.id).filter_by(user_id=user_id)]
+        if ids:
+            cls.query.filter_by(user_id=user_id).update(
+                {cls.updated_at: datetime.utcnow()}, synchronize_session=False
+            )
+        return ids
+
+    @property
+    def etag(self) -> str:
+        return version_etag("post", self.id, self.updated_at)
+
+    @classmethod
+    def discount_comments_of_user(cls, user_id: int) -> None:
+        """Take a user's confirmed comments off the counters before they get deleted with the user."""
+        per_post = (
+            db.session.query(Comment.post_id, func.count(Comment.id))
+            .filter(Comment.user_id == user_id, Comment.confirmed.is_(True))
+            .group_by(Comment.post_id)
+        )
+        for post_id, count in per_post:
+            cls.update_comments_count(post_id, -count)
+
+    @classmethod
+    def reconcile_comments_count(cls, batch_size: int = 1000) -> int:
+        """Rebuild every stored comment counter from the comments table.
+        Works through posts in id ranges so no single transaction holds the table for long.
+        Only wrong counters are written, the others keep their updated_at and so their
+        ETag. Returns how many were wrong.
+        """
+        confirmed_count = (
+            db.select([func.count(Comment.id)])
+            .where(Comment.post_id == cls.id)
+            .where(Comment.confirmed.is_(True))
+            .as_scalar()
+        )
+        max_id = db.session.query(func.max(cls.id)).scalar() or 0
+        updated = 0
+        for start in range(0, max_id, batch_size):
+            updated += cls.query.filter(
+                cls.id > start,
+                cls.id <= start + batch_size,
+                cls.comments_count != confirmed_count,
+            ).update({cls.comments_count: confirmed_count}, synchronize_session=False)
+            db.session.commit()
+        return updated
+
+    @classmethod
+    def prefetch_confirmed_comments(cls, posts: List["Post"], limit: int = None) -> List["Post"]:
+        """Load the most recent confirmed comments of a page of posts with a single query.
+
+        At most `limit` (POST_EMBEDDED_COMMENTS) per post, the rest is paged
+        through with GET /posts/<id>/comments.
+        """
+        if limit is None:
+            limit = current_app.config["POST_EMBEDDED_COMMENTS"]
+        by_post = {post.id: [] for post in posts}
+        if not by_post:
+            return posts
+        newest_first = (Comment.timestamp.desc(), Comment.id.desc())
+        confirmed = Comment.query.filter(Comment.confirmed.is_(True))
+        if len(by_post) == 1:
+            (post_id,) = by_post
+            comments = confirmed.filter(Comment.post_id == post_id).order_by(*newest_first)
+        else:
+            rank = func.row_number().over(partition_by=Comment.post_id, order_by=newest_first)
+            ranked = (
+                db.session.query(Comment.id.label("id"), rank.label("rank"))
+                .filter(Comment.post_id.in_(list(by_post)), Comment.confirmed.is_(True))
+                .subquery()
+            )
+            comments = (
+                confirmed.join(ranked, Comment.id == ranked.c.id)
+                .filter(ranked.c.rank <= limit + 1)
+                .order_by(Comment.post_id, *newest_first)
+            )
+        # one more than shown tells whether there are more
+        for comment in comments.limit(len(by_post) * (limit + 1)):
+            by_post[comment.post_id].append(comment)
+        for post in posts:
+            fetched = by_post[post.id]
+            post._confirmed_comments = fetched[:limit]
+            post._more_comments = len(fetched) > limit
+        return posts
+
+    @classmethod
+    def find_confirmed_comments(cls, post_id: int):
+        """Query of a post's confirmed comments, most recent first once paginated."""
+        return Comment.query.filter(Comment.post_id == post_id, Comment.confirmed.is_(True))
 
     @classmethod
     def find_all_confirmed(cls) -> List["Post"]:
@@ -68,10 +239,37 @@ class PostSchema(ma.SQLAlchemySchema):
     author = ma.Nested(UserSchema, only=["id", "username", "email"], dump_only=True)
     tags = ma.Pluck(TagSchema, "name", many=True)
 
-    comments = ma.Nested('CommentSchema', many=True, dump_only=True)
-    comments_count = fields.Integer(dump_only=True)
+    comments = ma.Nested(
+        'CommentSchema', many=True, dump_only=True, attribute="confirmed_comments"
+    )
+    comments_next = ma.String(dump_only=True)
+    comments_count = ma.auto_field(dump_only=True)
+
+
+def dump_post_summaries(posts: List[Post], comments: bool = False) -> List[dict]:
+    """The same as `PostSchema(many=True, exclude=["user_id", "body", "comments",
+    "comments_next"]).dump(posts)`, or with `comments` as
+    `PostSchema(many=True, exclude=["user_id", "body"])`. Posts with comments
+    should have been through prefetch_confirmed_comments.
 
-    @pre_dump
-    def _pre_dump(self, post, **kwargs):
-        post.comments = post.comments.filter_by(confirmed=True)
-        return post
+    Builds the dicts directly, list pages spend most of their dump time in
+    marshmallow's per field machinery otherwise. Keep it in line with PostSchema.
+    """
+    result = []
+    for post in posts:
+        author = post.author
+        summary = {
+            "title": post.title,
+            "id": post.id,
+            "timestamp": post.timestamp.isoformat() if post.timestamp is not None else None,
+            "author": {"id": author.id, "username": author.username, "email": author.email}
+            if author is not None
+            else None,
+            "tags": [tag.name for tag in post.tags],
+            "comments_count": post.comments_count,
+        }
+        if comments:
+            summary["comments"] = dump_comments(post.confirmed_comments)
+            summary["comments_next"] = post.comments_next
+        result.append(summary)
+    return result
@@ -1,5 +1,6 @@
-from typing import List
+from typing import Iterable, List
 from marshmallow import fields, validate
+from sqlalchemy.dialects import postgresql
 
 from api.utils.database import db, ma
 
@@ -20,6 +21,35 @@ class Tag(db.Model):
     def find_all(cls) -> List["Tag"]:
         return cls.query.all()
 
+    @classmethod
+    def find_ids_by_names(cls, names: List[str]) -> List[int]:
+        return [_id for (_id,) in db.session.query(cls.id).filter(cls.name.in_(names))]
+
+    @classmethod
+    def resolve_names(cls, names: Iterable[str]) -> List["Tag"]:
+        """Tags for `names` in the given order, creating the missing ones.
+
+        Costs one INSERT that skips existing names and one IN query, however
+        many tags there are, and runs in the caller's transaction.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            stmt = postgresql.insert(cls.__table__).on_conflict_do_nothing(
+                index_elements=["name"]
+            )
+        elif dialect == "sqlite":
+            stmt = cls.__table__.insert().prefix_with("OR IGNORE")
+        elif dialect == "mysql":
+            stmt = cls.__table__.insert().prefix_with("IGNORE")
+        else:
+            raise ValueError(f"No tag upsert for {dialect!r}")
+        db.session.execute(stmt, [{"name": name} for name in names])
+        tags = {tag.name: tag for tag in cls.query.filter(cls.name.in_(names))}
+        return [tags[name] for name in names]
+
 
 class TagSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
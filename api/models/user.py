@@ -1,18 +1,20 @@
 import os
 from datetime import datetime
-from typing import List
-from requests import Response
-from flask import request, url_for
+from typing import List, Optional, Tuple
+from flask import current_app, request, url_for
 
 from api.models.comment import Comment
 from api.models.confirmation import Confirmation
-from api.utils.email import Mailgun
+from api.models.outbox import OutboxEmail
 from marshmallow.fields import Nested
-from werkzeug.security import generate_password_hash, check_password_hash
 from marshmallow import pre_dump
 from marshmallow.validate import Email
+from sqlalchemy.orm import load_only
 
 from api.utils.database import db, ma
+from api.utils.pagination import encode_cursor
+from api.utils.responses import version_etag
+from api.utils.password import hasher
 
 
 class User(db.Model):
@@ -23,9 +25,13 @@ class User(db.Model):
     username = db.Column(db.String(64), unique=True, index=True)
     email = db.Column(db.String(64), unique=True, index=True)
     is_admin = db.Column(db.Boolean)
+    # file name in the avatars folder and sha256 of its content, set by AvatarUpload
     avatar = db.Column(db.String(164))
+    avatar_hash = db.Column(db.String(64))
     password_hash = db.Column(db.String(120), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # for incremental exports
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     first_name = db.Column(db.String(64))
     last_name = db.Column(db.String(64))
     bio = db.Column(db.Text)
@@ -47,8 +53,66 @@ class User(db.Model):
 
     @property
     def most_recent_confirmation(self) -> "Confirmation":
+        prefetched = getattr(self, "_latest_confirmation", False)
+        if prefetched is not False:
+            return prefetched
         return self.confirmation.order_by(db.desc(Confirmation.expire_at)).first()
 
+    @classmethod
+    def prefetch_latest_confirmations(cls, users: List["User"]) -> List["User"]:
+        """Load most_recent_confirmation of a page of users with a single query."""
+        latest = Confirmation.find_latest_by_users(user.id for user in users)
+        for user in users:
+            user._latest_confirmation = latest.get(user.id)
+        return users
+
+    @property
+    def recent_posts(self) -> list:
+        """The user's most recent posts, at most USER_EMBEDDED_POSTS, with only their titles loaded."""
+        if getattr(self, "_recent_posts", None) is None:
+            from api.models.post import Post  # api.models.post imports this module
+
+            limit = current_app.config["USER_EMBEDDED_POSTS"]
+            posts = (
+                Post.query.options(load_only(Post.id, Post.title, Post.timestamp))
+                .filter(Post.user_id == self.id)
+                .order_by(Post.timestamp.desc(), Post.id.desc())
+                .limit(limit + 1)
+                .all()
+            )
+            self._recent_posts = posts[:limit]
+            self._more_posts = len(posts) > limit
+        return self._recent_posts
+
+    @property
+    def posts_next(self) -> Optional[str]:
+        """Link to the user's posts after recent_posts, None if there are no more."""
+        posts = self.recent_posts
+        if not self._more_posts:
+            return None
+        last = posts[-1]
+        cursor = encode_cursor([last.timestamp, last.id])
+        return url_for("user-posts-list", username=self.username, cursor=cursor)
+
+    @property
+    def etag(self) -> str:
+        """Version of the user as UserSchema dumps it.
+
+        The dump embeds recent posts and the latest confirmation, which change
+        without touching the user's row, so they are part of the version.
+        """
+        if not hasattr(self, "_latest_confirmation"):
+            User.prefetch_latest_confirmations([self])  # kept for the dump
+        confirmation = self.most_recent_confirmation
+        return version_etag(
+            "user",
+            self.id,
+            self.updated_at,
+            confirmation.id if confirmation is not None else None,
+            [(post.id, post.title) for post in self.recent_posts],
+            self._more_posts,
+        )
+
     def save_to_db(self) -> "User":
         db.session.add(self)
         db.session.commit()
@@ -68,10 +132,27 @@ class User(db.Model):
 
     @password.setter
     def password(self, password) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+
+    @classmethod
+    def find_listed(cls):
+        """Users with only the columns UserListResource outputs loaded."""
+        return cls.query.options(
+            load_only(
+                cls.id,
+                cls.username,
+                cls.email,
+                cls.avatar,
+                cls.avatar_hash,
+                cls.timestamp,
+                cls.first_name,
+                cls.last_name,
+                cls.bio,
+            )
+        )
 
     @classmethod
     def find_by_username(cls, username) -> "User":
@@ -81,17 +162,43 @@ class User(db.Model):
     def find_by_email(cls, email) -> "User":
         return cls.query.filter_by(email=email).first()
 
-    def send_confirmation_email(self) -> Response:
+    @classmethod
+    def find_for_login(cls, **criteria) -> Optional[Tuple["User", bool]]:
+        """(user, whether the user confirmed their registration) in one query, None if not found.
+
+        Confirmed confirmations are never superseded, so the user is confirmed
+        when any of them is.
+        """
+        confirmed = (
+            db.session.query(Confirmation.id)
+            .filter(Confirmation.user_id == cls.id, Confirmation.confirmed.is_(True))
+            .exists()
+        )
+        return db.session.query(cls, confirmed).filter_by(**criteria).first()
+
+    @classmethod
+    def find_avatar(cls, username: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """(avatar, avatar_hash) of a user without loading the user, None if there is no such user."""
+        return db.session.query(cls.avatar, cls.avatar_hash).filter_by(username=username).first()
+
+    @classmethod
+    def set_avatar(cls, username: str, avatar: str, avatar_hash: str) -> None:
+        cls.query.filter_by(username=username).update(
+            {cls.avatar: avatar, cls.avatar_hash: avatar_hash}, synchronize_session=False
+        )
+
+    def queue_confirmation_email(self, confirmation: "Confirmation") -> OutboxEmail:
+        """Add the confirmation email to the outbox, it is sent once the session commits."""
         link = request.url_root[0:-1] + url_for(
-            "confirmationresource", confirmation_id=self.most_recent_confirmation.id
+            "confirmationresource", confirmation_id=confirmation.id
         )
         subject = "Registration confirmation"
         text = f"Please click the link to confirm your registration: {link}"
         html = f"<html>Please click the link to confirm your registration: <a href={link}>link</a></html>"
 
-        return Mailgun.send_email(
-            to=[self.email], subject=subject, text=text, html=html
-        )
+        return OutboxEmail(
+            to=self.email, subject=subject, text=text, html=html
+        ).add_to_session()
 
 
 class UserSchema(ma.SQLAlchemyAutoSchema):
@@ -107,19 +214,43 @@ class UserSchema(ma.SQLAlchemyAutoSchema):
             "email",
             "username",
             "avatar",
+            "avatar_url",
             "bio",
             "timestamp",
             "confirmation",
             "posts",
+            "posts_next",
         )
         dump_only = ("id", "confirmation", "timestamp")
 
     password = ma.String(load_only=True)
     email = ma.Email(required=True, validate=Email())
 
-    posts = Nested("PostSchema", many=True, only=("title", "id"), dump_only=True)
+    confirmation = ma.Method("get_confirmation", dump_only=True)
+    posts = Nested(
+        "PostSchema", many=True, only=("title", "id"), dump_only=True, attribute="recent_posts"
+    )
+    posts_next = ma.String(dump_only=True)
+    avatar_url = ma.Method("get_avatar_url", dump_only=True)
+
+    def get_avatar_url(self, user):
+        """Content addressed URL of the avatar, it changes whenever the avatar does."""
+        if user.avatar_hash is None:
+            return None
+        return url_for("avatar-version", username=user.username, version=user.avatar_hash)
+
+    def get_confirmation(self, user):
+        confirmation = user.most_recent_confirmation
+        return [confirmation.id if confirmation is not None else None]
 
-    @pre_dump
-    def _pre_dump(self, user, **kwargs):
-        user.confirmation = [user.most_recent_confirmation]
-        return user
+    @pre_dump(pass_many=True)
+    def _pre_dump(self, users, many, **kwargs):
+        # Nested dumps such as a post's author don't output confirmations,
+        # so don't pay a query for them. Pages load theirs in one query.
+        if "confirmation" in self.dump_fields:
+            pending = [
+                user for user in (users if many else [users]) if not hasattr(user, "_latest_confirmation")
+            ]
+            if pending:
+                User.prefetch_latest_confirmations(pending)
+        return users
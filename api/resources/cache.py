@@ -0,0 +1,20 @@
+from flask_restful import Resource
+
+from api.utils.cache import cache
+from api.utils.decorators import admin_required
+from api.utils.responses import response_with
+from api.utils import responses as resp
+
+
+class ResponseCacheStats(Resource):
+    @classmethod
+    @admin_required
+    def get(cls):
+        """Hit, miss and eviction counters of the response cache in this worker."""
+        return response_with(resp.SUCCESS_200, value={"cache": cache.stats.as_dict()})
+
+    @classmethod
+    @admin_required
+    def delete(cls):
+        cache.clear()
+        return response_with(resp.SUCCESS_204)
@@ -1,39 +1,46 @@
-from flask import request, current_app, url_for
+from flask import request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_current_user
 from flask_restful import Resource
 
 from api.models.comment import Comment, CommentSchema
-from api.utils.responses import response_with
+from api.models.post import Post
+from api.utils.responses import response_with, not_modified
 from api.utils import responses as resp
+from api.utils.pagination import paginate
+from api.utils.cache import cache, post_groups
+from api.utils.metrics import metrics
 
 
 class CommentListResource(Resource):
     @classmethod
     def get(cls):
-        page = request.args.get("page", 1, type=int)
-        pagination = Comment.find_all_confirmed().paginate(
-            page, per_page=current_app.config["COMMENTS_PER_PAGE"], error_out=False
+        get_comments, pagination = paginate(
+            Comment.find_all_confirmed(),
+            "comment-list",
+            current_app.config["COMMENTS_PER_PAGE"],
+            keys=(Comment.timestamp.desc(), Comment.id.desc()),
         )
 
-        get_comments = pagination.items
-
-        prev = None
-        if pagination.has_prev:
-            prev = url_for("comment-list", page=page - 1)
-        _next = None
-        if pagination.has_next:
-            _next = url_for("comment-list", page=page + 1)
-
-        comments = CommentSchema(many=True, exclude=('confirmed',)).dump(get_comments)
-        return response_with(resp.SUCCESS_200, value={'comments': comments}, pagination={'prev': prev, 'next': _next})
+        with metrics.serializing():
+            comments = CommentSchema(many=True, exclude=('confirmed',)).dump(get_comments)
+        return response_with(resp.SUCCESS_200, value={'comments': comments}, pagination=pagination)
 
 
 class CommentResource(Resource):
     @classmethod
     def get(cls, comment_id: int):
         get_comment = Comment.query.get_or_404(comment_id)
-        result = CommentSchema(exclude=('confirmed',)).dump(get_comment)
-        return response_with(resp.SUCCESS_200, value={'comment': result})
+        unchanged = not_modified(get_comment.etag, get_comment.updated_at)
+        if unchanged:
+            return unchanged
+        with metrics.serializing():
+            result = CommentSchema(exclude=('confirmed',)).dump(get_comment)
+        return response_with(
+            resp.SUCCESS_200,
+            value={'comment': result},
+            etag=get_comment.etag,
+            last_modified=get_comment.updated_at,
+        )
 
     @classmethod
     @jwt_required
@@ -41,13 +48,25 @@ class CommentResource(Resource):
         user = get_current_user()
         data = request.get_json()
         comment = Comment.query.get_or_404(comment_id)
-        if comment.author != user and user.is_admin is not True:
+        if comment.user_id != user.id and user.is_admin is not True:
             return response_with(
                 resp.FORBIDDEN_403, message="You are not the author of this comment."
             )
         comment_schema = CommentSchema()
+        counted_in = comment.post_id if comment.confirmed else None
+        previous_post = comment.post
         updated_comment = comment_schema.load(data, instance=comment)
-        result = comment_schema.dump(updated_comment.save_to_db())
+        now_counted_in = updated_comment.post_id if updated_comment.confirmed else None
+        if counted_in != now_counted_in:
+            Post.update_comments_count(counted_in, -1)
+            Post.update_comments_count(now_counted_in, 1)
+        Post.touch(updated_comment.post_id)
+        updated_comment.save_to_db()
+        with metrics.serializing():
+            result = comment_schema.dump(updated_comment)
+        for post in {previous_post, updated_comment.post}:
+            if post is not None:
+                cache.invalidate(*post_groups(post))
         return response_with(resp.SUCCESS_200, value={"comment": result})
 
     @classmethod
@@ -55,9 +74,14 @@ class CommentResource(Resource):
     def delete(cls, comment_id: int):
         user = get_current_user()
         get_comment = Comment.query.get_or_404(comment_id)
-        if get_comment.author != user and user.is_admin is not True:
+        if get_comment.user_id != user.id and user.is_admin is not True:
             return response_with(
                 resp.FORBIDDEN_403, message="You are not the author of this comment."
             )
+        if get_comment.confirmed:
+            Post.update_comments_count(get_comment.post_id, -1)
+        post = get_comment.post
         get_comment.delete_from_db()
+        if post is not None:
+            cache.invalidate(*post_groups(post))
         return response_with(resp.SUCCESS_204)
@@ -8,7 +8,8 @@ from api.models.confirmation import Confirmation, ConfirmationSchema
 from api.models.user import User
 from api.utils.responses import response_with
 from api.utils import responses as resp
-from api.utils.email import MailgunException
+from api.utils.database import db
+from api.utils.metrics import metrics
 
 NOT_FOUND = "Confirmation reference not found."
 EXPIRED = "The link has expired."
@@ -54,13 +55,13 @@ class ConfirmationByUser(Resource):
         if not user:
             return response_with(resp.SERVER_ERROR_404)
 
+        confirmations = user.confirmation.order_by(Confirmation.expire_at).all()
+        with metrics.serializing():
+            confirmations = [confirmation_schema.dump(each) for each in confirmations]
         return (
             {
                 "current_time": int(time()),
-                "confirmation": [
-                    confirmation_schema.dump(each)
-                    for each in user.confirmation.order_by(Confirmation.expire_at)
-                ],
+                "confirmation": confirmations,
             },
             200,
         )
@@ -79,15 +80,14 @@ class ConfirmationByUser(Resource):
                     return response_with(
                         resp.BAD_REQUESTS_400, message=ALREADY_CONFIRMED
                     )
-                confirmation.force_to_expire()
+                confirmation.force_to_expire(commit=False)
 
-            new_confirmation = Confirmation(user_id)
-            new_confirmation.save_to_db()
-            user.send_confirmation_email()
+            new_confirmation = Confirmation(user_id).add_to_session()
+            user.queue_confirmation_email(new_confirmation)
+            db.session.commit()
 
             return response_with(resp.SUCCESS_201, message=RESEND_SUCCESSFUL)
-        except MailgunException as e:
-            return response_with(resp.SERVER_ERROR_500, message=str(e))
         except:
             traceback.print_exc()
+            db.session.rollback()
             return response_with(resp.SERVER_ERROR_500)
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from flask import current_app, request, stream_with_context
+from flask_restful import Resource
+
+from api.utils.decorators import admin_required
+from api.utils.export import EXPORTS, export_ndjson, parse_since
+from api.utils.responses import response_with
+from api.utils import responses as resp
+
+
+class ExportResource(Resource):
+    @classmethod
+    @admin_required
+    def get(cls, kind: str):
+        """Stream a whole table as newline-delimited JSON, `?gzip=1` for a gzip file.
+
+        `?since=` limits it to rows created or changed from then on. The
+        X-Export-Started header is the `since` of the next incremental export.
+        """
+        if kind not in EXPORTS:
+            return response_with(resp.SERVER_ERROR_404, message=f"No export named {kind}.")
+        since = None
+        if request.args.get("since"):
+            try:
+                since = parse_since(request.args["since"])
+            except ValueError:
+                return response_with(
+                    resp.BAD_REQUESTS_400, message="since must be an ISO 8601 timestamp."
+                )
+        compress = request.args.get("gzip") in ("1", "true")
+        started = datetime.utcnow()
+        body = export_ndjson(kind, since, current_app.config["EXPORT_BATCH_SIZE"], compress)
+        filename = f"{kind}.ndjson" + (".gz" if compress else "")
+        response = current_app.response_class(
+            stream_with_context(body),
+            mimetype="application/gzip" if compress else "application/x-ndjson",
+        )
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+        response.headers["X-Export-Started"] = started.isoformat()
+        return response
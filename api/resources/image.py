@@ -1,19 +1,38 @@
 import os
 import traceback
 
-from flask import request, send_file
+from flask import current_app, redirect, request, url_for
 from flask_jwt_extended import jwt_required, get_current_user, get_jwt_identity
 from flask_restful import Resource
 from flask_uploads import UploadNotAllowed
 
+from api.models.user import User
 from api.schemas.image import ImageSchema
 from api.utils import image_helper
 from api.utils import responses as resp
+from api.utils.database import db
+from api.utils.delivery import send_image
 from api.utils.responses import response_with
+from api.utils.thumbnails import thumbnails
 
 image_schema = ImageSchema()
 
 
+def _requested_size():
+    """`?size=` if it names a built variant size, None for the original. Raises ValueError."""
+    if "size" not in request.args:
+        return None
+    size = request.args.get("size", type=int)
+    if size not in thumbnails.sizes:
+        raise ValueError(size)
+    return size
+
+
+def _invalid_size():
+    sizes = ", ".join(str(size) for size in thumbnails.sizes)
+    return response_with(resp.BAD_REQUESTS_400, message=f"size must be one of {sizes}.")
+
+
 class ImageUpload(Resource):
     @jwt_required
     def post(self):
@@ -28,6 +47,7 @@ class ImageUpload(Resource):
 
         try:
             image_path = image_helper.save_image(data["image"], folder=folder)
+            thumbnails.enqueue(image_helper.get_path(image_path))
             basename = image_helper.get_basename(image_path)
             return response_with(
                 resp.SUCCESS_201, message="Image {} uploaded.".format(basename)
@@ -53,7 +73,13 @@ class Image(Resource):
             )
 
         try:
-            return send_file(image_helper.get_path(filename, folder=folder))
+            size = _requested_size()
+        except ValueError:
+            return _invalid_size()
+
+        try:
+            path, mimetype = thumbnails.resolve(image_helper.get_path(filename, folder=folder), size)
+            return send_image(path, mimetype, max_age=current_app.config["IMAGE_MAX_AGE"])
         except FileNotFoundError:
             return response_with(resp.SERVER_ERROR_404, message="Image not found.")
 
@@ -68,7 +94,9 @@ class Image(Resource):
             )
 
         try:
-            os.remove(image_helper.get_path(filename, folder=folder))
+            path = image_helper.get_path(filename, folder=folder)
+            os.remove(path)
+            thumbnails.remove_variants(path)
             return response_with(resp.SUCCESS_204, message="image deleted")
         except FileNotFoundError:
             return response_with(resp.SERVER_ERROR_404, message="Image not found.")
@@ -91,20 +119,30 @@ class AvatarUpload(Resource):
         data = image_schema.load(request.files)
         filename = f"user_{get_jwt_identity()}"
         folder = "avatars"
-        avatar_path = image_helper.find_image_by_any_format(filename, folder)
+        stored = User.find_avatar(get_jwt_identity())
+        if stored is not None and image_helper.is_avatar_name(stored.avatar, get_jwt_identity()):
+            avatar_path = image_helper.get_path(stored.avatar, folder=folder)
+        else:  # uploaded before avatars were recorded in the users table
+            avatar_path = image_helper.find_image_by_any_format(filename, folder)
         if avatar_path:
             try:
-                os.remove(avatar_path)
+                if os.path.exists(avatar_path):
+                    os.remove(avatar_path)
+                thumbnails.remove_variants(avatar_path)
             except:
                 return response_with(resp.SERVER_ERROR_500, message="deletion failed.")
 
         try:
             ext = image_helper.get_extension(data["image"].filename)
             avatar = filename + ext
+            digest = image_helper.content_hash(data["image"])
             avatar_path = image_helper.save_image(
                 data["image"], folder=folder, name=avatar
             )
+            thumbnails.enqueue(image_helper.get_path(avatar_path))
             basename = image_helper.get_basename(avatar_path)
+            User.set_avatar(get_jwt_identity(), basename, digest)
+            db.session.commit()
             return response_with(
                 resp.SUCCESS_200, message="avatar {} uploaded.".format(basename)
             )
@@ -116,13 +154,64 @@ class AvatarUpload(Resource):
             )
 
 
+def _send_avatar(stored, size, immutable: bool):
+    """`stored.avatar` must have been checked with image_helper.is_avatar_name."""
+    original = image_helper.get_path(stored.avatar, folder="avatars")
+    path, mimetype = thumbnails.resolve(original, size)
+    if size is not None and path == original:
+        # the variant isn't built yet, serve the original only briefly
+        return send_image(path, etag=stored.avatar_hash, max_age=60, public=True)
+    etag = stored.avatar_hash if size is None else f"{stored.avatar_hash}-{size}"
+    return send_image(
+        path,
+        mimetype,
+        etag=etag,
+        max_age=current_app.config["AVATAR_MAX_AGE"],
+        public=True,
+        immutable=immutable,
+    )
+
+
 class Avatar(Resource):
     @classmethod
     def get(cls, username: str):
-        folder = "avatars"
-        filename = f"user_{username}"
-        avatar = image_helper.find_image_by_any_format(filename, folder)
-        if avatar:
-            return send_file(avatar)
-        else:
+        """The user's avatar, found through the users table instead of probing the disk."""
+        try:
+            size = _requested_size()
+        except ValueError:
+            return _invalid_size()
+        stored = User.find_avatar(username)
+        if stored is None or not image_helper.is_avatar_name(stored.avatar, username):
+            return response_with(resp.SERVER_ERROR_404, message="avatar not found.")
+        try:
+            return _send_avatar(stored, size, immutable=False)
+        except FileNotFoundError:
+            return response_with(resp.SERVER_ERROR_404, message="avatar not found.")
+
+
+class AvatarVersion(Resource):
+    @classmethod
+    def get(cls, username: str, version: str):
+        """Content addressed avatar (see UserSchema.avatar_url) that clients may cache forever.
+
+        A URL of a replaced avatar redirects to the current one.
+        """
+        try:
+            size = _requested_size()
+        except ValueError:
+            return _invalid_size()
+        stored = User.find_avatar(username)
+        if stored is None or not image_helper.is_avatar_name(stored.avatar, username):
+            return response_with(resp.SERVER_ERROR_404, message="avatar not found.")
+        if stored.avatar_hash is None:
+            # not indexed yet (flask index-avatars), there is no version to redirect to
+            return response_with(resp.SERVER_ERROR_404, message="avatar not found.")
+        if version != stored.avatar_hash:
+            args = {"size": size} if size is not None else {}
+            return redirect(
+                url_for("avatar-version", username=username, version=stored.avatar_hash, **args)
+            )
+        try:
+            return _send_avatar(stored, size, immutable=True)
+        except FileNotFoundError:
             return response_with(resp.SERVER_ERROR_404, message="avatar not found.")
@@ -0,0 +1,20 @@
+from flask import current_app, make_response, request
+from flask_restful import Resource
+
+from api.utils.metrics import metrics
+from api.utils.responses import response_with
+from api.utils import responses as resp
+
+
+class MetricsResource(Resource):
+    @classmethod
+    def get(cls):
+        """Request, SQL, cache and pool metrics of all workers in the Prometheus text format."""
+        if not metrics.enabled:
+            return response_with(resp.SERVER_ERROR_404)
+        token = current_app.config.get("METRICS_AUTH_TOKEN")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return response_with(resp.FORBIDDEN_403)
+        return make_response(
+            metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
@@ -1,38 +1,62 @@
+from datetime import datetime
+
 from flask import current_app, url_for
 from flask_restful import Resource, request
 from flask_jwt_extended import get_jwt_identity, jwt_required, get_current_user
+from marshmallow import ValidationError
+from sqlalchemy.orm import joinedload
 
-from api.models.post import Post, PostSchema
+from api.models.post import Post, PostSchema, dump_post_summaries
 from api.models.tag import TagSchema, Tag
 from api.models.user import User
 from api.models.comment import Comment, CommentSchema
 from api.utils import responses as resp
-from api.utils.responses import response_with
+from api.utils.responses import response_with, not_modified
+from api.utils.database import db
 from api.utils.decorators import admin_required
+from api.utils.pagination import paginate, encode_cursor, decode_cursor_values
+from api.utils.cache import cache, post_groups
+from api.utils.search import search, terms
+from api.utils.metrics import metrics
+
+post_schema = PostSchema()
+comments_schema = CommentSchema(many=True, exclude=("confirmed",))
 
 
 class PostListResource(Resource):
     @classmethod
+    @cache.cached(lambda: "posts")
     def get(cls):
-        page = request.args.get("page", 1, type=int)
-        pagination = Post.query.paginate(
-            page, per_page=current_app.config["POSTS_PER_PAGE"], error_out=False
+        query = Post.find_summaries()
+        estimate_table = Post.__table__
+        url_values = {}
+        if request.args.get("tags"):
+            # ?tags=a,b&match=all for posts with every tag, any of them by default
+            names = [name.strip() for name in request.args["tags"].split(",") if name.strip()]
+            match_all = request.args.get("match", "any") == "all"
+            tag_ids = Tag.find_ids_by_names(names)
+            if match_all and len(tag_ids) < len(set(names)):
+                tag_ids = []  # a missing tag can't be matched
+            query = Post.filter_by_tags(query, tag_ids, match_all).order_by(
+                Post.timestamp.desc(), Post.id.desc()
+            )
+            estimate_table = None
+            url_values = {"tags": request.args["tags"], "match": "all" if match_all else "any"}
+
+        get_posts, pagination = paginate(
+            query,
+            "post-list",
+            current_app.config["POSTS_PER_PAGE"],
+            keys=(Post.timestamp.desc(), Post.id.desc()),
+            estimate_table=estimate_table,
+            **url_values,
         )
-        get_posts = pagination.items
-        prev = None
-        if pagination.has_prev:
-            prev = url_for("post-list", page=page - 1)
-        _next = None
-        if pagination.has_next:
-            _next = url_for("post-list", page=page + 1)
 
-        posts_schema = PostSchema(many=True, exclude=["user_id", "body", "comments"])
-        posts = posts_schema.dump(get_posts)
+        with metrics.serializing():
+            posts = dump_post_summaries(get_posts)
 
         return response_with(
-            resp.SUCCESS_200,
-            value={"posts": posts},
-            pagination={"prev": prev, "next": _next, "count": pagination.total},
+            resp.SUCCESS_200, value={"posts": posts}, pagination=pagination
         )
 
     @classmethod
@@ -41,62 +65,174 @@ class PostListResource(Resource):
         author = get_current_user()
         data = request.get_json()
         data["user_id"] = author.id
-        incoming_tags = None
-
-        if data["tags"] is not None:
-            incoming_tags = [{"name": tag} for tag in data["tags"]]
-
-        del data["tags"]
+        tag_names = _tag_names(data.pop("tags", None))
 
         post_schema = PostSchema(exclude=["tags"], partial=True)
         post = post_schema.load(data)
+        post.tags = Tag.resolve_names(tag_names)
 
         post.add_to_session()
-
-        for _tag in incoming_tags:
-            tag = TagSchema().load(_tag)
-            tag_in_db = Tag.query.filter_by(name=tag.name).first()
-            if tag_in_db:
-                post.tags.append(tag_in_db)
-            else:
-                post.tags.append(tag)
-
+        post.db_flush()
+        search.index_posts([post])
         post.db_commit()
-        result = PostSchema().dump(post)
+        cache.invalidate(*post_groups(post))
+        if tag_names:
+            cache.invalidate("tags")
+        with metrics.serializing():
+            result = PostSchema().dump(post)
 
         return response_with(resp.SUCCESS_201, value={"post": result})
 
 
+class PostBulkResource(Resource):
+    @classmethod
+    @jwt_required
+    def post(cls):
+        """Create a batch of posts and their tags in one transaction.
+
+        Takes `{"posts": [{"title", "body", "tags"}, ...]}`. Either every post
+        is created or, on any invalid one, none is.
+        """
+        author = get_current_user()
+        items = (request.get_json() or {}).get("posts")
+        limit = current_app.config["POSTS_BULK_MAX"]
+        if not isinstance(items, list) or not items:
+            return response_with(resp.BAD_REQUESTS_400, message="Missing posts.")
+        if len(items) > limit:
+            return response_with(
+                resp.BAD_REQUESTS_400, message=f"At most {limit} posts per request."
+            )
+
+        tag_names, rows = [], []
+        for item in items:
+            if not isinstance(item, dict):
+                return response_with(resp.BAD_REQUESTS_400, message="Posts must be objects.")
+            item = dict(item, user_id=author.id)
+            names = _tag_names(item.pop("tags", None))
+            tag_names.append(names)
+            rows.append(item)
+
+        posts = PostSchema(many=True, exclude=["tags"], partial=True).load(rows)
+        tags = {
+            tag.name: tag
+            for tag in Tag.resolve_names(name for names in tag_names for name in names)
+        }
+        for post, names in zip(posts, tag_names):
+            post.tags = [tags[name] for name in names]
+
+        db.session.add_all(posts)
+        db.session.flush()
+        search.index_posts(posts)
+        with metrics.serializing():
+            result = PostSchema(many=True, only=["id", "title", "timestamp", "tags"]).dump(posts)
+        db.session.commit()
+
+        cache.invalidate("posts", f"user-posts:{author.username}")
+        if tags:
+            cache.invalidate("tags")
+        return response_with(resp.SUCCESS_201, value={"posts": result})
+
+
+def _tag_names(tags) -> list:
+    """Validated tag names from a request body, duplicates dropped."""
+    if not tags:
+        return []
+    if not isinstance(tags, list):
+        raise ValidationError({"tags": ["Not a valid list."]})
+    errors = TagSchema(many=True).validate([{"name": name} for name in tags])
+    if errors:
+        raise ValidationError({"tags": errors})
+    return list(dict.fromkeys(tags))
+
+
+class PostSearchResource(Resource):
+    @classmethod
+    def get(cls):
+        """Posts matching `q`, best match first, with highlighted snippets."""
+        query = request.args.get("q", "")
+        if not terms(query):
+            return response_with(resp.BAD_REQUESTS_400, message="Missing search query q.")
+
+        cursor = request.args.get("cursor")
+        after = decode_cursor_values(cursor, (float, int)) if cursor else None
+        per_page = current_app.config["POSTS_PER_PAGE"]
+        hits = search.search(query, per_page + 1, after)
+        _next = None
+        if len(hits) > per_page:
+            hits = hits[:per_page]
+            last = hits[-1]
+            _next = url_for(
+                "post-search", q=query, cursor=encode_cursor([last.score, last.post_id])
+            )
+
+        found = Post.find_summaries().filter(Post.id.in_([hit.post_id for hit in hits]))
+        posts_by_id = {post.id: post for post in found}
+        # hits of posts deleted since the search ran are skipped
+        hits = [hit for hit in hits if hit.post_id in posts_by_id]
+        with metrics.serializing():
+            posts = dump_post_summaries([posts_by_id[hit.post_id] for hit in hits])
+        for result, hit in zip(posts, hits):
+            result["highlight"] = {"title": hit.title, "body": hit.body}
+
+        return response_with(
+            resp.SUCCESS_200,
+            value={"posts": posts},
+            pagination={"prev": None, "next": _next, "cursor": cursor},
+        )
+
+
 class PostResource(Resource):
     @classmethod
+    @cache.cached(lambda _id: f"post:{_id}")
     def get(cls, _id):
         get_post = Post.query.get_or_404(_id)
-        post = PostSchema().dump(get_post)
-        return response_with(resp.SUCCESS_200, value={"post": post})
+        unchanged = not_modified(get_post.etag, get_post.updated_at)
+        if unchanged:
+            return unchanged
+        with metrics.serializing():
+            post = post_schema.dump(get_post)
+        return response_with(
+            resp.SUCCESS_200,
+            value={"post": post},
+            etag=get_post.etag,
+            last_modified=get_post.updated_at,
+        )
 
     @classmethod
+    @jwt_required
     def patch(cls, _id):
-        data = request.get_json()
-        post = Post.query.get_or_404(_id)
-        post_schema = PostSchema()
-        updated_post = post_schema.load(data, instance=post, partial=True)
-        result = post_schema.dump(updated_post.save_to_db())
-        return response_with(resp.SUCCESS_200, value={"post": result})
+        return cls._update(_id, partial=True)
 
     @classmethod
     @jwt_required
     def put(cls, _id):
+        return cls._update(_id, partial=False)
+
+    @classmethod
+    def _update(cls, _id, partial: bool):
         user = get_current_user()
         data = request.get_json()
         post = Post.query.get_or_404(_id)
-        if post.author != user and user.is_admin is not True:
-            if post.author != user and user.is_admin is not True:
-                return response_with(
-                    resp.FORBIDDEN_403, message="You are not the author of this post."
-                )
-        post_schema = PostSchema()
+        if post.user_id != user.id and user.is_admin is not True:
+            return response_with(
+                resp.FORBIDDEN_403, message="You are not the author of this post."
+            )
+        # tags go through resolve_names like on create, the schema would insert existing ones again
+        data["user_id"] = post.user_id
+        replace_tags = "tags" in data
+        tag_names = _tag_names(data.pop("tags", None))
+        post_schema = PostSchema(exclude=["tags"], partial=partial)
         updated_post = post_schema.load(data, instance=post)
-        result = post_schema.dump(updated_post.save_to_db())
+        if replace_tags:
+            updated_post.tags = Tag.resolve_names(tag_names)
+        updated_post.updated_at = datetime.utcnow()
+        search.index_posts([updated_post])
+        updated_post.save_to_db()
+        with metrics.serializing():
+            result = PostSchema().dump(updated_post)
+        cache.invalidate(*post_groups(updated_post))
+        if replace_tags:
+            cache.invalidate("tags")
         return response_with(resp.SUCCESS_200, value={"post": result})
 
     @classmethod
@@ -104,46 +240,95 @@ class PostResource(Resource):
     def delete(cls, _id):
         post = Post.query.get_or_404(_id)
         user = get_current_user()
-        if post.author != user and user.is_admin is not True:
+        if post.user_id != user.id and user.is_admin is not True:
             return response_with(
                 resp.FORBIDDEN_403, message="You are not the author of this post."
             )
+        groups = post_groups(post)
+        search.remove_posts([post.id])
         post.delete_from_db()
+        cache.invalidate(*groups)
         return response_with(resp.SUCCESS_204)
 
 
 class UserPostResource(Resource):
     @classmethod
+    @cache.cached(lambda username: f"user-posts:{username}")
     def get(cls, username: str):
-        page = request.args.get("page", 1, type=int)
         user = User.find_by_username(username)
         if not user:
             return response_with(
                 resp.SERVER_ERROR_404,
                 message=f"user with username: {username} not found.",
             )
-        pagination = (
-            Post.query.filter_by(author=user)
-            .order_by(Post.timestamp.desc())
-            .paginate(
-                page, per_page=current_app.config["POSTS_PER_PAGE"], error_out=False
-            )
+        get_posts, pagination = paginate(
+            Post.find_summaries()
+            .filter_by(author=user)
+            .order_by(Post.timestamp.desc()),
+            "user-posts-list",
+            current_app.config["POSTS_PER_PAGE"],
+            keys=(Post.timestamp.desc(), Post.id.desc()),
+            username=username,
         )
-        get_posts = pagination.items
-        prev = None
-        if pagination.has_prev:
-            prev = url_for("post-list", page=page - 1)
-        _next = None
-        if pagination.has_next:
-            _next = url_for("post-list", page=page + 1)
+        Post.prefetch_confirmed_comments(get_posts)
 
-        posts_schema = PostSchema(many=True, exclude=["user_id", "body"])
-        posts = posts_schema.dump(get_posts)
+        with metrics.serializing():
+            posts = dump_post_summaries(get_posts, comments=True)
+
+        return response_with(
+            resp.SUCCESS_200, value={"posts": posts}, pagination=pagination
+        )
+
+
+class TagPostListResource(Resource):
+    @classmethod
+    @cache.cached(lambda _id: "posts")
+    def get(cls, _id):
+        """Most recent posts carrying the tag."""
+        tag = Tag.query.get_or_404(_id)
+        query = Post.filter_by_tags(Post.find_summaries(), [tag.id]).order_by(
+            Post.timestamp.desc(), Post.id.desc()
+        )
+        get_posts, pagination = paginate(
+            query,
+            "tag-posts-list",
+            current_app.config["POSTS_PER_PAGE"],
+            keys=(Post.timestamp.desc(), Post.id.desc()),
+            _id=tag.id,
+        )
+
+        with metrics.serializing():
+            posts = dump_post_summaries(get_posts)
 
         return response_with(
             resp.SUCCESS_200,
-            value={"posts": posts},
-            pagination={"prev": prev, "next": _next, "count": pagination.total},
+            value={"tag": {"id": tag.id, "name": tag.name}, "posts": posts},
+            pagination=pagination,
+        )
+
+
+class PostCommentListResource(Resource):
+    @classmethod
+    @cache.cached(lambda post_id: f"post:{post_id}")
+    def get(cls, post_id: int):
+        """A post's confirmed comments, most recent first.
+
+        The first of them are embedded in the post, its `comments_next` link
+        continues here with a cursor.
+        """
+        if db.session.query(Post.id).filter_by(id=post_id).first() is None:
+            return response_with(resp.SERVER_ERROR_404, message="Post not found.")
+        get_comments, pagination = paginate(
+            Post.find_confirmed_comments(post_id),
+            "post-comments",
+            current_app.config["COMMENTS_PER_PAGE"],
+            keys=(Comment.timestamp.desc(), Comment.id.desc()),
+            post_id=post_id,
+        )
+        with metrics.serializing():
+            comments = comments_schema.dump(get_comments)
+        return response_with(
+            resp.SUCCESS_200, value={"comments": comments}, pagination=pagination
         )
 
 
@@ -151,13 +336,19 @@ class PostCommentResource(Resource):
     @classmethod
     @jwt_required
     def post(cls, post_id: int):
-        post = Post.query.get_or_404(post_id)
+        post = Post.query.options(joinedload(Post.author)).get_or_404(post_id)
         user = get_current_user()
         data = request.get_json()
         data['user_id'] = user.id
         data['post_id'] = post.id
+        groups = post_groups(post)
         comment = CommentSchema().load(data)
-        result = CommentSchema(exclude=('confirmed',)).dump(comment.save_to_db())
+        if comment.confirmed is not False:  # column default is confirmed
+            Post.update_comments_count(post.id, 1)
+        comment.save_to_db()
+        with metrics.serializing():
+            result = CommentSchema(exclude=('confirmed',)).dump(comment)
+        cache.invalidate(*groups)
 
         return response_with(resp.SUCCESS_201, value=result)
 
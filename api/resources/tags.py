@@ -1,9 +1,14 @@
-from flask import request, current_app, url_for
+from flask import request, current_app
 from flask_restful import Resource
+from marshmallow import ValidationError
 
 from api.models.tag import Tag, TagSchema
 from api.utils import responses as resp
+from api.utils.database import db
 from api.utils.responses import response_with
+from api.utils.pagination import paginate
+from api.utils.cache import cache
+from api.utils.metrics import metrics
 
 tags_schema = TagSchema(many=True)
 tag_schema = TagSchema()
@@ -11,31 +16,31 @@ tag_schema = TagSchema()
 
 class TagListResource(Resource):
     @classmethod
+    @cache.cached(lambda: "tags")
     def get(cls):
-        page = request.args.get("page", 1, type=int)
-        pagination = Tag.query.paginate(
-            page, per_page=current_app.config["TAGS_PER_PAGE"], error_out=False
-        )
-        get_tags = pagination.items
-        prev = None
-        if pagination.has_prev:
-            prev = url_for("tag-list", page=page - 1)
-        _next = None
-        if pagination.has_next:
-            _next = url_for("tag-list", page=page + 1)
-
-        tags = tags_schema.dump(get_tags)
-        return response_with(
-            resp.SUCCESS_200,
-            value={"tags": tags},
-            pagination={"prev": prev, "next": _next, "count": pagination.total},
+        get_tags, pagination = paginate(
+            Tag.query,
+            "tag-list",
+            current_app.config["TAGS_PER_PAGE"],
+            keys=(Tag.id.asc(),),
+            estimate_table=Tag.__table__,
         )
 
+        with metrics.serializing():
+            tags = tags_schema.dump(get_tags)
+        return response_with(resp.SUCCESS_200, value={"tags": tags}, pagination=pagination)
+
     @classmethod
     def post(cls):
         data = request.get_json()
-        tag = TagSchema().load(data)
-        result = TagSchema().dump(tag.save_to_db())
+        errors = tag_schema.validate(data)
+        if errors:
+            raise ValidationError(errors)
+        tag = Tag.resolve_names([data["name"]])[0]
+        db.session.commit()
+        with metrics.serializing():
+            result = tag_schema.dump(tag)
+        cache.invalidate("tags")
         return response_with(resp.SUCCESS_201, value={"tag": result})
 
 
@@ -43,5 +48,6 @@ class TagResource(Resource):
     @classmethod
     def get(cls, _id):
         get_tag = Tag.query.get_or_404(_id)
-        tag = tag_schema.dump(get_tag)
+        with metrics.serializing():
+            tag = tag_schema.dump(get_tag)
         return response_with(resp.SUCCESS_200, value={"tag": tag})
@@ -1,6 +1,6 @@
 import traceback
 
-from flask import request, current_app, url_for
+from flask import request, current_app
 from flask_jwt_extended import (
     create_access_token,
     jwt_required,
@@ -12,11 +12,17 @@ from sqlalchemy.exc import IntegrityError
 
 
 from api.models.user import User, UserSchema
+from api.models.post import Post
 from api.models.confirmation import Confirmation
-from api.utils.responses import response_with
+from api.utils.responses import response_with, not_modified
+from api.utils.pagination import paginate
+from api.utils.cache import cache, author_groups
 from api.utils import responses as resp
-from api.auth.blacklist import BLACKLIST
-from api.utils.email import MailgunException
+from api.auth.blacklist import blacklist
+from api.auth.identity import identity_cache
+from api.utils.database import db
+from api.utils.password import hasher, PasswordPoolBusy
+from api.utils.metrics import metrics
 
 USER_NOT_FOUND = "User not found."
 USER_LOGGED_OUT = "User {} successfully logged out."
@@ -24,31 +30,37 @@ USER_ALREADY_EXISTS = "User with this username or email is already exists."
 FAILED_TO_CREATE = "Internal server error. Failed to create user."
 SUCCESS_REGISTER_MESSAGE = "Account created successfully, an email with an activation link has been sent to yor email address."
 
+users_schema = UserSchema(many=True, exclude=("posts", "posts_next"))
+user_schema = UserSchema()
+
 
 class UserRegister(Resource):
     @classmethod
     def post(cls):
         data = request.get_json()
-        user = UserSchema().load(data)
+        try:
+            user = UserSchema().load(data)
+        except PasswordPoolBusy:
+            return response_with(resp.SERVICE_UNAVAILABLE_503, headers={"Retry-After": "1"})
         if User.find_by_email(user.email):
             return response_with(
                 resp.BAD_REQUESTS_400,
                 message=USER_ALREADY_EXISTS,
             )
         try:
-            user.save_to_db()
-            confirmation = Confirmation(user.id)
-            confirmation.save_to_db()
-            user.send_confirmation_email()
+            # user, confirmation and its email are committed together or not at all
+            db.session.add(user)
+            db.session.flush()
+            confirmation = Confirmation(user.id).add_to_session()
+            user.queue_confirmation_email(confirmation)
+            db.session.commit()
             return response_with(resp.SUCCESS_201, message=SUCCESS_REGISTER_MESSAGE)
-        except MailgunException as e:
-            user.delete_from_db()
-            return response_with(resp.SERVER_ERROR_500, message=str(e))
         except IntegrityError as err:
+            db.session.rollback()
             return response_with(resp.BAD_REQUESTS_400, message=USER_ALREADY_EXISTS)
         except:
             traceback.print_exc()
-            user.delete_from_db()
+            db.session.rollback()
             return response_with(resp.SERVER_ERROR_500, message=FAILED_TO_CREATE)
 
 
@@ -56,16 +68,26 @@ class UserLogin(Resource):
     @classmethod
     def post(cls):
         data = request.get_json()
-        current_user = None
+        found = None
         if data.get("email"):
-            current_user = User.find_by_email(data["email"])
+            found = User.find_for_login(email=data["email"])
         elif data.get("username"):
-            current_user = User.find_by_username(data["username"])
-        if not current_user:
+            found = User.find_for_login(username=data["username"])
+        if not found:
             return response_with(resp.SERVER_ERROR_404, message=USER_NOT_FOUND)
-        if current_user.check_password(data["password"]):
-            confirmation = current_user.most_recent_confirmation
-            if confirmation and confirmation.confirmed:
+        current_user, confirmed = found
+        try:
+            password_matches = current_user.check_password(data["password"])
+        except PasswordPoolBusy:
+            return response_with(resp.SERVICE_UNAVAILABLE_503, headers={"Retry-After": "1"})
+        if password_matches:
+            if hasher.needs_rehash(current_user.password_hash):
+                try:
+                    current_user.password = data["password"]
+                    current_user.save_to_db()
+                except PasswordPoolBusy:
+                    pass  # upgrade on a later login
+            if confirmed:
                 access_token = create_access_token(identity=current_user.username)
                 return response_with(
                     resp.SUCCESS_200,
@@ -80,8 +102,9 @@ class UserLogout(Resource):
     @classmethod
     @jwt_required
     def post(cls):
-        jti = get_raw_jwt()["jti"]  # jti is `JWT ID`, a unique identifier for a JWT.
-        BLACKLIST.add(jti)
+        raw_jwt = get_raw_jwt()
+        # jti is `JWT ID`, a unique identifier for a JWT.
+        blacklist.revoke(raw_jwt["jti"], expires_at=raw_jwt.get("exp"))
         username = get_jwt_identity()
         return response_with(resp.SUCCESS_200, message=USER_LOGGED_OUT.format(username))
 
@@ -90,26 +113,19 @@ class UserListResource(Resource):
     @classmethod
     @jwt_required
     def get(cls):
-
-        page = request.args.get("page", 1, type=int)
-        pagination = User.query.paginate(
-            page, per_page=current_app.config["USERS_PER_PAGE"], error_out=False
+        get_users, pagination = paginate(
+            User.find_listed(),
+            "user-list",
+            current_app.config["USERS_PER_PAGE"],
+            keys=(User.id.asc(),),
+            estimate_table=User.__table__,
         )
-        get_users = pagination.items
-        prev = None
-        if pagination.has_prev:
-            prev = url_for("user-list", page=page - 1)
-        _next = None
-        if pagination.has_next:
-            _next = url_for("user-list", page=page + 1)
 
-        users_schema = UserSchema(many=True, exclude=("posts",))
-        users = users_schema.dump(get_users)
+        with metrics.serializing():
+            users = users_schema.dump(get_users)
 
         return response_with(
-            resp.SUCCESS_200,
-            value={"users": users},
-            pagination={"prev": prev, "next": _next, "count": pagination.total},
+            resp.SUCCESS_200, value={"users": users}, pagination=pagination
         )
 
 
@@ -117,22 +133,41 @@ class UserResource(Resource):
     @classmethod
     def get(cls, _id):
         get_user = User.query.get_or_404(_id)
-        user = UserSchema().dump(get_user)
-        return response_with(resp.SUCCESS_200, value={"user": user})
+        # no Last-Modified, deleting one of the embedded posts leaves no newer timestamp
+        unchanged = not_modified(get_user.etag)
+        if unchanged:
+            return unchanged
+        with metrics.serializing():
+            user = user_schema.dump(get_user)
+        return response_with(resp.SUCCESS_200, value={"user": user}, etag=get_user.etag)
 
     @classmethod
     def put(cls, _id):
         user = User.query.get_or_404(_id)
-        updatable_fields = ("first_name", "last_name", "username", "avatar", "bio")
+        updatable_fields = ("first_name", "last_name", "username", "bio")
         data = request.get_json()
 
+        previous_username = user.username
         user_schema = UserSchema(only=updatable_fields)
         updated_user_info = user_schema.load(data, instance=user, partial=True)
-        result = UserSchema(only=updatable_fields).dump(updated_user_info.save_to_db())
+        renamed = updated_user_info.username != previous_username
+        # posts embed their author's name, their ETags and cached copies must change with it
+        post_ids = Post.touch_by_author(user.id) if renamed else []
+        updated_user_info.save_to_db()
+        with metrics.serializing():
+            result = UserSchema(only=updatable_fields).dump(updated_user_info)
+        identity_cache.invalidate(previous_username, updated_user_info.username)
+        if renamed:
+            cache.invalidate(*author_groups((previous_username, updated_user_info.username), post_ids))
         return response_with(resp.SUCCESS_200, value={"user": result})
 
     @classmethod
     def delete(cls, _id):
         user = User.query.get_or_404(_id)
+        Post.discount_comments_of_user(user.id)
+        post_ids = Post.touch_by_author(user.id)  # they lose their author
+        username = user.username
         user.delete_from_db()
+        identity_cache.invalidate(username)
+        cache.invalidate(*author_groups((username,), post_ids))
         return response_with(resp.SUCCESS_204)
@@ -1,6 +1,18 @@
+from api.resources.cache import ResponseCacheStats
 from api.resources.confirmation import ConfirmationByUser, ConfirmationResource
-from api.resources.image import ImageUpload, Image, AvatarUpload, Avatar
-from api.resources.posts import PostListResource, PostResource, UserPostResource, PostCommentResource
+from api.resources.export import ExportResource
+from api.resources.metrics import MetricsResource
+from api.resources.image import ImageUpload, Image, AvatarUpload, Avatar, AvatarVersion
+from api.resources.posts import (
+    PostBulkResource,
+    PostListResource,
+    PostResource,
+    PostSearchResource,
+    TagPostListResource,
+    UserPostResource,
+    PostCommentListResource,
+    PostCommentResource,
+)
 from api.resources.tags import TagListResource, TagResource
 from api.resources.comments import CommentListResource, CommentResource
 from api.resources.users import (
@@ -25,13 +37,27 @@ def initialize_routes(api):
     api.add_resource(Image, "/image/<string:filename>")
     api.add_resource(AvatarUpload, "/upload/avatar")
     api.add_resource(Avatar, "/avatar/<string:username>")
+    api.add_resource(
+        AvatarVersion, "/avatar/<string:username>/<string:version>", endpoint="avatar-version"
+    )
     api.add_resource(PostListResource, "/posts", endpoint="post-list")
+    api.add_resource(PostBulkResource, "/posts/bulk", endpoint="post-bulk")
+    api.add_resource(PostSearchResource, "/posts/search", endpoint="post-search")
     api.add_resource(PostCommentResource, '/posts/<int:post_id>/comment', endpoint='post-comment')
+    api.add_resource(
+        PostCommentListResource, "/posts/<int:post_id>/comments", endpoint="post-comments"
+    )
     api.add_resource(PostResource, "/posts/<int:_id>")
     api.add_resource(TagListResource, "/tags", endpoint="tag-list")
     api.add_resource(TagResource, "/tags/<int:_id>")
+    api.add_resource(
+        TagPostListResource, "/tags/<int:_id>/posts", endpoint="tag-posts-list"
+    )
     api.add_resource(ConfirmationResource, "/user_confirm/<string:confirmation_id>")
     api.add_resource(ConfirmationByUser, "/confirmation/user/<int:user_id>")
     api.add_resource(CommentListResource, '/comments', endpoint='comment-list')
     api.add_resource(CommentResource, '/comments/<int:comment_id>', endpoint='comment')
+    api.add_resource(ResponseCacheStats, "/cache/stats", endpoint="cache-stats")
+    api.add_resource(MetricsResource, "/metrics", endpoint="metrics")
+    api.add_resource(ExportResource, "/export/<string:kind>", endpoint="export")
 
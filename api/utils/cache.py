@@ -0,0 +1,259 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from functools import wraps
+from time import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from flask import current_app, request
+
+from api.utils.codec import codec
+from api.utils.processes import SQLiteConnections
+
+# (body, status, headers) of a cached response
+Entry = Tuple[bytes, int, list]
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class LocalBackend:
+    """In-process LRU cache with per-entry TTL. Every entry belongs to one group."""
+
+    def __init__(self, max_entries: int, stats: CacheStats):
+        self.max_entries = max_entries
+        self.stats = stats
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key: (group, expires_at, value)
+        self._groups = {}  # group: set of keys
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            group, expires_at, value = item
+            if expires_at <= time():
+                self._remove(key)
+                self.stats.incr("evictions")
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, group: str, ttl: int) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (group, time() + ttl, value)
+            self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats.incr("evictions")
+
+    def delete_groups(self, groups: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for group in groups:
+                for key in list(self._groups.get(group, ())):
+                    self._remove(key)
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def _remove(self, key: str) -> None:
+        group, _, _ = self._entries.pop(key)
+        keys = self._groups.get(group)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+
+class SQLiteBackend:
+    """Cache kept in a SQLite file so every worker process on the host shares it."""
+
+    def __init__(self, path: str, max_entries: int, stats: CacheStats):
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = stats
+        self._connections = SQLiteConnections(path, ("journal_mode=WAL", "synchronous=NORMAL"))
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, grp TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, used_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_response_cache_grp ON response_cache (grp)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_response_cache_used_at "
+            "ON response_cache (used_at)"
+        )
+
+    def _connection(self):
+        return self._connections.get()
+
+    def get(self, key: str):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT expires_at, value FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time()
+        if row[0] <= now:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self.stats.incr("evictions")
+            return None
+        conn.execute("UPDATE response_cache SET used_at = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[1])
+
+    def set(self, key: str, value, group: str, ttl: int) -> None:
+        conn = self._connection()
+        now = time()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?)",
+            (key, group, now + ttl, now, pickle.dumps(value)),
+        )
+        overflow = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        overflow -= self.max_entries
+        if overflow > 0:
+            cursor = conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY used_at LIMIT ?)",
+                (overflow,),
+            )
+            self.stats.incr("evictions", cursor.rowcount)
+
+    def delete_groups(self, groups: Iterable[str]) -> int:
+        groups = list(groups)
+        if not groups:
+            return 0
+        placeholders = ",".join("?" * len(groups))
+        cursor = self._connection().execute(
+            f"DELETE FROM response_cache WHERE grp IN ({placeholders})", groups
+        )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM response_cache")
+
+
+class NullBackend:
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, value, group: str, ttl: int) -> None:
+        pass
+
+    def delete_groups(self, groups: Iterable[str]) -> int:
+        return 0
+
+    def clear(self) -> None:
+        pass
+
+
+class ResponseCache:
+    """Caches the full response of public GET endpoints.
+
+    Cached entries are grouped (e.g. `post:3`, `posts`) and writes evict the
+    groups they affect with `invalidate`. Evictions only reach the workers
+    sharing the backend, the local one is for single process deployments.
+    """
+
+    def __init__(self, app=None):
+        self.stats = CacheStats()
+        self.backend = NullBackend()
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        backend = app.config.get("RESPONSE_CACHE_BACKEND", "null")
+        size = app.config.get("RESPONSE_CACHE_SIZE", 1024)
+        self.ttl = app.config.get("RESPONSE_CACHE_TTL", 60)
+        if backend == "local":
+            self.backend = LocalBackend(size, self.stats)
+        elif backend == "sqlite":
+            path = app.config["RESPONSE_CACHE_PATH"]
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.backend = SQLiteBackend(path, size, self.stats)
+        elif backend == "null":
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND {backend!r}")
+        app.extensions["response_cache"] = self
+
+    def cached(self, group: Callable[..., str]):
+        """Serve a GET resource from the cache. `group` maps the view kwargs to the entry's group."""
+
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                # compressed bodies are cached as they were sent, one entry per content coding
+                key = f"view:{request.full_path}:{codec.negotiate() or 'identity'}"
+                entry: Optional[Entry] = self.backend.get(key)
+                if entry is not None:
+                    self.stats.incr("hits")
+                    body, status, headers = entry
+                    response = current_app.response_class(
+                        body, status=status, headers=headers
+                    )
+                    return response.make_conditional(request)
+
+                self.stats.incr("misses")
+                response = fn(*args, **kwargs)
+                if response.status_code == 200 and not response.direct_passthrough:
+                    entry = (response.get_data(), 200, list(response.headers.items()))
+                    self.backend.set(key, entry, group(**kwargs), self.ttl)
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, *groups: str) -> None:
+        removed = self.backend.delete_groups(groups)
+        if removed:
+            self.stats.incr("evictions", removed)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+cache = ResponseCache()
+
+
+def post_groups(post) -> Tuple[str, ...]:
+    """Cache groups whose body shows the given post."""
+    groups = ("posts", f"post:{post.id}")
+    if post.author is not None:
+        groups += (f"user-posts:{post.author.username}",)
+    return groups
+
+
+def author_groups(usernames: Iterable[str], post_ids: Iterable[int]) -> Tuple[str, ...]:
+    """Cache groups whose body shows the author of the given posts, under any of `usernames`."""
+    return (
+        ("posts",)
+        + tuple(f"user-posts:{username}" for username in usernames)
+        + tuple(f"post:{post_id}" for post_id in post_ids)
+    )
@@ -0,0 +1,132 @@
+import gzip
+import importlib.util
+import logging
+from time import perf_counter
+from typing import Optional
+
+from flask import current_app, jsonify, request
+
+from api.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("br", "gzip")  # preferred first when the client accepts both equally
+
+
+class ResponseCodec:
+    """Encodes response bodies to JSON and compresses them for clients that accept it.
+
+    JSON_BACKEND "orjson" is several times faster than the standard library
+    encoder behind jsonify, "auto" uses it when installed. It can't escape
+    non-ASCII characters, with JSON_AS_ASCII bodies are encoded with jsonify
+    whatever the backend. Bodies of at least
+    COMPRESS_MIN_SIZE bytes are sent with the best content coding the
+    client's Accept-Encoding allows, brotli only if the brotli package is
+    installed.
+    """
+
+    def __init__(self, app=None):
+        self.orjson = None
+        self.sort_keys = True
+        self.as_ascii = True
+        self.min_size = 0
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        self._compressors = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        backend = app.config["JSON_BACKEND"]
+        if backend not in ("auto", "orjson", "json"):
+            raise ValueError(f"Unknown JSON_BACKEND {backend!r}")
+        self.orjson = None
+        if backend != "json" and importlib.util.find_spec("orjson") is not None:
+            import orjson
+
+            self.orjson = orjson
+        elif backend == "orjson":
+            logger.warning("orjson is not installed, responses are encoded with the json module.")
+        self.sort_keys = app.config.get("JSON_SORT_KEYS", True)
+        self.as_ascii = app.config.get("JSON_AS_ASCII", True)
+
+        self.min_size = app.config["COMPRESS_MIN_SIZE"]
+        self.gzip_level = app.config["COMPRESS_GZIP_LEVEL"]
+        self.brotli_quality = app.config["COMPRESS_BROTLI_QUALITY"]
+        self._compressors = {}
+        if app.config["COMPRESS_ENABLED"]:
+            if importlib.util.find_spec("brotli") is not None:
+                import brotli
+
+                self._compressors["br"] = lambda body: brotli.compress(
+                    body, quality=self.brotli_quality
+                )
+            # mtime=0 keeps the output identical for identical bodies
+            self._compressors["gzip"] = lambda body: gzip.compress(
+                body, self.gzip_level, mtime=0
+            )
+        app.extensions["response_codec"] = self
+
+    def jsonify(self, value: dict, status: int, headers: dict):
+        """Response with `value` as its JSON body."""
+        started = perf_counter()
+        if self.orjson is None or self.as_ascii:
+            response = jsonify(value)
+        else:
+            option = self.orjson.OPT_NON_STR_KEYS | self.orjson.OPT_APPEND_NEWLINE
+            # datetimes go through Flask's encoder, like with jsonify
+            option |= self.orjson.OPT_PASSTHROUGH_DATETIME
+            if self.sort_keys:
+                option |= self.orjson.OPT_SORT_KEYS
+            body = self.orjson.dumps(
+                value, default=current_app.json_encoder().default, option=option
+            )
+            response = current_app.response_class(
+                body, mimetype=current_app.config["JSONIFY_MIMETYPE"]
+            )
+        response.status_code = status
+        response.headers.update(headers)
+        metrics.observe_encoding(perf_counter() - started)
+        return response
+
+    def negotiate(self) -> Optional[str]:
+        """Content coding to compress the current response with, None for none."""
+        if not self._compressors:
+            return None
+        accepted = request.accept_encodings
+        best, best_quality = None, 0
+        for encoding in ENCODINGS:
+            if encoding in self._compressors and accepted[encoding] > best_quality:
+                best, best_quality = encoding, accepted[encoding]
+        return best
+
+    def compress(self, response) -> None:
+        """Compress the body of `response` in place if it's worth it and the client accepts it.
+
+        An ETag already set is made weak, the compressed bytes differ from
+        the ones it was computed from.
+        """
+        if not self._compressors or response.direct_passthrough:
+            return
+        if "Content-Encoding" in response.headers:
+            return
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return
+        response.vary.add("Accept-Encoding")
+        encoding = self.negotiate()
+        if encoding is None:
+            return
+        started = perf_counter()
+        compressed = self._compressors[encoding](body)
+        metrics.observe_compression(encoding, perf_counter() - started, len(body), len(compressed))
+        if len(compressed) >= len(body):
+            return
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+
+
+codec = ResponseCodec()
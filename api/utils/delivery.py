@@ -0,0 +1,67 @@
+import mimetypes
+import os
+from typing import Optional
+from urllib.parse import quote
+
+from flask import current_app, send_file
+
+from api.utils.responses import not_modified
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def send_image(
+    path: str,
+    mimetype: Optional[str] = None,
+    etag: Optional[str] = None,
+    max_age: int = 0,
+    public: bool = False,
+    immutable: bool = False,
+):
+    """Response delivering an image file, with Range and conditional request support.
+
+    IMAGE_DELIVERY picks who sends the bytes once the view has authorized the
+    request and resolved the path:
+
+    - "app": the worker, through the WSGI server's file wrapper, which uses
+      zero-copy sendfile() under e.g. gunicorn.
+    - "x-accel-redirect": nginx, from an internal location serving
+      UPLOADED_IMAGES_DEST under IMAGE_ACCEL_PREFIX::
+
+          location /protected-images/ { internal; alias /srv/app/static/images/; }
+
+    - "x-sendfile": Apache mod_xsendfile or lighttpd, given the absolute path.
+
+    When offloaded the front server answers Range requests and 404s for
+    missing files itself. Raises FileNotFoundError in "app" mode.
+    """
+    response = not_modified(etag) if etag is not None else None
+    if response is None:
+        mode = current_app.config["IMAGE_DELIVERY"]
+        if mode == "app":
+            response = send_file(
+                path, mimetype=mimetype, add_etags=etag is None, conditional=True
+            )
+        else:
+            mimetype = mimetype or mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response = current_app.response_class(mimetype=mimetype)
+            path = os.path.abspath(path)
+            if mode == "x-sendfile":
+                response.headers["X-Sendfile"] = path
+            elif mode == "x-accel-redirect":
+                root = os.path.abspath(current_app.config["UPLOADED_IMAGES_DEST"])
+                relative = os.path.relpath(path, root).replace(os.sep, "/")
+                prefix = current_app.config["IMAGE_ACCEL_PREFIX"].rstrip("/")
+                response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(relative)}"
+            else:
+                raise ValueError(f"Unknown IMAGE_DELIVERY {mode!r}")
+        if etag is not None:
+            response.set_etag(etag)
+
+    directives = ["public" if public else "private"]
+    if immutable:
+        directives += [f"max-age={IMMUTABLE_MAX_AGE}", "immutable"]
+    else:
+        directives.append(f"max-age={max_age}")
+    response.headers["Cache-Control"] = ", ".join(directives)
+    return response
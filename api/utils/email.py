@@ -1,10 +1,13 @@
 import os
+import threading
 from typing import List
-from requests import Response, post
+
+from requests import Response, Session, RequestException
+from requests.adapters import HTTPAdapter
 
 FAILED_LOAD_API_KEY = "Failed to load Mailgun API key."
 FAILED_LOAD_DOMAIN = "Failed to load Mailgun domain."
-ERROR_SENDING_EMAIL = "Error in sending confirmation email. user registration failed."
+ERROR_SENDING_EMAIL = "Error in sending email."
 
 
 class MailgunException(Exception):
@@ -15,10 +18,26 @@ class MailgunException(Exception):
 class Mailgun:
     MAILGUN_DOMAIN = os.environ.get("MAILGUN_DOMAIN")
     MAILGUN_API_KEY = os.environ.get("MAILGUN_API_KEY")
+    # point at a local fake (see api.utils.fake_mail) to run without Mailgun
+    MAILGUN_API_URL = os.environ.get("MAILGUN_API_URL", "https://api.mailgun.net/v3")
+    TIMEOUT = (3.05, 10)  # connect, read
 
     FROM_TITLE = "Blogging REST API"
     FROM_EMAIL = f"mailgun@{MAILGUN_DOMAIN}"
 
+    _local = threading.local()
+
+    @classmethod
+    def session(cls) -> Session:
+        """Keep-alive HTTP session, one per thread since Session isn't thread-safe."""
+        session = getattr(cls._local, "session", None)
+        if session is None:
+            session = Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            cls._local.session = session
+        return session
+
     @classmethod
     def send_email(cls, to: List[str], subject: str, text: str, html: str) -> Response:
         if cls.MAILGUN_API_KEY is None:
@@ -27,17 +46,21 @@ class Mailgun:
         if cls.MAILGUN_DOMAIN is None:
             raise MailgunException(FAILED_LOAD_DOMAIN)
 
-        response = post(
-            f"https://api.mailgun.net/v3/{cls.MAILGUN_DOMAIN}/messages",
-            auth=("api", cls.MAILGUN_API_KEY),
-            data={
-                "from": f"{cls.FROM_TITLE} <{cls.FROM_EMAIL}>",
-                "to": to,
-                "subject": subject,
-                "text": text,
-                "html": html,
-            },
-        )
+        try:
+            response = cls.session().post(
+                f"{cls.MAILGUN_API_URL}/{cls.MAILGUN_DOMAIN}/messages",
+                auth=("api", cls.MAILGUN_API_KEY),
+                data={
+                    "from": f"{cls.FROM_TITLE} <{cls.FROM_EMAIL}>",
+                    "to": to,
+                    "subject": subject,
+                    "text": text,
+                    "html": html,
+                },
+                timeout=cls.TIMEOUT,
+            )
+        except RequestException as e:
+            raise MailgunException(f"{ERROR_SENDING_EMAIL} {e}")
 
         if response.status_code != 200:
             raise MailgunException(ERROR_SENDING_EMAIL)
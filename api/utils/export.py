@@ -0,0 +1,128 @@
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+from api.utils.database import db
+from api.models.comment import Comment
+from api.models.post import Post, post_tag
+from api.models.tag import Tag
+from api.models.user import User
+
+CHUNK_SIZE = 64 * 1024  # bytes collected before a chunk is sent
+
+
+class Export(NamedTuple):
+    table: db.Table
+    columns: Tuple[str, ...]
+    # rows created or changed at or after `since` have this column >= since
+    since_column: str
+
+
+EXPORTS = {
+    "posts": Export(
+        Post.__table__,
+        ("id", "title", "body", "timestamp", "updated_at", "user_id", "comments_count"),
+        "updated_at",
+    ),
+    "comments": Export(
+        Comment.__table__,
+        ("id", "body", "timestamp", "updated_at", "confirmed", "user_id", "post_id"),
+        "updated_at",
+    ),
+    "users": Export(
+        User.__table__,
+        (
+            "id",
+            "username",
+            "email",
+            "is_admin",
+            "avatar",
+            "timestamp",
+            "updated_at",
+            "first_name",
+            "last_name",
+            "bio",
+        ),
+        "updated_at",
+    ),
+}
+
+
+def parse_since(value: str) -> datetime:
+    """ISO 8601 timestamp as the naive UTC datetime the tables store. Raises ValueError."""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    since = datetime.fromisoformat(value)
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def _post_tags(post_ids) -> dict:
+    tags = {}
+    query = (
+        db.select([post_tag.c.post_id, Tag.name])
+        .select_from(post_tag.join(Tag.__table__))
+        .where(post_tag.c.post_id.in_(post_ids))
+        .order_by(Tag.name)
+    )
+    for post_id, name in db.session.execute(query):
+        tags.setdefault(post_id, []).append(name)
+    return tags
+
+
+def export_rows(kind: str, since: Optional[datetime] = None, batch_size: int = 1000) -> Iterator[dict]:
+    """Rows of an export in id order, read in keyset batches of `batch_size`.
+
+    Only one batch is held at a time and no transaction stays open between
+    batches, so exporting a table of any size takes constant memory and
+    doesn't hold up writers.
+    """
+    spec = EXPORTS[kind]
+    table = spec.table
+    query = db.select([table.c[name] for name in spec.columns]).order_by(table.c.id)
+    if since is not None:
+        query = query.where(table.c[spec.since_column] >= since)
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(table.c.id > last_id).limit(batch_size)).fetchall()
+        records = [dict(zip(spec.columns, row)) for row in rows]
+        if kind == "posts" and records:
+            tags = _post_tags([record["id"] for record in records])
+            for record in records:
+                record["tags"] = tags.get(record["id"], [])
+        db.session.rollback()
+        yield from records
+        if len(rows) < batch_size:
+            return
+        last_id = records[-1]["id"]
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def export_ndjson(
+    kind: str, since: Optional[datetime] = None, batch_size: int = 1000, compress: bool = False
+) -> Iterator[bytes]:
+    """An export as newline-delimited JSON in chunks, gzipped if `compress`."""
+    gzip = zlib.compressobj(wbits=31) if compress else None  # wbits=31 writes a gzip header
+    lines, size = [], 0
+    for record in export_rows(kind, since, batch_size):
+        line = json.dumps(record, default=_default, separators=(",", ":")).encode() + b"\n"
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            chunk = b"".join(lines)
+            lines, size = [], 0
+            chunk = gzip.compress(chunk) if gzip else chunk
+            if chunk:
+                yield chunk
+    chunk = b"".join(lines)
+    if gzip:
+        chunk = gzip.compress(chunk) + gzip.flush()
+    if chunk:
+        yield chunk
@@ -5,6 +5,7 @@ from api.utils.database import db
 from api.models.user import User
 from api.models.post import Post
 from api.models.tag import Tag
+from api.utils.search import search
 
 
 def users(count=100):
@@ -33,10 +34,14 @@ def posts(count=100):
 
     fake = Faker()
     user_count = User.query.count()
+    new_posts = []
     for i in range(count):
         u = User.query.offset(randint(0, user_count - 1)).first()
         p = Post(body=fake.text(), title=fake.text(max_nb_chars=10), author=u)
         db.session.add(p)
+        new_posts.append(p)
+    db.session.flush()
+    search.index_posts(new_posts)
     db.session.commit()
 
 
@@ -0,0 +1,69 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+
+class FakeMailServer:
+    """Local stand-in for the Mailgun messages API.
+
+    Records every message it accepts, so the outbox can be exercised end to
+    end by pointing MAILGUN_API_URL at `server.url`. `fail_first` makes the
+    first N requests fail with 500 to exercise retries.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, fail_first: int = 0):
+        self.messages: List[Dict[str, List[str]]] = []
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(length).decode())
+                with server._lock:
+                    if server.fail_first > 0:
+                        server.fail_first -= 1
+                        status, body = 500, {"message": "fake failure"}
+                    else:
+                        server.messages.append(form)
+                        status = 200
+                        body = {"id": f"<{len(server.messages)}@fake>", "message": "Queued."}
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeMailServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def __enter__(self) -> "FakeMailServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -1,15 +1,28 @@
+import hashlib
 import os
 import re
-from typing import Union
+from typing import Iterator, Tuple, Union
 
-from flask_uploads import UploadSet, IMAGES
+from flask_uploads import UploadSet
 from werkzeug.datastructures import FileStorage
 
+from api.utils.uploads import IMAGE_EXTENSIONS, UploadFile
+
+IMAGES = IMAGE_EXTENSIONS  # flask_uploads' IMAGES without svg
 IMAGE_SET = UploadSet("images", IMAGES)  # set name and allowed extensions
 
 
+class _StreamedImage(FileStorage):
+    """An upload already streamed to an UploadFile, saved by renaming that file."""
+
+    def save(self, dst, buffer_size=16384):
+        self.stream.move(dst)
+
+
 def save_image(image: FileStorage, folder: str = None, name: str = None) -> str:
     """takes fileStorage and saves it to a folder."""
+    if isinstance(image.stream, UploadFile):
+        image = _StreamedImage(image.stream, image.filename, image.name, headers=image.headers)
     return IMAGE_SET.save(image, folder=folder, name=name)
 
 
@@ -44,6 +57,19 @@ def is_filename_safe(file: Union[str, FileStorage]) -> bool:
     return re.match(regex, filename) is not None
 
 
+def is_avatar_name(avatar: str, username: str) -> bool:
+    """Whether a users.avatar value is the `user_<username>.<ext>` file AvatarUpload writes.
+
+    Older rows may hold any client supplied string, never build a path from
+    one that fails this.
+    """
+    return (
+        avatar is not None
+        and is_filename_safe(avatar)
+        and os.path.splitext(avatar)[0] == f"user_{username}"
+    )
+
+
 def get_basename(file: Union[str, FileStorage]) -> str:
     """Return full name of image in the path"""
     filename = _retrieve_filename(file)
@@ -54,3 +80,32 @@ def get_extension(file: Union[str, FileStorage]):
     """Return file extension"""
     filename = _retrieve_filename(file)
     return os.path.splitext(filename)[1]
+
+
+def content_hash(file: Union[str, FileStorage]) -> str:
+    """sha256 of a saved file or an upload. An upload's stream is left at its start."""
+    if isinstance(file, FileStorage) and isinstance(file.stream, UploadFile):
+        return file.stream.hexdigest()  # hashed while it was received
+    digest = hashlib.sha256()
+    if isinstance(file, FileStorage):
+        stream = file.stream
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(64 * 1024), b""):
+            digest.update(chunk)
+        stream.seek(0)
+    else:
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_avatars() -> Iterator[Tuple[str, str]]:
+    """(username, file name) of every avatar on disk, in one directory listing."""
+    folder = IMAGE_SET.path("", "avatars")
+    if not os.path.isdir(folder):
+        return
+    for entry in os.scandir(folder):
+        name, ext = os.path.splitext(entry.name)
+        if entry.is_file() and name.startswith("user_") and ext[1:].lower() in IMAGES:
+            yield name[len("user_"):], entry.name
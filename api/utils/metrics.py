@@ -0,0 +1,388 @@
+import glob
+import json
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import monotonic, perf_counter, time
+from typing import Dict, Iterable, Tuple
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from api.utils.database import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help)
+METRICS = {
+    "http_requests_total": ("counter", "Requests handled, by endpoint, method and status."),
+    "http_request_duration_seconds": ("histogram", "Time from the start of the request to its response."),
+    "http_response_size_bytes_total": ("counter", "Bytes of response bodies."),
+    "db_statements_total": ("counter", "SQL statements executed while handling requests."),
+    "db_statement_duration_seconds_total": ("counter", "Time spent in SQL statements while handling requests."),
+    "serialization_duration_seconds_total": ("counter", "Time spent turning response data into dicts, see Metrics.serializing."),
+    "json_encode_duration_seconds_total": ("counter", "Time spent encoding response bodies to JSON."),
+    "response_compression_duration_seconds_total": ("counter", "Time spent compressing response bodies, by content coding."),
+    "response_compression_bytes_saved_total": ("counter", "Bytes compression took off response bodies, by content coding."),
+    "response_cache_events_total": ("counter", "Response cache hits, misses and evictions."),
+    "identity_cache_events_total": ("counter", "Identity cache hits, misses and evictions."),
+    "db_pool_connections": ("gauge", "Connections of the database pool by state, summed over live workers."),
+    "confirmation_sweeps_total": ("counter", "Runs of the confirmation sweeper."),
+    "confirmation_sweep_deleted_rows_total": ("counter", "Confirmations deleted by the sweeper, by reason."),
+    "confirmation_sweep_last_deleted_rows": ("gauge", "Confirmations the sweeper's last run deleted, by reason."),
+    "confirmation_sweep_last_run_timestamp_seconds": ("gauge", "When the sweeper's last run finished."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class RequestCost:
+    """What the request being handled on this thread has cost so far."""
+
+    __slots__ = (
+        "started",
+        "statements",
+        "db_seconds",
+        "dump_seconds",
+        "dump_depth",
+        "encode_seconds",
+        "compress_seconds",
+    )
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.dump_seconds = 0.0
+        self.dump_depth = 0
+        self.encode_seconds = 0.0
+        self.compress_seconds = 0.0
+
+
+class Registry:
+    """Counters, histograms and gauges of one process.
+
+    Latest values are gauges that outlive the process, e.g. the result of a
+    job's last run: the most recently set one wins, whoever set it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], list] = {}  # [bucket counts..., sum, count]
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.latest: Dict[Tuple[str, Labels], Tuple[float, float]] = {}  # (value, set at)
+
+    def incr(self, name: str, labels: Labels, amount: float = 1) -> None:
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name: str, labels: Labels, value: float) -> None:
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def set_latest(self, name: str, labels: Labels, value: float) -> None:
+        with self._lock:
+            self.latest[(name, labels)] = (value, time())
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        key = (name, labels)
+        with self._lock:
+            data = self.histograms.get(key)
+            if data is None:
+                data = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 3)
+            data[bisect_left(LATENCY_BUCKETS, value)] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [[n, dict(l), v] for (n, l), v in self.counters.items()],
+                "histograms": [[n, dict(l), list(v)] for (n, l), v in self.histograms.items()],
+                "gauges": [[n, dict(l), v] for (n, l), v in self.gauges.items()],
+                "latest": [[n, dict(l), v, t] for (n, l), (v, t) in self.latest.items()],
+            }
+
+
+class Metrics:
+    """Per request latency, SQL and serialization costs, exported for Prometheus.
+
+    Every worker process periodically writes its totals to its own file in
+    METRICS_DIR, `/metrics` merges the files of all workers. Counters and
+    histograms of exited workers are kept, so totals never go backwards,
+    gauges only count live workers, except latest values. Empty METRICS_DIR
+    before the server starts.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.directory = None
+        self.flush_interval = 1.0
+        self.server_timing = False
+        self._local = threading.local()
+        self._registry = Registry()
+        self._pid = os.getpid()
+        self._next_flush = 0.0
+        self._flush_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config.get("METRICS_ENABLED", False)
+        app.extensions["metrics"] = self
+        if not self.enabled:
+            return
+        self.directory = app.config["METRICS_DIR"]
+        self.flush_interval = app.config.get("METRICS_FLUSH_INTERVAL", 1.0)
+        self.server_timing = app.config.get("METRICS_SERVER_TIMING", False)
+        os.makedirs(self.directory, exist_ok=True)
+        self._install_hooks()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _install_hooks(self) -> None:
+        if getattr(Metrics, "_hooks_installed", False):
+            return
+        Metrics._hooks_installed = True
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        cost = getattr(self._local, "cost", None)
+        if cost is not None:
+            cost.statements += 1
+            cost.db_seconds += perf_counter() - started
+
+    def incr(self, name: str, labels: Labels, amount: float = 1) -> None:
+        """Add to a counter of METRICS outside of request handling, e.g. from a CLI job."""
+        self._registry.incr(name, labels, amount)
+
+    def set_gauge(self, name: str, labels: Labels, value: float) -> None:
+        self._registry.set(name, labels, value)
+
+    def set_latest(self, name: str, labels: Labels, value: float) -> None:
+        """Set a gauge of METRICS that keeps its value after this process exits.
+
+        For results of CLI jobs, which are gone by the time /metrics is scraped.
+        """
+        self._registry.set_latest(name, labels, value)
+
+    @contextmanager
+    def serializing(self):
+        """Count the time the block takes as serialization of the current request.
+
+        Wraps schema dumps and their hand written equivalents at the call
+        site, a block nested in another one is counted once.
+        """
+        cost = getattr(self._local, "cost", None)
+        if cost is None:
+            yield
+            return
+        cost.dump_depth += 1
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            cost.dump_depth -= 1
+            if not cost.dump_depth:
+                cost.dump_seconds += perf_counter() - started
+
+    def observe_encoding(self, seconds: float) -> None:
+        """Count time the current request spent encoding its body to JSON."""
+        cost = getattr(self._local, "cost", None)
+        if cost is not None:
+            cost.encode_seconds += seconds
+
+    def observe_compression(self, encoding: str, seconds: float, size: int, compressed_size: int) -> None:
+        """Count a response body compressed from `size` to `compressed_size` bytes."""
+        cost = getattr(self._local, "cost", None)
+        if cost is None:
+            return
+        cost.compress_seconds += seconds
+        labels = (("encoding", encoding),)
+        self._registry.incr("response_compression_duration_seconds_total", labels, seconds)
+        self._registry.incr("response_compression_bytes_saved_total", labels, size - compressed_size)
+
+    def _before_request(self) -> None:
+        self._local.cost = RequestCost()
+
+    def _after_request(self, response):
+        cost = getattr(self._local, "cost", None)
+        if cost is None:
+            return response
+        elapsed = perf_counter() - cost.started
+        if self.server_timing:
+            response.headers["Server-Timing"] = (
+                f'db;dur={cost.db_seconds * 1000:.2f};desc="{cost.statements} statements", '
+                f"serialize;dur={cost.dump_seconds * 1000:.2f}, "
+                f"encode;dur={cost.encode_seconds * 1000:.2f}, "
+                f"compress;dur={cost.compress_seconds * 1000:.2f}, "
+                f"app;dur={elapsed * 1000:.2f}"
+            )
+        self._record(cost, elapsed, response.status_code, response.content_length or 0)
+        return response
+
+    def _teardown_request(self, exc=None) -> None:
+        cost = getattr(self._local, "cost", None)
+        self._local.cost = None
+        if cost is not None and exc is not None:
+            # raised past the error handlers, after_request never ran
+            self._record(cost, perf_counter() - cost.started, 500, 0)
+
+    def _record(self, cost: RequestCost, elapsed: float, status: int, size: int) -> None:
+        self._local.cost = None
+        rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        labels = (("endpoint", rule), ("method", request.method))
+        registry = self._registry
+        registry.incr("http_requests_total", labels + (("status", str(status)),))
+        registry.observe("http_request_duration_seconds", labels, elapsed)
+        registry.incr("http_response_size_bytes_total", labels, size)
+        registry.incr("db_statements_total", labels, cost.statements)
+        registry.incr("db_statement_duration_seconds_total", labels, cost.db_seconds)
+        registry.incr("serialization_duration_seconds_total", labels, cost.dump_seconds)
+        registry.incr("json_encode_duration_seconds_total", labels, cost.encode_seconds)
+        if monotonic() >= self._next_flush:
+            self.flush()
+
+    def _process_values(self) -> dict:
+        """Values read from other components of this process at flush time."""
+        from api.auth.identity import identity_cache
+        from api.utils.cache import cache
+
+        counters = []
+        for name, stats in (
+            ("response_cache_events_total", cache.stats),
+            ("identity_cache_events_total", identity_cache.stats),
+        ):
+            for kind, value in stats.as_dict().items():
+                counters.append([name, {"event": kind}, value])
+        gauges = []
+        pool = db.engine.pool
+        for state, method in (
+            ("size", "size"),
+            ("idle", "checkedin"),
+            ("in_use", "checkedout"),
+            ("overflow", "overflow"),
+        ):
+            if callable(getattr(pool, method, None)):
+                gauges.append(["db_pool_connections", {"state": state}, getattr(pool, method)()])
+        return {"counters": counters, "gauges": gauges}
+
+    def flush(self) -> None:
+        """Write this process' totals to its file in METRICS_DIR."""
+        if not self.enabled:
+            return
+        with self._flush_lock:
+            if os.getpid() != self._pid:
+                # a forked worker must not report its parent's requests as its own
+                self._registry = Registry()
+                self._pid = os.getpid()
+            snapshot = self._registry.snapshot()
+            values = self._process_values()
+            snapshot["counters"] += values["counters"]
+            snapshot["gauges"] += values["gauges"]
+            snapshot["pid"] = self._pid
+            path = os.path.join(self.directory, f"{self._pid}.json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(snapshot, f)
+            os.replace(path + ".tmp", path)
+            self._next_flush = monotonic() + self.flush_interval
+
+    def reset(self) -> int:
+        """Remove all workers' files, e.g. before starting the server."""
+        paths = glob.glob(os.path.join(self.directory, "*.json"))
+        for path in paths:
+            os.remove(path)
+        return len(paths)
+
+    def render(self) -> str:
+        """All workers' metrics in the Prometheus text format."""
+        self.flush()
+        counters: Dict[Tuple[str, Labels], float] = {}
+        histograms: Dict[Tuple[str, Labels], list] = {}
+        gauges: Dict[Tuple[str, Labels], float] = {}
+        latest: Dict[Tuple[str, Labels], Tuple[float, float]] = {}
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # removed or replaced while reading
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(sorted(labels.items())))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, data in snapshot["histograms"]:
+                key = (name, tuple(sorted(labels.items())))
+                merged = histograms.setdefault(key, [0] * len(data))
+                for i, value in enumerate(data):
+                    merged[i] += value
+            if _alive(snapshot["pid"]):
+                for name, labels, value in snapshot["gauges"]:
+                    key = (name, tuple(sorted(labels.items())))
+                    gauges[key] = gauges.get(key, 0) + value
+            for name, labels, value, set_at in snapshot.get("latest", ()):
+                key = (name, tuple(sorted(labels.items())))
+                if key not in latest or set_at > latest[key][1]:
+                    latest[key] = (value, set_at)
+        for key, (value, _) in latest.items():
+            gauges[key] = value
+
+        lines = []
+        for name, (kind, help_) in METRICS.items():
+            samples = counters if kind == "counter" else gauges if kind == "gauge" else histograms
+            series = sorted((key for key in samples if key[0] == name), key=lambda k: k[1])
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key in series:
+                labels = key[1]
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {_number(samples[key])}")
+                    continue
+                data = samples[key]
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), data):
+                    cumulative += count
+                    bucket = labels + (("le", str(bound)),)
+                    lines.append(f"{name}_bucket{_labels(bucket)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(data[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {data[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = Metrics()
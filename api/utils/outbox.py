@@ -0,0 +1,73 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from flask import current_app
+
+from api.models.outbox import OutboxEmail, FAILED
+from api.utils.database import db
+from api.utils.email import Mailgun, MailgunException
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _pool(size: int) -> ThreadPoolExecutor:
+    # long lived, so the per-thread HTTP sessions keep their connections
+    global _executor
+    if _executor is None or _executor._max_workers != size:
+        _executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="outbox")
+    return _executor
+
+
+def _send(email: dict) -> Optional[str]:
+    try:
+        Mailgun.send_email(
+            to=[email["to"]], subject=email["subject"], text=email["text"], html=email["html"]
+        )
+    except MailgunException as e:
+        return str(e)
+    except Exception as e:  # anything else must not leave the email claimed
+        return repr(e)
+    return None
+
+
+def drain_outbox() -> Dict[str, int]:
+    """Send one batch of due emails and record the outcome of each."""
+    config = current_app.config
+    emails = OutboxEmail.claim_batch(
+        config["EMAIL_OUTBOX_BATCH_SIZE"], config["EMAIL_OUTBOX_LEASE"]
+    )
+    stats = {"sent": 0, "retried": 0, "failed": 0}
+    if not emails:
+        return stats
+
+    payloads = [
+        {"to": e.to, "subject": e.subject, "text": e.text, "html": e.html} for e in emails
+    ]
+    errors = _pool(config["EMAIL_OUTBOX_CONCURRENCY"]).map(_send, payloads)
+    for email, error in zip(emails, errors):
+        if error is None:
+            email.mark_sent()
+            stats["sent"] += 1
+            continue
+        email.mark_failed(
+            error,
+            max_attempts=config["EMAIL_OUTBOX_MAX_ATTEMPTS"],
+            backoff=config["EMAIL_OUTBOX_BACKOFF"],
+            backoff_max=config["EMAIL_OUTBOX_BACKOFF_MAX"],
+        )
+        stats["failed" if email.status == FAILED else "retried"] += 1
+    db.session.commit()
+    return stats
+
+
+def run_outbox_worker(interval: float, stop: threading.Event = None) -> None:
+    """Drain the outbox until stopped, sleeping `interval` seconds whenever it is empty."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        stats = drain_outbox()
+        if not any(stats.values()):
+            stop.wait(interval)
+        elif stats["sent"] == 0:
+            time.sleep(0.1)  # a whole batch failed, don't hammer the provider
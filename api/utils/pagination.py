@@ -0,0 +1,179 @@
+import base64
+import json
+from datetime import date, datetime
+from time import monotonic
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from flask import abort, current_app, request, url_for
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.sql import operators
+
+from api.utils.database import db
+
+COUNT_MODES = ("exact", "cached", "estimate")
+COUNT_CACHE_SIZE = 1024
+
+# {cache key: (expires at, total)} for ?count=cached
+_count_cache: Dict[str, Tuple[float, int]] = {}
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Turn the sort key values of the last row into an opaque cursor."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _coerce(value: Any, python_type: Optional[type]) -> Any:
+    """`value` decoded from JSON as a `python_type`, raises TypeError if it isn't one."""
+    if python_type in (datetime, date):
+        if not isinstance(value, str):
+            raise TypeError(value)
+        return python_type.fromisoformat(value)
+    # bool is an int, but True isn't an id
+    if isinstance(value, bool) != (python_type is bool):
+        raise TypeError(value)
+    if python_type is float and isinstance(value, int):
+        return float(value)
+    if python_type is None:
+        # a type without a Python equivalent, still only plain values go into SQL
+        python_type = (str, int, float)
+    if not isinstance(value, python_type):
+        raise TypeError(value)
+    return value
+
+
+def decode_cursor_values(cursor: str, types: Sequence[Optional[type]]) -> List[Any]:
+    """Decode a cursor made by encode_cursor from values of `types`.
+
+    Aborts with 400 if it was tampered with, including values of the wrong
+    type, which would otherwise reach SQL.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        abort(400)
+    if not isinstance(values, list) or len(values) != len(types):
+        abort(400)
+    try:
+        return [_coerce(value, python_type) for value, python_type in zip(values, types)]
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> List[Any]:
+    """Decode a cursor made by encode_cursor for the given sort keys."""
+    return decode_cursor_values(cursor, [_python_type(_column(key)) for key in keys])
+
+
+def _python_type(column) -> Optional[type]:
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _column(key):
+    """Unwrap `Post.id.desc()` to `Post.id`."""
+    return key.element
+
+
+def _is_desc(key) -> bool:
+    return key.modifier is operators.desc_op
+
+
+def _after(keys: Sequence, values: Sequence[Any]):
+    """Build `(k1, k2, ...) > (v1, v2, ...)` honouring each key's direction."""
+    clauses = []
+    for i, key in enumerate(keys):
+        column = _column(key)
+        beyond = column < values[i] if _is_desc(key) else column > values[i]
+        equal = [_column(prev) == values[j] for j, prev in enumerate(keys[:i])]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def _estimate(table) -> int:
+    """Cheap row estimate for an unfiltered table."""
+    if db.engine.dialect.name == "postgresql":
+        estimate = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"),
+            {"name": table.name},
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate
+    # autoincrement ids only ever grow, so the max id is an upper bound
+    return db.session.query(func.max(table.c.id)).scalar() or 0
+
+
+def count_total(query, mode: str, cache_key: str, estimate_table=None) -> int:
+    """Total for a list response, computed the way the client asked for it."""
+    if mode == "estimate" and estimate_table is not None:
+        return _estimate(estimate_table)
+    if mode == "exact":
+        return query.order_by(None).count()
+
+    now = monotonic()
+    cached = _count_cache.get(cache_key)
+    if cached and cached[0] > now:
+        return cached[1]
+    total = query.order_by(None).count()
+    if len(_count_cache) >= COUNT_CACHE_SIZE:
+        for key in [k for k, (expires, _) in _count_cache.items() if expires <= now]:
+            del _count_cache[key]
+        if len(_count_cache) >= COUNT_CACHE_SIZE:
+            _count_cache.clear()
+    _count_cache[cache_key] = (now + current_app.config["PAGINATION_COUNT_TTL"], total)
+    return total
+
+
+def paginate(
+    query, endpoint: str, per_page: int, keys: Sequence, estimate_table=None, **values
+):
+    """Page through a list query and build the `pagination` block of the response.
+
+    Without a `cursor` argument this is the classic `?page=N` offset paging.
+    With `?cursor=` (empty for the first page) rows are sorted by `keys`, given
+    as `column.asc()`/`column.desc()` and ending with a unique column, and the
+    next page starts right after the last row seen, so deep pages cost the same
+    as the first one. Totals are only computed on request with
+    `?count=exact|cached|estimate`. `estimate_table` should only be given when
+    the query is not filtered.
+    """
+    if "cursor" not in request.args:
+        page = request.args.get("page", 1, type=int)
+        pagination = query.paginate(page, per_page=per_page, error_out=False)
+        prev = None
+        if pagination.has_prev:
+            prev = url_for(endpoint, page=page - 1, **values)
+        _next = None
+        if pagination.has_next:
+            _next = url_for(endpoint, page=page + 1, **values)
+        return pagination.items, {"prev": prev, "next": _next, "count": pagination.total}
+
+    count_mode = request.args.get("count")
+    if count_mode is not None and count_mode not in COUNT_MODES:
+        abort(400)
+
+    cursor = request.args["cursor"]
+    page_query = query.order_by(None).order_by(*keys)
+    if cursor:
+        page_query = page_query.filter(_after(keys, decode_cursor(cursor, keys)))
+    items = page_query.limit(per_page + 1).all()
+
+    _next = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, _column(key).key) for key in keys])
+        url_values = dict(values, cursor=next_cursor)
+        if count_mode:
+            url_values["count"] = count_mode
+        _next = url_for(endpoint, **url_values)
+
+    result = {"prev": None, "next": _next, "cursor": cursor or None}
+    if count_mode:
+        cache_key = f"{endpoint}:{sorted(values.items())}"
+        result["count"] = count_total(query, count_mode, cache_key, estimate_table)
+    return items, result
@@ -0,0 +1,87 @@
+import tempfile
+from typing import Optional
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from api.utils.processes import ProcessLocalPool, SharedSlots, run_in_slot
+
+
+class PasswordPoolBusy(Exception):
+    def __init__(self, message: str = "Password hashing pool is saturated."):
+        super().__init__(message)
+
+
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """Runs password hashing and verification on a bounded process pool.
+
+    Keeps the CPU heavy key derivation off the request workers. The bounds
+    hold for all worker processes on the host together, through lock files
+    in `lock_dir`: at most `workers` jobs hash at once and at most
+    `workers + max_queue` are in flight, beyond that PasswordPoolBusy is
+    raised right away instead of making the request wait. With `workers = 0`
+    everything runs inline.
+    """
+
+    def __init__(self, app=None):
+        self._pool = None
+        self.configure("pbkdf2:sha256:260000", workers=0, max_queue=0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.configure(
+            app.config["PASSWORD_HASH_METHOD"],
+            workers=app.config["PASSWORD_POOL_WORKERS"],
+            max_queue=app.config["PASSWORD_POOL_MAX_QUEUE"],
+            lock_dir=app.config["LOCK_DIR"],
+        )
+        app.extensions["password_hasher"] = self
+
+    def configure(self, method: str, workers: int, max_queue: int, lock_dir: Optional[str] = None) -> None:
+        """Without `lock_dir` the bounds only hold within this process."""
+        self.shutdown()
+        self.method = method
+        self.workers = workers
+        if not workers:
+            return
+        lock_dir = lock_dir or tempfile.mkdtemp(prefix="password-slots-")
+        self._slots = SharedSlots(lock_dir, "password", workers + max_queue)
+        self._running = SharedSlots(lock_dir, "password-running", workers)
+        self._pool = ProcessLocalPool(workers)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        slot = self._slots.acquire()
+        if slot is None:
+            raise PasswordPoolBusy()
+        try:
+            future = self._pool.executor().submit(run_in_slot, self._running, slot.index, fn, *args)
+            return future.result()
+        finally:
+            slot.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True when the hash was made with another method or work factor than the configured one."""
+        return password_hash.split("$", 1)[0] != self.method
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+hasher = PasswordHasher()
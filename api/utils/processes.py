@@ -0,0 +1,113 @@
+import fcntl
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+
+class ProcessLocalPool:
+    """ProcessPoolExecutor created on first use in each process.
+
+    A pool inherited from the parent of a forked worker is unusable, every
+    worker gets its own. Processes are only started while no idle one is
+    left, so a worker handling one request at a time keeps a single one.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool = None
+        self._pid = None
+
+    def executor(self) -> ProcessPoolExecutor:
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._pid = os.getpid()
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown()
+        self._pool = None
+
+
+class Slot:
+    """A held slot of SharedSlots, `index` is its position among them."""
+
+    def __init__(self, index: int, fd: int):
+        self.index = index
+        self._fd = fd
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)  # drops the lock
+            self._fd = None
+
+
+def _lock(path: str, blocking: bool) -> Optional[int]:
+    # a fresh open file per holder, flock locks held through the same open
+    # file don't exclude each other
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class SharedSlots:
+    """Semaphore shared by every process on the host, `size` lock files in `directory`.
+
+    A slot is held by locking its file, so the slots of a worker that dies
+    are freed by the OS.
+    """
+
+    def __init__(self, directory: str, name: str, size: int):
+        os.makedirs(directory, exist_ok=True)
+        self.paths = [os.path.join(directory, f"{name}.{i}.lock") for i in range(size)]
+
+    def acquire(self) -> Optional[Slot]:
+        """Take a free slot, None if all of them are held."""
+        for index, path in enumerate(self.paths):
+            fd = _lock(path, blocking=False)
+            if fd is not None:
+                return Slot(index, fd)
+        return None
+
+    def wait(self, preferred: int) -> Slot:
+        """Take a free slot, waiting for the `preferred` one if all of them are held."""
+        slot = self.acquire()
+        if slot is not None:
+            return slot
+        index = preferred % len(self.paths)
+        return Slot(index, _lock(self.paths[index], blocking=True))
+
+
+def run_in_slot(running: SharedSlots, preferred: int, fn, *args):
+    """Run `fn(*args)` holding a slot of `running`, submitted to a pool.
+
+    Bounds how many jobs run at once across the pools of all workers.
+    """
+    slot = running.wait(preferred)
+    try:
+        return fn(*args)
+    finally:
+        slot.release()
+
+
+class SQLiteConnections:
+    """One connection to a SQLite file per thread, never shared with a forked worker."""
+
+    def __init__(self, path: str, pragmas: Iterable[str] = ("journal_mode=WAL",)):
+        self.path = path
+        self.pragmas = tuple(pragmas)
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        if getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            for pragma in self.pragmas:
+                conn.execute(f"PRAGMA {pragma}")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return self._local.conn
@@ -1,4 +1,9 @@
-from flask import make_response, jsonify
+import hashlib
+
+from flask import make_response, request
+from werkzeug.http import is_resource_modified
+
+from api.utils.codec import codec
 
 INVALID_FIELD_NAME_SENT_422 = {
     "http_code": 422,
@@ -42,6 +47,12 @@ FORBIDDEN_403 = {
     "message": "Invalid authentication",
 }
 
+SERVICE_UNAVAILABLE_503 = {
+    "http_code": 503,
+    "code": "serviceUnavailable",
+    "message": "Server is busy, try again later",
+}
+
 NOT_FOUND_HANDLER = {
     "http_code": 404,
     "code": "notFound",
@@ -55,8 +66,36 @@ SUCCESS_201 = {"http_code": 201, "code": "success"}
 SUCCESS_204 = {"http_code": 204, "code": "success"}
 
 
+def version_etag(*parts) -> str:
+    """Strong ETag built from whatever identifies a version of a resource (id, updated_at, ...)."""
+    return hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def not_modified(etag=None, last_modified=None):
+    """Return a 304 response if the client's copy is still current, otherwise None.
+    Lets views answer conditional GETs before loading and dumping the resource.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    response = make_response("", 304)
+    if etag is not None:
+        response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
 def response_with(
-    response, value=None, message=None, error=None, headers={}, pagination=None
+    response,
+    value=None,
+    message=None,
+    error=None,
+    headers={},
+    pagination=None,
+    etag=None,
+    last_modified=None,
 ):
     result = {}
     if value is not None:
@@ -79,4 +118,14 @@ def response_with(
     headers.update({"Access-Control-Allow-Origin": "*"})
     headers.update({"server": "Flask REST API"})
 
-    return make_response(jsonify(result), response["http_code"], headers)
+    http_response = codec.jsonify(result, response["http_code"], headers)
+    conditional = request.method in ("GET", "HEAD") and response["http_code"] == 200
+    if conditional:
+        # default to a hash of the body, views that know the row version pass their own
+        http_response.set_etag(etag or hashlib.sha1(http_response.get_data()).hexdigest())
+        if last_modified is not None:
+            http_response.last_modified = last_modified
+    codec.compress(http_response)
+    if conditional:
+        http_response.make_conditional(request)
+    return http_response
@@ -0,0 +1,203 @@
+import html
+import re
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+from flask import current_app
+from sqlalchemy import text
+
+from api.utils.database import db
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# what the databases mark matches with, private use characters never shown as text
+MATCH_START = "\ue000"
+MATCH_END = "\ue001"
+
+
+class SearchHit(NamedTuple):
+    post_id: int
+    score: float
+    title: str
+    body: str
+
+
+def terms(query: str) -> List[str]:
+    """Split user input into plain words, search syntax from the client is never trusted."""
+    return re.findall(r"\w+", query.lower())
+
+
+def highlight(snippet: str) -> str:
+    """HTML of a snippet with its matches between MATCH_START and MATCH_END.
+
+    The post's own text is escaped, the only markup left is the highlighting.
+    """
+    escaped = html.escape(snippet or "")
+    return escaped.replace(MATCH_START, HIGHLIGHT_START).replace(MATCH_END, HIGHLIGHT_END)
+
+
+def _hits(rows) -> List[SearchHit]:
+    return [SearchHit(_id, score, highlight(title), highlight(body)) for _id, score, title, body in rows]
+
+
+class SQLiteSearchBackend:
+    """Ranked search through an FTS5 table holding a copy of each post's title and body.
+
+    The index rows share the post's id as rowid. Every write goes through the
+    caller's session, so the index commits or rolls back with the post.
+    """
+
+    def ensure_schema(self) -> None:
+        db.session.execute(
+            text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts "
+                "USING fts5(title, body, tokenize='porter unicode61')"
+            )
+        )
+
+    def index(self, posts: Sequence) -> None:
+        if not posts:
+            return
+        self.remove([post.id for post in posts])
+        db.session.execute(
+            text("INSERT INTO posts_fts (rowid, title, body) VALUES (:id, :title, :body)"),
+            [{"id": p.id, "title": p.title or "", "body": p.body or ""} for p in posts],
+        )
+
+    def remove(self, post_ids: Iterable[int]) -> None:
+        post_ids = list(post_ids)
+        if post_ids:
+            db.session.execute(
+                text("DELETE FROM posts_fts WHERE rowid = :id"),
+                [{"id": _id} for _id in post_ids],
+            )
+
+    def rebuild(self) -> None:
+        self.ensure_schema()
+        db.session.execute(text("DELETE FROM posts_fts"))
+        db.session.execute(
+            text(
+                "INSERT INTO posts_fts (rowid, title, body) "
+                "SELECT id, coalesce(title, ''), coalesce(body, '') FROM posts"
+            )
+        )
+
+    def search(self, words: List[str], limit: int, after: Optional[Sequence]) -> List[SearchHit]:
+        # bm25() is lower for better matches, so sorting ascending puts the best first
+        sql = (
+            "SELECT id, score, title, body FROM ("
+            " SELECT rowid AS id, bm25(posts_fts, 10.0, 1.0) AS score,"
+            " snippet(posts_fts, 0, :start, :end, '…', 12) AS title,"
+            " snippet(posts_fts, 1, :start, :end, '…', 24) AS body"
+            " FROM posts_fts WHERE posts_fts MATCH :match"
+            ") AS hits"
+        )
+        params = {
+            "match": " ".join(f'"{word}"' for word in words),
+            "start": MATCH_START,
+            "end": MATCH_END,
+            "limit": limit,
+        }
+        if after:
+            sql += " WHERE score > :score OR (score = :score AND id > :id)"
+            params.update(score=after[0], id=after[1])
+        sql += " ORDER BY score, id LIMIT :limit"
+        return _hits(db.session.execute(text(sql), params))
+
+
+class PostgresSearchBackend:
+    """Ranked search on PostgreSQL, backed by a GIN index on the posts' tsvector.
+
+    The expression index is maintained by PostgreSQL itself, so index/remove
+    have nothing to do.
+    """
+
+    DOCUMENT = (
+        "setweight(to_tsvector('english', coalesce(posts.title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(posts.body, '')), 'B')"
+    )
+
+    def ensure_schema(self) -> None:
+        db.session.execute(
+            text(f"CREATE INDEX IF NOT EXISTS ix_posts_fts ON posts USING gin (({self.DOCUMENT}))")
+        )
+
+    def index(self, posts: Sequence) -> None:
+        pass
+
+    def remove(self, post_ids: Iterable[int]) -> None:
+        pass
+
+    def rebuild(self) -> None:
+        self.ensure_schema()
+        db.session.execute(text("REINDEX INDEX ix_posts_fts"))
+
+    def search(self, words: List[str], limit: int, after: Optional[Sequence]) -> List[SearchHit]:
+        options = f"StartSel={MATCH_START}, StopSel={MATCH_END}"
+        # negate ts_rank_cd so that, like bm25, lower is better
+        sql = (
+            "SELECT id, score, title, body FROM ("
+            f" SELECT posts.id AS id, -ts_rank_cd({self.DOCUMENT}, query) AS score,"
+            " ts_headline('english', coalesce(posts.title, ''), query, :title_options) AS title,"
+            " ts_headline('english', coalesce(posts.body, ''), query, :body_options) AS body"
+            " FROM posts, plainto_tsquery('english', :match) AS query"
+            f" WHERE ({self.DOCUMENT}) @@ query"
+            ") AS hits"
+        )
+        params = {
+            "match": " ".join(words),
+            "title_options": f"{options}, HighlightAll=true",
+            "body_options": f"{options}, MaxWords=24",
+            "limit": limit,
+        }
+        if after:
+            sql += " WHERE score > :score OR (score = :score AND id > :id)"
+            params.update(score=after[0], id=after[1])
+        sql += " ORDER BY score, id LIMIT :limit"
+        return _hits(db.session.execute(text(sql), params))
+
+
+BACKENDS = {"sqlite": SQLiteSearchBackend, "postgresql": PostgresSearchBackend}
+
+
+class PostSearch:
+    """Full-text search over post titles and bodies.
+
+    SEARCH_BACKEND picks the backend, "auto" follows the database dialect.
+    """
+
+    def __init__(self):
+        self._backends = {}
+
+    @property
+    def backend(self):
+        name = current_app.config.get("SEARCH_BACKEND", "auto")
+        if name == "auto":
+            name = db.engine.dialect.name
+        if name not in self._backends:
+            if name not in BACKENDS:
+                raise ValueError(f"No search backend for {name!r}")
+            backend = BACKENDS[name]()
+            backend.ensure_schema()  # databases made with create_all() lack the index
+            self._backends[name] = backend
+        return self._backends[name]
+
+    def index_posts(self, posts: Sequence) -> None:
+        """Add or refresh posts in the index. Posts need an id, so flush new ones first."""
+        self.backend.index(posts)
+
+    def remove_posts(self, post_ids: Iterable[int]) -> None:
+        self.backend.remove(post_ids)
+
+    def rebuild(self) -> None:
+        """Recreate the index from the posts table, e.g. after a bulk import."""
+        self.backend.rebuild()
+        db.session.commit()
+
+    def search(self, query: str, limit: int, after: Optional[Sequence] = None) -> List[SearchHit]:
+        words = terms(query)
+        if not words:
+            return []
+        return self.backend.search(words, limit, after)
+
+
+search = PostSearch()
@@ -0,0 +1,258 @@
+import hashlib
+import random
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+from sqlalchemy import text
+
+from api.utils.database import db
+from api.models.comment import Comment
+from api.models.confirmation import Confirmation
+from api.models.post import Post, post_tag
+from api.models.tag import Tag
+from api.models.user import User
+from api.utils.password import hasher
+
+SEED_PASSWORD = "p@assw0rd"
+EPOCH = datetime(2020, 1, 1)
+SPAN = 4 * 365 * 24 * 3600  # timestamps are spread over four years from EPOCH
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure "
+    "in reprehenderit voluptate velit esse cillum fugiat nulla pariatur excepteur sint "
+    "occaecat cupidatat non proident sunt culpa qui officia deserunt mollit anim id est"
+).split()
+FIRST_NAMES = (
+    "Ada Alan Barbara Carl Dana Edsger Emmy Frances Grace Hedy Ivan Jean Ken Linus "
+    "Margaret Niklaus Radia Rosalind Sophie Tim Whitfield Yukihiro Zoe"
+).split()
+LAST_NAMES = (
+    "Lovelace Turing Liskov Sagan Scott Dijkstra Noether Allen Hopper Lamarr Sutherland "
+    "Sammet Thompson Torvalds Hamilton Wirth Perlman Franklin Wilson Lee Diffie Matsumoto"
+).split()
+
+TABLES = {
+    "users": User.__table__,
+    "confirmations": Confirmation.__table__,
+    "tags": Tag.__table__,
+    "posts": Post.__table__,
+    "post_tag": post_tag,
+    "comments": Comment.__table__,
+}
+
+
+class SeedPlan(NamedTuple):
+    """Everything a chunk needs to be generated on its own, in any process."""
+
+    seed: int
+    users: int
+    tags: int
+    posts: int
+    comments: int
+    max_tags: int
+    chunk_size: int
+    password_hash: str
+    # generated ids start after the largest existing ones
+    user_base: int
+    tag_base: int
+    post_base: int
+    comment_base: int
+
+
+def _rng(plan: SeedPlan, stage: str, start: int) -> random.Random:
+    # string seeds are hashed with sha512, so chunks come out the same in every process and run
+    return random.Random(f"{plan.seed}:{stage}:{start}")
+
+
+def _text(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize() + "."
+
+
+def _timestamp(rng: random.Random) -> datetime:
+    return EPOCH + timedelta(seconds=rng.randrange(SPAN))
+
+
+def _users(plan: SeedPlan, rng: random.Random, start: int, stop: int) -> Dict[str, list]:
+    users, confirmations = [], []
+    for _id in range(plan.user_base + start + 1, plan.user_base + stop + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        timestamp = _timestamp(rng)
+        users.append(
+            {
+                "id": _id,
+                "username": f"{first.lower()}.{last.lower()}{_id}",
+                "email": f"user{_id}@example.com",
+                "is_admin": False,
+                "avatar": None,
+                "password_hash": plan.password_hash,
+                "timestamp": timestamp,
+                "updated_at": timestamp,
+                "first_name": first,
+                "last_name": last,
+                "bio": _text(rng, 5, 30),
+            }
+        )
+        # most users confirmed, a few also left superseded or expired links behind
+        expire_at = int(timestamp.timestamp())
+        for n in range(1 + (rng.random() < 0.1)):
+            confirmations.append(
+                {
+                    # from the user id, which a later run never reuses, unlike the rng
+                    "id": hashlib.sha256(f"{plan.seed}:{_id}:{n}".encode()).hexdigest()[:32],
+                    "expire_at": expire_at,
+                    "confirmed": False,
+                    "user_id": _id,
+                }
+            )
+            expire_at += 1800
+        confirmations[-1]["confirmed"] = rng.random() < 0.9
+    return {"users": users, "confirmations": confirmations}
+
+
+def _tags(plan: SeedPlan, rng: random.Random, start: int, stop: int) -> Dict[str, list]:
+    tags = []
+    for _id in range(plan.tag_base + start + 1, plan.tag_base + stop + 1):
+        # derived from the id alone, so names never collide
+        word, round_ = WORDS[_id % len(WORDS)], _id // len(WORDS)
+        tags.append({"id": _id, "name": f"{word}-{round_}" if round_ else word})
+    return {"tags": tags}
+
+
+def _posts(plan: SeedPlan, rng: random.Random, start: int, stop: int) -> Dict[str, list]:
+    posts, links = [], []
+    tag_ids = range(plan.tag_base + 1, plan.tag_base + plan.tags + 1)
+    for _id in range(plan.post_base + start + 1, plan.post_base + stop + 1):
+        timestamp = _timestamp(rng)
+        posts.append(
+            {
+                "id": _id,
+                "title": _text(rng, 2, 8)[:120],
+                "body": _text(rng, 20, 200),
+                "timestamp": timestamp,
+                "updated_at": timestamp,
+                "user_id": plan.user_base + rng.randint(1, plan.users),
+                "comments_count": 0,
+            }
+        )
+        count = min(rng.randint(0, plan.max_tags), len(tag_ids))
+        links.extend({"post_id": _id, "tag_id": tag_id} for tag_id in rng.sample(tag_ids, count))
+    return {"posts": posts, "post_tag": links}
+
+
+def _comments(plan: SeedPlan, rng: random.Random, start: int, stop: int) -> Dict[str, list]:
+    comments = []
+    for _id in range(plan.comment_base + start + 1, plan.comment_base + stop + 1):
+        timestamp = _timestamp(rng)
+        comments.append(
+            {
+                "id": _id,
+                "body": _text(rng, 3, 40),
+                "timestamp": timestamp,
+                "updated_at": timestamp,
+                "confirmed": rng.random() < 0.9,
+                "user_id": plan.user_base + rng.randint(1, plan.users),
+                "post_id": plan.post_base + rng.randint(1, plan.posts),
+            }
+        )
+    return {"comments": comments}
+
+
+# in dependency order, each stage's rows only refer to earlier stages
+STAGES = (("users", _users), ("tags", _tags), ("posts", _posts), ("comments", _comments))
+GENERATORS = dict(STAGES)
+
+
+def generate_chunk(plan: SeedPlan, stage: str, start: int) -> Dict[str, list]:
+    """Rows of one chunk, the same for a given plan wherever it runs."""
+    stop = min(start + plan.chunk_size, getattr(plan, stage))
+    return GENERATORS[stage](plan, _rng(plan, stage, start), start, stop)
+
+
+def _chunks(plan: SeedPlan, stage: str, workers: int) -> Iterator[Dict[str, list]]:
+    starts = range(0, getattr(plan, stage), plan.chunk_size)
+    if workers <= 0:
+        for start in starts:
+            yield generate_chunk(plan, stage, start)
+        return
+    # results are taken in order with a bounded number in flight, so memory
+    # stays at a few chunks however many rows are generated
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for start in starts:
+            pending.append(pool.submit(generate_chunk, plan, stage, start))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _max_id(model) -> int:
+    return db.session.query(db.func.max(model.id)).scalar() or 0
+
+
+def _sync_sequences() -> None:
+    # explicit ids don't advance PostgreSQL's sequences, later inserts would collide
+    if db.session.get_bind().dialect.name != "postgresql":
+        return
+    for table in ("users", "tags", "posts", "comments"):
+        db.session.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"coalesce((SELECT max(id) FROM {table}), 1))"
+            )
+        )
+
+
+def seed_database(
+    users: int,
+    tags: int,
+    posts: int,
+    comments: int,
+    seed: int = 0,
+    max_tags: int = 5,
+    chunk_size: int = 5000,
+    workers: int = 0,
+    progress: Optional[Callable[[str, Counter], None]] = None,
+) -> Counter:
+    """Insert a synthetic dataset, the same one for the same arguments.
+
+    Rows are generated in chunks of `chunk_size`, on `workers` processes when
+    given, and every chunk is inserted with one executemany per table and
+    committed. Users all share the password SEED_PASSWORD, hashed once.
+    Returns the number of rows inserted per table.
+    """
+    if users <= 0 and (posts > 0 or comments > 0):
+        raise ValueError("Posts and comments need users.")
+    if posts <= 0 and comments > 0:
+        raise ValueError("Comments need posts.")
+    plan = SeedPlan(
+        seed=seed,
+        users=users,
+        tags=tags,
+        posts=posts,
+        comments=comments,
+        max_tags=max_tags,
+        chunk_size=chunk_size,
+        password_hash=hasher.hash(SEED_PASSWORD),
+        user_base=_max_id(User),
+        tag_base=_max_id(Tag),
+        post_base=_max_id(Post),
+        comment_base=_max_id(Comment),
+    )
+    counts = Counter()
+    for stage, _ in STAGES:
+        for rows in _chunks(plan, stage, workers):
+            for table, batch in rows.items():
+                if batch:
+                    db.session.execute(TABLES[table].insert(), batch)
+                    counts[table] += len(batch)
+            db.session.commit()
+            if progress is not None:
+                progress(stage, counts)
+    _sync_sequences()
+    db.session.commit()
+    return counts
@@ -0,0 +1,57 @@
+import logging
+import threading
+import time
+from typing import Dict
+
+from flask import current_app
+
+from api.models.confirmation import Confirmation
+from api.utils.database import db
+from api.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def sweep_confirmations() -> Dict[str, int]:
+    """Delete unconfirmed confirmations that can no longer be used, by reason.
+
+    Superseded ones have been replaced by a resend, expired ones ran out more
+    than CONFIRMATION_RETENTION seconds ago (until then their link still
+    answers "expired" rather than "not found"). Rows are deleted
+    CONFIRMATION_SWEEP_BATCH_SIZE at a time, each batch in its own short
+    transaction, so registrations and confirmations are never held up for long.
+    """
+    config = current_app.config
+    batch_size = config["CONFIRMATION_SWEEP_BATCH_SIZE"]
+    expired_before = int(time.time()) - config["CONFIRMATION_RETENTION"]
+    deleted = {"superseded": 0, "expired": 0}
+    for reason, condition in (
+        ("superseded", Confirmation.superseded()),
+        ("expired", Confirmation.expired_before(expired_before)),
+    ):
+        last_id = ""
+        while True:
+            ids, count = Confirmation.delete_unconfirmed_batch(condition, last_id, batch_size)
+            db.session.commit()
+            deleted[reason] += count
+            if len(ids) < batch_size:
+                break
+            last_id = ids[-1]
+            time.sleep(config["CONFIRMATION_SWEEP_PAUSE"])
+
+    for reason, count in deleted.items():
+        metrics.incr("confirmation_sweep_deleted_rows_total", (("reason", reason),), count)
+        metrics.set_latest("confirmation_sweep_last_deleted_rows", (("reason", reason),), count)
+    metrics.set_latest("confirmation_sweep_last_run_timestamp_seconds", (), time.time())
+    metrics.incr("confirmation_sweeps_total", ())
+    metrics.flush()
+    logger.info("Confirmation sweep deleted %s", deleted)
+    return deleted
+
+
+def run_confirmation_sweeper(interval: float, stop: threading.Event = None) -> None:
+    """Sweep confirmations every `interval` seconds until stopped."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        sweep_confirmations()
+        stop.wait(interval)
@@ -0,0 +1,145 @@
+import importlib.util
+import logging
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from api.utils.processes import ProcessLocalPool, SharedSlots, run_in_slot
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "_variants"  # next to the originals, never matches is_filename_safe
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+
+
+def variant_path(original: str, size: int, fmt: str) -> str:
+    folder, name = os.path.split(original)
+    return os.path.join(folder, VARIANTS_DIR, f"{name}.{size}.{fmt}")
+
+
+def _build_variants(original: str, sizes: Sequence[int], fmt: str, quality: int) -> List[str]:
+    """Write a downscaled copy of `original` per size. Runs on the pool."""
+    from PIL import Image, ImageOps
+
+    written = []
+    with Image.open(original) as source:
+        image = ImageOps.exif_transpose(source)  # EXIF is dropped below, keep its rotation
+        if fmt == "jpeg" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB" if fmt == "jpeg" else "RGBA")
+        os.makedirs(os.path.join(os.path.dirname(original), VARIANTS_DIR), exist_ok=True)
+        for size in sizes:
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)  # only ever shrinks
+            path = variant_path(original, size, fmt)
+            # no exif/icc arguments, so the variant carries no metadata
+            variant.save(path + ".tmp", FORMATS[fmt][0], quality=quality, optimize=True)
+            os.replace(path + ".tmp", path)
+            written.append(path)
+    return written
+
+
+class Thumbnails:
+    """Builds fixed size variants of uploaded images on a process pool.
+
+    Uploads only enqueue the work. Until a variant is written (or when Pillow
+    isn't installed) requests for it get the original instead.
+    """
+
+    def __init__(self, app=None):
+        self.sizes: Tuple[int, ...] = ()
+        self.format = "webp"
+        self.quality = 80
+        self.workers = 0
+        self.enabled = False
+        self._slots = None
+        self._running = None
+        self._pool = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.sizes = tuple(sorted(app.config["IMAGE_VARIANT_SIZES"]))
+        self.format = app.config["IMAGE_VARIANT_FORMAT"]
+        if self.format not in FORMATS:
+            raise ValueError(f"Unknown IMAGE_VARIANT_FORMAT {self.format!r}")
+        self.quality = app.config["IMAGE_VARIANT_QUALITY"]
+        self.workers = app.config["IMAGE_VARIANT_WORKERS"]
+        self.enabled = bool(self.sizes) and self.workers > 0
+        if self.enabled and importlib.util.find_spec("PIL") is None:
+            logger.warning("Pillow is not installed, originals are served for every image size.")
+            self.enabled = False
+        if self.enabled:
+            # like the password pool, bounded for all workers on the host together
+            lock_dir = app.config["LOCK_DIR"]
+            queue = self.workers + app.config["IMAGE_VARIANT_MAX_QUEUE"]
+            self._slots = SharedSlots(lock_dir, "image-variants", queue)
+            self._running = SharedSlots(lock_dir, "image-variants-running", self.workers)
+            self._pool = ProcessLocalPool(self.workers)
+        app.extensions["thumbnails"] = self
+
+    @property
+    def mimetype(self) -> str:
+        return FORMATS[self.format][1]
+
+    def enqueue(self, original: str) -> bool:
+        """Start building the variants of a freshly saved image, without waiting for them.
+
+        Returns False when the pool is saturated, the image is then only
+        available in its original size.
+        """
+        self.remove_variants(original)  # a replaced image must not show its old variants
+        if not self.enabled:
+            return False
+        slot = self._slots.acquire()
+        if slot is None:
+            logger.warning("Image variant queue is full, skipped %s", original)
+            return False
+        try:
+            future = self._pool.executor().submit(
+                run_in_slot,
+                self._running,
+                slot.index,
+                _build_variants,
+                original,
+                self.sizes,
+                self.format,
+                self.quality,
+            )
+        except BaseException:
+            slot.release()
+            raise
+        future.add_done_callback(lambda done: self._done(slot, done))
+        return True
+
+    def _done(self, slot, future) -> None:
+        slot.release()
+        exc = future.exception()
+        if exc is not None and not isinstance(exc, FileNotFoundError):
+            logger.warning("Building image variants failed: %r", exc)
+
+    def resolve(self, original: str, size: Optional[int]) -> Tuple[str, Optional[str]]:
+        """(path, mimetype) to serve for `original` at `size`, the original if no current variant exists."""
+        if size is None:
+            return original, None
+        path = variant_path(original, size, self.format)
+        try:
+            # older than the original means it was built from a replaced upload
+            if os.stat(path).st_mtime_ns >= os.stat(original).st_mtime_ns:
+                return path, self.mimetype
+        except FileNotFoundError:
+            pass
+        return original, None
+
+    def remove_variants(self, original: str) -> None:
+        for size in self.sizes:
+            for fmt in FORMATS:
+                try:
+                    os.remove(variant_path(original, size, fmt))
+                except FileNotFoundError:
+                    pass
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+thumbnails = Thumbnails()
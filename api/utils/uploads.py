@@ -0,0 +1,191 @@
+import errno
+import hashlib
+import logging
+import os
+import posixpath
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+from flask import Request, abort, current_app, request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+logger = logging.getLogger(__name__)
+
+SNIFF_SIZE = 12  # bytes needed to recognize every format below
+TMP_PREFIX = ".upload-"
+
+# extension: format its content must have. No SVG, it can carry scripts.
+EXTENSION_FORMATS = {
+    "jpg": "jpeg",
+    "jpe": "jpeg",
+    "jpeg": "jpeg",
+    "png": "png",
+    "gif": "gif",
+    "bmp": "bmp",
+    "webp": "webp",
+}
+IMAGE_EXTENSIONS = tuple(EXTENSION_FORMATS)
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Image format of a file starting with `head`, None if it isn't an image."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head.startswith(b"BM"):
+        return "bmp"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def sweep_stale_uploads(folder: str, max_age: float) -> int:
+    """Remove uploads a crashed worker left in `folder`, those older than `max_age` seconds.
+
+    Younger ones may still be being received by another worker.
+    """
+    if not os.path.isdir(folder):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(folder):
+        if not entry.name.startswith(TMP_PREFIX):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # completed or swept by another worker meanwhile
+    if removed:
+        logger.info("Removed %d stale uploads from %s", removed, folder)
+    return removed
+
+
+class UploadFile:
+    """Temp file an uploaded file is streamed into while the request body is parsed.
+
+    It lives in UPLOAD_TMP_DIR, which nothing serves. On the upload
+    destination's filesystem, saving the upload is a rename.
+    The size limit and the format are checked as the chunks arrive, a bad
+    upload aborts the request without reading the rest of it. The sha256 of
+    the content is computed on the way.
+    """
+
+    def __init__(self, directory: str, max_size: int, filename: Optional[str] = None):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.name = tempfile.mkstemp(prefix=TMP_PREFIX, dir=directory)
+        self._file = os.fdopen(fd, "w+b")
+        self.max_size = max_size
+        ext = os.path.splitext(filename or "")[1][1:].lower()
+        self.expected_format = EXTENSION_FORMATS.get(ext)
+        self.format = None
+        self.size = 0
+        self._head = b""
+        self._digest = hashlib.sha256()
+        self._moved = False
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.max_size and self.size > self.max_size:
+            self.close()
+            raise RequestEntityTooLarge(f"Files may be at most {self.max_size} bytes.")
+        if self.format is None:
+            self._head += data[: SNIFF_SIZE - len(self._head)]
+            if len(self._head) >= SNIFF_SIZE:
+                self._check_format()
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        # the parser rewinds the file once it's complete, a file shorter than
+        # SNIFF_SIZE is checked then
+        if self.format is None:
+            self._check_format()
+        return self._file.seek(offset, whence)
+
+    def _check_format(self) -> None:
+        self.format = sniff(self._head)
+        if self.format is None or (
+            self.expected_format is not None and self.format != self.expected_format
+        ):
+            self.close()
+            raise UnsupportedMediaType("Not a valid image.")
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+    def move(self, target: str) -> None:
+        """Atomically put the upload at `target`, replacing any file there."""
+        self._file.close()
+        os.chmod(self.name, 0o644)  # mkstemp creates it readable by its owner only
+        try:
+            os.replace(self.name, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # UPLOAD_TMP_DIR is on another filesystem, copy next to the target first
+            partial = f"{target}{TMP_PREFIX}{os.getpid()}"
+            shutil.copyfile(self.name, partial)
+            os.chmod(partial, 0o644)
+            os.replace(partial, target)
+            os.remove(self.name)
+        self._moved = True
+
+    def close(self) -> None:
+        self._file.close()
+        if not self._moved:
+            self._moved = True
+            try:
+                os.remove(self.name)
+            except FileNotFoundError:
+                pass
+
+
+class UploadRequest(Request):
+    """Streams uploaded files into UploadFiles instead of memory or /tmp.
+
+    Werkzeug closes the files when the request ends, which removes every
+    upload that wasn't saved.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadFile(
+            current_app.config["UPLOAD_TMP_DIR"],
+            current_app.config["UPLOAD_MAX_SIZE"],
+            filename,
+        )
+
+
+def init_uploads(app) -> None:
+    """Receive uploads with UploadRequest and keep the upload destination out of /static.
+
+    Images are only served by the views that check who may see them, even
+    when UPLOADED_IMAGES_DEST is inside the static folder.
+    """
+    app.request_class = UploadRequest
+    sweep_stale_uploads(app.config["UPLOAD_TMP_DIR"], app.config["UPLOAD_TMP_MAX_AGE"])
+    if not app.static_folder:
+        return
+    images = os.path.relpath(os.path.abspath(app.config["UPLOADED_IMAGES_DEST"]), app.static_folder)
+    if images == os.pardir or images.startswith(os.pardir + os.sep):
+        return
+    prefix = "" if images == os.curdir else images.replace(os.sep, "/") + "/"
+
+    @app.before_request
+    def hide_uploaded_images():
+        if request.endpoint == "static":
+            filename = posixpath.normpath(request.view_args.get("filename", ""))
+            if filename.startswith(prefix):
+                abort(404)
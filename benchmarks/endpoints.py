@@ -0,0 +1,512 @@
+"""Throughput, latency and SQL statement counts of every API endpoint.
+
+Builds the app with manage.create_app("benchmark") on a freshly seeded SQLite
+database and drives each route registered by api.routes.initialize_routes
+through Flask's test client from concurrent threads. Reads and writes are
+mixed by --write-ratio, and every scenario prepares its own fixtures (posts
+to delete, fresh tokens to log out, ...) outside the timed request.
+
+Results are printed and saved as JSON. Pass an earlier result as --baseline to
+compare: the run fails when an endpoint's p95 got slower than --tolerance
+allows or it runs more SQL statements than before. List endpoints also carry
+a fixed statement budget, so a per-row query fails the run without a baseline.
+
+    python -m benchmarks.endpoints --concurrency 8 --duration 30
+    python -m benchmarks.endpoints --output benchmarks/results/baseline.json
+    python -m benchmarks.endpoints --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import base64
+import glob
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from flask_jwt_extended import create_access_token
+from flask_restful import Resource
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from manage import create_app
+from api.config.config import benchmark_dir
+from api.models.comment import Comment
+from api.models.confirmation import Confirmation
+from api.models.post import Post
+from api.models.user import User
+from api.utils.cache import cache
+from api.utils import image_helper
+from api.utils.database import db
+from api.utils.metrics import metrics
+from api.utils.password import hasher
+from api.utils.search import search
+from api.utils.seed import SEED_PASSWORD, WORDS, seed_database
+
+# 1x1 transparent PNG
+IMAGE = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+_statements = threading.local()
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    _statements.count = getattr(_statements, "count", 0) + 1
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    json: Optional[dict] = None
+    data: Optional[dict] = None
+    token: Optional[str] = None
+
+
+class Scenario(NamedTuple):
+    endpoint: str  # "<METHOD> <rule>" exactly as registered
+    kind: str  # "read" or "write"
+    weight: int
+    prepare: Callable[["Context", random.Random], Request]
+    statement_budget: Optional[int] = None  # most statements one request may run
+
+
+class Sample(NamedTuple):
+    endpoint: str
+    seconds: float
+    status: Optional[int]
+    statements: int
+    error: Optional[str]
+
+
+class Context:
+    """The seeded dataset and fixtures scenarios draw their requests from."""
+
+    def __init__(self, app, dataset: Counter):
+        self.app = app
+        self.dataset = dataset
+        self._unique = itertools.count(1)
+        with app.app_context():
+            self.usernames = [name for (name,) in db.session.query(User.username).order_by(User.id)]
+            self.password_hash = hasher.hash(SEED_PASSWORD)
+        self.writer_id, self.writer = self.add_user("bench-writer")
+        self.admin_id, self.admin = self.add_user("bench-admin", is_admin=True)
+        self.pending_id, _ = self.add_user("bench-pending", confirmed=False)
+        self.writer_token = self.token(self.writer)
+        self.admin_token = self.token(self.admin)
+        self.writer_posts = [self.add_post() for _ in range(20)]
+        self.writer_comments = [self.add_comment(post_id) for post_id in self.writer_posts]
+
+        images = app.config["UPLOADED_IMAGES_DEST"]
+        self.writer_images = os.path.join(images, self.writer)
+        os.makedirs(self.writer_images, exist_ok=True)
+        os.makedirs(os.path.join(images, "avatars"), exist_ok=True)
+        self.add_image(os.path.join(self.writer_images, "bench.png"))
+        avatar = os.path.join(images, "avatars", f"user_{self.writer}.png")
+        self.add_image(avatar)
+        with app.app_context():
+            self.avatar_hash = image_helper.content_hash(avatar)
+            User.set_avatar(self.writer, os.path.basename(avatar), self.avatar_hash)
+            db.session.commit()
+
+    def unique(self) -> int:
+        return next(self._unique)
+
+    def token(self, username: str) -> str:
+        with self.app.app_context():
+            return create_access_token(identity=username)
+
+    def insert(self, table, **values):
+        with self.app.app_context():
+            result = db.session.execute(table.insert(), values)
+            db.session.commit()
+            return result.inserted_primary_key[0]
+
+    def add_user(self, username: str, is_admin: bool = False, confirmed: bool = True):
+        user_id = self.insert(
+            User.__table__,
+            username=username,
+            email=f"{username}@example.com",
+            password_hash=self.password_hash,
+            is_admin=is_admin,
+        )
+        self.add_confirmation(user_id, confirmed)
+        return user_id, username
+
+    def add_confirmation(self, user_id: int, confirmed: bool = False) -> str:
+        with self.app.app_context():
+            confirmation = Confirmation(user_id)
+            confirmation.confirmed = confirmed
+            confirmation.add_to_session()
+            db.session.commit()
+            return confirmation.id
+
+    def add_post(self) -> int:
+        return self.insert(Post.__table__, title="Bench", body="Benchmark post.", user_id=self.writer_id)
+
+    def add_comment(self, post_id: int) -> int:
+        return self.insert(Comment.__table__, body="Benchmark comment.", user_id=self.writer_id, post_id=post_id)
+
+    @staticmethod
+    def add_image(path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(IMAGE)
+
+    def user_id(self, rng: random.Random) -> int:
+        return rng.randint(1, self.dataset["users"])
+
+    def username(self, rng: random.Random) -> str:
+        return rng.choice(self.usernames)
+
+    def post_id(self, rng: random.Random) -> int:
+        return rng.randint(1, self.dataset["posts"])
+
+    def tag_id(self, rng: random.Random) -> int:
+        return rng.randint(1, self.dataset["tags"])
+
+    def comment_id(self, rng: random.Random) -> int:
+        return rng.randint(1, self.dataset["comments"])
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choices(WORDS, k=count))
+
+
+def _post(rng: random.Random) -> dict:
+    return {"title": _words(rng, 4), "body": _words(rng, 60), "tags": rng.sample(WORDS, 2)}
+
+
+def _image(ctx: Context, rng: random.Random) -> dict:
+    return {"image": (io.BytesIO(IMAGE), f"bench-{ctx.unique()}.png")}
+
+
+def _post_list(ctx: Context, rng: random.Random) -> Request:
+    if rng.random() < 0.25:
+        return Request("GET", f"/posts?tags={','.join(rng.sample(WORDS, 2))}")
+    return Request("GET", f"/posts?page={rng.randint(1, 5)}")
+
+
+def _delete_image(ctx: Context, rng: random.Random) -> Request:
+    filename = f"delete-{ctx.unique()}.png"
+    ctx.add_image(os.path.join(ctx.writer_images, filename))
+    return Request("DELETE", f"/image/{filename}", token=ctx.writer_token)
+
+
+def _delete_user(ctx: Context, rng: random.Random) -> Request:
+    user_id, _ = ctx.add_user(f"bench-delete-{ctx.unique()}")
+    return Request("DELETE", f"/users/{user_id}")
+
+
+def _confirm(ctx: Context, rng: random.Random) -> Request:
+    user_id, _ = ctx.add_user(f"bench-confirm-{ctx.unique()}", confirmed=False)
+    return Request("GET", f"/user_confirm/{ctx.add_confirmation(user_id)}")
+
+
+def _register(ctx: Context, rng: random.Random) -> Request:
+    name = f"bench-register-{ctx.unique()}"
+    body = {"username": name, "email": f"{name}@example.com", "password": SEED_PASSWORD}
+    return Request("POST", "/register", json=body)
+
+
+SCENARIOS = [
+    # reads
+    Scenario("GET /posts", "read", 20, _post_list, statement_budget=6),
+    Scenario("GET /posts/<int:_id>", "read", 20, lambda c, r: Request("GET", f"/posts/{c.post_id(r)}")),
+    Scenario("GET /posts/search", "read", 5, lambda c, r: Request("GET", f"/posts/search?q={_words(r, 2).replace(' ', '+')}"), statement_budget=6),
+    Scenario("GET /<string:username>/posts", "read", 5, lambda c, r: Request("GET", f"/{c.username(r)}/posts"), statement_budget=8),
+    Scenario("GET /tags", "read", 3, lambda c, r: Request("GET", "/tags"), statement_budget=4),
+    Scenario("GET /tags/<int:_id>", "read", 3, lambda c, r: Request("GET", f"/tags/{c.tag_id(r)}")),
+    Scenario("GET /tags/<int:_id>/posts", "read", 5, lambda c, r: Request("GET", f"/tags/{c.tag_id(r)}/posts"), statement_budget=6),
+    Scenario("GET /users", "read", 3, lambda c, r: Request("GET", "/users", token=c.writer_token), statement_budget=5),
+    Scenario("GET /users/<int:_id>", "read", 5, lambda c, r: Request("GET", f"/users/{c.user_id(r)}"), statement_budget=4),
+    Scenario("GET /comments", "read", 5, lambda c, r: Request("GET", f"/comments?page={r.randint(1, 5)}"), statement_budget=4),
+    Scenario("GET /posts/<int:post_id>/comments", "read", 3, lambda c, r: Request("GET", f"/posts/{c.post_id(r)}/comments?cursor="), statement_budget=3),
+    Scenario("GET /comments/<int:comment_id>", "read", 5, lambda c, r: Request("GET", f"/comments/{c.comment_id(r)}")),
+    Scenario("GET /confirmation/user/<int:user_id>", "read", 1, lambda c, r: Request("GET", f"/confirmation/user/{c.user_id(r)}")),
+    Scenario("GET /image/<string:filename>", "read", 2, lambda c, r: Request("GET", "/image/bench.png", token=c.writer_token)),
+    Scenario("GET /avatar/<string:username>", "read", 2, lambda c, r: Request("GET", f"/avatar/{c.writer}")),
+    Scenario("GET /avatar/<string:username>/<string:version>", "read", 2, lambda c, r: Request("GET", f"/avatar/{c.writer}/{c.avatar_hash}")),
+    Scenario("GET /cache/stats", "read", 1, lambda c, r: Request("GET", "/cache/stats", token=c.admin_token)),
+    Scenario("GET /export/<string:kind>", "read", 1, lambda c, r: Request("GET", f"/export/{r.choice(['posts', 'comments', 'users'])}?since=2023-06-01", token=c.admin_token)),
+    Scenario("GET /metrics", "read", 1, lambda c, r: Request("GET", "/metrics"), statement_budget=0),
+    # writes
+    Scenario("POST /register", "write", 1, _register),
+    Scenario("POST /login", "write", 2, lambda c, r: Request("POST", "/login", json={"username": c.writer, "password": SEED_PASSWORD})),
+    Scenario("POST /logout", "write", 1, lambda c, r: Request("POST", "/logout", token=c.token(c.writer))),
+    Scenario("PUT /users/<int:_id>", "write", 1, lambda c, r: Request("PUT", f"/users/{c.user_id(r)}", json={"bio": _words(r, 20)})),
+    Scenario("DELETE /users/<int:_id>", "write", 1, _delete_user),
+    Scenario("POST /upload/image", "write", 1, lambda c, r: Request("POST", "/upload/image", data=_image(c, r), token=c.writer_token)),
+    Scenario("DELETE /image/<string:filename>", "write", 1, _delete_image),
+    Scenario("PUT /upload/avatar", "write", 1, lambda c, r: Request("PUT", "/upload/avatar", data=_image(c, r), token=c.writer_token)),
+    Scenario("POST /posts", "write", 5, lambda c, r: Request("POST", "/posts", json=_post(r), token=c.writer_token)),
+    Scenario("POST /posts/bulk", "write", 1, lambda c, r: Request("POST", "/posts/bulk", json={"posts": [_post(r) for _ in range(10)]}, token=c.writer_token)),
+    Scenario("PATCH /posts/<int:_id>", "write", 2, lambda c, r: Request("PATCH", f"/posts/{r.choice(c.writer_posts)}", json={"body": _words(r, 60)})),
+    Scenario("PUT /posts/<int:_id>", "write", 2, lambda c, r: Request("PUT", f"/posts/{r.choice(c.writer_posts)}", json={"title": _words(r, 4)}, token=c.writer_token)),
+    Scenario("DELETE /posts/<int:_id>", "write", 1, lambda c, r: Request("DELETE", f"/posts/{c.add_post()}", token=c.writer_token)),
+    Scenario("POST /posts/<int:post_id>/comment", "write", 5, lambda c, r: Request("POST", f"/posts/{c.post_id(r)}/comment", json={"body": _words(r, 20)}, token=c.writer_token)),
+    Scenario("PUT /comments/<int:comment_id>", "write", 2, lambda c, r: Request("PUT", f"/comments/{r.choice(c.writer_comments)}", json={"body": _words(r, 20)}, token=c.writer_token)),
+    Scenario("DELETE /comments/<int:comment_id>", "write", 1, lambda c, r: Request("DELETE", f"/comments/{c.add_comment(r.choice(c.writer_posts))}", token=c.writer_token)),
+    Scenario("POST /tags", "write", 1, lambda c, r: Request("POST", "/tags", json={"name": f"bench-{c.unique()}"})),
+    Scenario("GET /user_confirm/<string:confirmation_id>", "write", 1, _confirm),
+    Scenario("POST /confirmation/user/<int:user_id>", "write", 1, lambda c, r: Request("POST", f"/confirmation/user/{c.pending_id}")),
+    Scenario("DELETE /cache/stats", "write", 1, lambda c, r: Request("DELETE", "/cache/stats", token=c.admin_token)),
+]
+
+
+def check_coverage(app, scenarios: List[Scenario]) -> None:
+    """Refuse to run while a registered API route has no scenario."""
+    registered = set()
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions[rule.endpoint]
+        if not issubclass(getattr(view, "view_class", object), Resource):
+            continue
+        for method in rule.methods - {"HEAD", "OPTIONS"}:
+            registered.add(f"{method} {rule.rule}")
+    missing = registered - {scenario.endpoint for scenario in scenarios}
+    if missing:
+        raise SystemExit("No benchmark scenario for: " + ", ".join(sorted(missing)))
+
+
+def build_app(cache_backend: str):
+    os.makedirs(benchmark_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(benchmark_dir, "*.sqlite*")):
+        os.remove(path)
+    shutil.rmtree(os.path.join(benchmark_dir, "images"), ignore_errors=True)
+    app = create_app("benchmark")
+    metrics.reset()
+    if cache_backend != app.config["RESPONSE_CACHE_BACKEND"]:
+        app.config["RESPONSE_CACHE_BACKEND"] = cache_backend
+        cache.init_app(app)
+    return app
+
+
+def seed(app, args) -> Counter:
+    with app.app_context():
+        db.session.execute(text("PRAGMA journal_mode=WAL"))
+        db.create_all()
+        dataset = seed_database(
+            args.users, args.tags, args.posts, args.comments, seed=args.seed, workers=args.seed_workers
+        )
+        Post.reconcile_comments_count()
+        search.rebuild()
+    return dataset
+
+
+def run_one(client, ctx: Context, scenario: Scenario, rng: random.Random) -> Sample:
+    request = scenario.prepare(ctx, rng)
+    headers = {"Authorization": f"Bearer {request.token}"} if request.token else {}
+    _statements.count = 0
+    started = time.perf_counter()
+    try:
+        response = client.open(
+            request.path,
+            method=request.method,
+            json=request.json,
+            data=request.data,
+            headers=headers,
+            buffered=True,  # streamed bodies are produced inside the timed call
+        )
+        status, error = response.status_code, None
+        if status >= 400:
+            error = response.get_data(as_text=True)[:200]
+    except Exception as exc:  # the app propagates exceptions in this config
+        status, error = None, repr(exc)
+    return Sample(scenario.endpoint, time.perf_counter() - started, status, _statements.count, error)
+
+
+def run(app, ctx: Context, scenarios: List[Scenario], args) -> Tuple[List[Sample], float]:
+    reads = [s for s in scenarios if s.kind == "read"]
+    writes = [s for s in scenarios if s.kind == "write"]
+    samples: List[Sample] = []
+    issued = itertools.count()
+    deadline = time.perf_counter() + args.duration
+
+    def pick(rng: random.Random) -> Scenario:
+        pool = writes if writes and (not reads or rng.random() < args.write_ratio) else reads
+        return rng.choices(pool, weights=[s.weight for s in pool])[0]
+
+    def worker(index: int) -> None:
+        rng = random.Random(f"{args.seed}:worker:{index}")
+        client = app.test_client()
+        local = []
+        while time.perf_counter() < deadline:
+            if args.requests and next(issued) >= args.requests:
+                break
+            local.append(run_one(client, ctx, pick(rng), rng))
+        samples.extend(local)
+
+    if args.warmup:
+        client, rng = app.test_client(), random.Random(args.seed)
+        for scenario in scenarios:
+            run_one(client, ctx, scenario, rng)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, dict]:
+    groups = defaultdict(list)
+    for sample in samples:
+        groups[sample.endpoint].append(sample)
+    endpoints = {}
+    for endpoint, group in sorted(groups.items()):
+        times = sorted(s.seconds * 1000 for s in group)
+        statements = [s.statements for s in group]
+        errors = [s for s in group if s.error]
+        endpoints[endpoint] = {
+            "requests": len(group),
+            "errors": len(errors),
+            "statuses": dict(Counter(str(s.status) for s in group)),
+            "throughput": round(len(group) / elapsed, 2),
+            "mean_ms": round(statistics.mean(times), 3),
+            "p50_ms": round(_percentile(times, 0.50), 3),
+            "p95_ms": round(_percentile(times, 0.95), 3),
+            "p99_ms": round(_percentile(times, 0.99), 3),
+            "statements_mean": round(statistics.mean(statements), 2),
+            "statements_max": max(statements),
+        }
+        if errors:
+            endpoints[endpoint]["first_error"] = errors[0].error
+    return endpoints
+
+
+def check_budgets(endpoints: Dict[str, dict], scenarios: List[Scenario]) -> List[str]:
+    problems = []
+    for scenario in scenarios:
+        result = endpoints.get(scenario.endpoint)
+        if result and scenario.statement_budget is not None:
+            if result["statements_max"] > scenario.statement_budget:
+                problems.append(
+                    f"{scenario.endpoint}: {result['statements_max']} SQL statements, "
+                    f"budget is {scenario.statement_budget}"
+                )
+    return problems
+
+
+def compare(endpoints: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    problems = []
+    print(f"\n{'vs baseline':<46} {'p95 ms':>22} {'throughput':>22} {'SQL max':>10}")
+    for endpoint, after in endpoints.items():
+        before = baseline.get(endpoint)
+        if before is None:
+            continue
+        p95 = after["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps = after["throughput"] / before["throughput"] - 1 if before["throughput"] else 0.0
+        print(
+            f"{endpoint:<46} {before['p95_ms']:>9.2f} ->{after['p95_ms']:>9.2f} "
+            f"{before['throughput']:>9.1f} ->{after['throughput']:>9.1f} "
+            f"{before['statements_max']:>4} ->{after['statements_max']:>3}  {p95:+.0%}"
+        )
+        if p95 > tolerance:
+            problems.append(f"{endpoint}: p95 {before['p95_ms']} -> {after['p95_ms']} ms ({p95:+.0%})")
+        if after["statements_max"] > before["statements_max"]:
+            problems.append(
+                f"{endpoint}: {before['statements_max']} -> {after['statements_max']} SQL statements"
+            )
+    return problems
+
+
+def report(endpoints: Dict[str, dict]) -> None:
+    print(
+        f"{'endpoint':<46} {'reqs':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'SQL':>5} {'max':>4} {'errors':>6}"
+    )
+    for endpoint, r in endpoints.items():
+        print(
+            f"{endpoint:<46} {r['requests']:>6} {r['throughput']:>8.1f} {r['p50_ms']:>8.2f} "
+            f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['statements_mean']:>5.1f} "
+            f"{r['statements_max']:>4} {r['errors']:>6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tags", type=int, default=30)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seed-workers", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=4, help="Client threads.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run.")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests.")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="Share of write requests.")
+    parser.add_argument("--endpoints", default="", help="Only endpoints matching this regex.")
+    parser.add_argument("--cache", default="null", choices=("null", "local", "sqlite"))
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--output", help="Where to save the JSON results.")
+    parser.add_argument("--baseline", help="Earlier results to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown.")
+    args = parser.parse_args()
+
+    app = build_app(args.cache)
+    check_coverage(app, SCENARIOS)
+    scenarios = [s for s in SCENARIOS if re.search(args.endpoints, s.endpoint)]
+    if not scenarios:
+        raise SystemExit(f"No endpoint matches {args.endpoints!r}")
+    dataset = seed(app, args)
+    ctx = Context(app, dataset)
+
+    event.listen(Engine, "before_cursor_execute", _count_statement)
+    try:
+        samples, elapsed = run(app, ctx, scenarios, args)
+    finally:
+        event.remove(Engine, "before_cursor_execute", _count_statement)
+        hasher.shutdown()
+
+    endpoints = summarize(samples, elapsed)
+    report(endpoints)
+    results = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "dataset": dict(dataset),
+            "args": vars(args),
+        },
+        "total": {
+            "requests": len(samples),
+            "errors": sum(r["errors"] for r in endpoints.values()),
+            "seconds": round(elapsed, 3),
+            "throughput": round(len(samples) / elapsed, 2),
+        },
+        "endpoints": endpoints,
+    }
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", time.strftime("endpoints-%Y%m%d-%H%M%S.json")
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n{results['total']['requests']} requests, {results['total']['throughput']} req/s, saved to {output}")
+
+    problems = check_budgets(endpoints, scenarios)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems += compare(endpoints, json.load(f)["endpoints"], args.tolerance)
+    if problems:
+        print("\nRegressions:\n  " + "\n  ".join(problems))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Login throughput with and without the password hashing pool.
+
+Runs a burst of password verifications from request-like threads while a
+"cheap GET" thread keeps timing a small unit of work, once with hashing
+inline and once on the process pool.
+
+    python -m benchmarks.password_pool --threads 16 --logins 400
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.utils.password import PasswordHasher, PasswordPoolBusy
+
+METHOD = "pbkdf2:sha256:260000"
+
+
+def _cheap_request_latencies(stop: threading.Event, latencies: list) -> None:
+    payload = {"posts": [{"id": i, "title": "title"} for i in range(50)]}
+    while not stop.is_set():
+        started = time.perf_counter()
+        json.dumps(payload)
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.001)
+
+
+def run(workers: int, threads: int, logins: int, max_queue: int) -> dict:
+    hasher = PasswordHasher()
+    hasher.configure(METHOD, workers=workers, max_queue=max_queue)
+    password_hash = hasher.hash("p@assw0rd")
+    rejected = 0
+
+    def login(_):
+        nonlocal rejected
+        try:
+            hasher.verify(password_hash, "p@assw0rd")
+        except PasswordPoolBusy:
+            rejected += 1
+
+    latencies = []
+    stop = threading.Event()
+    probe = threading.Thread(target=_cheap_request_latencies, args=(stop, latencies))
+    probe.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    probe.join()
+    hasher.shutdown()
+
+    latencies.sort()
+    return {
+        "mode": "pool" if workers else "inline",
+        "logins_per_sec": round((logins - rejected) / elapsed, 1),
+        "rejected_503": rejected,
+        "cheap_p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "cheap_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-queue", type=int, default=1000)
+    args = parser.parse_args()
+
+    for workers in (0, args.workers):
+        print(json.dumps(run(workers, args.threads, args.logins, args.max_queue)))
+
+
+if __name__ == "__main__":
+    main()
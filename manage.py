@@ -1,11 +1,19 @@
 from flask import Flask
 from flask_restful import Api
-from flask_uploads import patch_request_class, configure_uploads
+from flask_uploads import configure_uploads
 
 from api.config.config import config
 from api.utils.database import db, ma
+from api.utils.cache import cache
+from api.utils.codec import codec
+from api.utils.metrics import metrics
+from api.utils.thumbnails import thumbnails
+from api.utils.password import hasher
 from api.utils.image_helper import IMAGE_SET
+from api.utils.uploads import init_uploads
 from api.auth import jwt
+from api.auth.blacklist import blacklist
+from api.auth.identity import identity_cache
 
 from api.routes import initialize_routes
 
@@ -14,12 +22,19 @@ def create_app(config_name):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
-    patch_request_class(app, 10 * 1024 * 1024)  # 10MB max image size upload
+    init_uploads(app)
     configure_uploads(app, IMAGE_SET)
 
     db.init_app(app)
     ma.init_app(app)
     jwt.init_app(app)
+    blacklist.init_app(app)
+    identity_cache.init_app(app)
+    cache.init_app(app)
+    codec.init_app(app)
+    hasher.init_app(app)
+    metrics.init_app(app)
+    thumbnails.init_app(app)
     api = Api(app)
 
     initialize_routes(api)
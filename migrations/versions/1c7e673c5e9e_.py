@@ -0,0 +1,40 @@
+"""add stored comments_count to posts
+
+Revision ID: 1c7e673c5e9e
+Revises: 846af9d0f2fd
+Create Date: 2026-10-18 09:12:40.512331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c7e673c5e9e'
+down_revision = '846af9d0f2fd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill the counter from the existing confirmed comments, sa.true() is 1 or
+    # true depending on the dialect
+    posts = sa.table('posts', sa.column('id'), sa.column('comments_count'))
+    comments = sa.table(
+        'comments', sa.column('id'), sa.column('post_id'), sa.column('confirmed', sa.Boolean)
+    )
+    confirmed_count = (
+        sa.select([sa.func.count(comments.c.id)])
+        .where(comments.c.post_id == posts.c.id)
+        .where(comments.c.confirmed == sa.true())
+        .as_scalar()
+    )
+    op.execute(posts.update().values(comments_count=confirmed_count))
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('comments_count')
@@ -0,0 +1,43 @@
+"""record avatar content hash on users
+
+Revision ID: 3e5f0c2a9d41
+Revises: 612e760b1b86
+Create Date: 2026-10-18 18:02:11.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from api.utils.image_helper import is_avatar_name
+
+
+# revision identifiers, used by Alembic.
+revision = '3e5f0c2a9d41'
+down_revision = '612e760b1b86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('avatar_hash', sa.String(length=64), nullable=True))
+
+    # avatar used to be writable through PUT /users/<id>, so it may hold any
+    # string, e.g. an absolute path. Avatars are now served from this column,
+    # keep only the file names AvatarUpload writes.
+    users = sa.table('users', sa.column('id'), sa.column('username'), sa.column('avatar'))
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select([users.c.id, users.c.username, users.c.avatar]).where(users.c.avatar.isnot(None))
+    ).fetchall()
+    invalid = [row.id for row in rows if not is_avatar_name(row.avatar, row.username)]
+    for start in range(0, len(invalid), 500):
+        conn.execute(
+            users.update().where(users.c.id.in_(invalid[start:start + 500])).values(avatar=None)
+        )
+    # avatars already on disk are recorded by `flask index-avatars`
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('avatar_hash')
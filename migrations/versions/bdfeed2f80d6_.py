@@ -0,0 +1,28 @@
+"""add updated_at to posts
+
+Revision ID: bdfeed2f80d6
+Revises: c94c68b6ec63
+Create Date: 2026-10-18 11:26:52.730914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bdfeed2f80d6'
+down_revision = 'c94c68b6ec63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE posts SET updated_at = timestamp")
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
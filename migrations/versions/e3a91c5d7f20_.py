@@ -0,0 +1,35 @@
+"""add updated_at to comments and users
+
+Revision ID: e3a91c5d7f20
+Revises: b84e1f3c7d92
+Create Date: 2026-10-18 22:41:07.215804
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a91c5d7f20'
+down_revision = 'b84e1f3c7d92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE comments SET updated_at = timestamp")
+    op.execute("UPDATE users SET updated_at = timestamp")
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
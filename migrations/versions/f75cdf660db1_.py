@@ -0,0 +1,44 @@
+"""add full-text search index for posts
+
+Revision ID: f75cdf660db1
+Revises: 1b20a22853b3
+Create Date: 2026-10-18 15:02:44.906127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f75cdf660db1'
+down_revision = '1b20a22853b3'
+branch_labels = None
+depends_on = None
+
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(posts.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(posts.body, '')), 'B')"
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts "
+            "USING fts5(title, body, tokenize='porter unicode61')"
+        )
+        op.execute(
+            "INSERT INTO posts_fts (rowid, title, body) "
+            "SELECT id, coalesce(title, ''), coalesce(body, '') FROM posts"
+        )
+    elif dialect == 'postgresql':
+        op.execute(f"CREATE INDEX ix_posts_fts ON posts USING gin (({POSTGRES_DOCUMENT}))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS posts_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_posts_fts")
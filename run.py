@@ -1,4 +1,5 @@
 import os
+import click
 from flask_migrate import Migrate
 from marshmallow import ValidationError
 
@@ -6,8 +7,6 @@ from manage import create_app
 from api.utils.database import db
 from api.utils.responses import response_with
 from api.utils import responses as resp
-from api.auth.blacklist import BLACKLIST
-from api.auth import jwt
 
 app = create_app(os.getenv('FLASK_ENV') or 'default')
 migrate = Migrate(app=app, db=db)
@@ -17,11 +16,139 @@ from api.models.user import User
 from api.models.post import Post
 from api.models.tag import Tag
 from api.models.confirmation import Confirmation
+from api.models.outbox import OutboxEmail
+from api.utils.outbox import drain_outbox, run_outbox_worker
+from api.utils.fake_mail import FakeMailServer
+from api.auth.fake_resp import FakeRespServer
+from api.utils.export import EXPORTS, export_ndjson, parse_since
+from api.utils.metrics import metrics
+from api.utils.search import search
+from api.utils import image_helper
+from api.utils.seed import seed_database, SEED_PASSWORD
+from api.utils.sweeper import run_confirmation_sweeper, sweep_confirmations
 
 
 @app.shell_context_processor
 def shell_context():
-    return dict(db=db, Comment=Comment,  User=User, Post=Post, Tag=Tag,  Confirmation=Confirmation)
+    return dict(db=db, Comment=Comment,  User=User, Post=Post, Tag=Tag,  Confirmation=Confirmation, OutboxEmail=OutboxEmail)
+
+
+@app.cli.command("reconcile-comments-count")
+@click.option("--batch-size", default=1000, help="Posts updated per transaction.")
+def reconcile_comments_count(batch_size):
+    """Rebuild the stored confirmed comment counters of all posts."""
+    updated = Post.reconcile_comments_count(batch_size=batch_size)
+    click.echo(f"Fixed the comment counters of {updated} posts.")
+
+
+@app.cli.command("reindex-posts")
+def reindex_posts():
+    """Rebuild the full-text search index from the posts table."""
+    search.rebuild()
+    click.echo("Search index rebuilt.")
+
+
+@app.cli.command("seed")
+@click.option("--users", default=1000)
+@click.option("--tags", default=50)
+@click.option("--posts", default=10000)
+@click.option("--comments", default=50000)
+@click.option("--seed", "seed_", default=0, help="Same seed, same data.")
+@click.option("--max-tags", default=5, help="Most tags per post.")
+@click.option("--chunk-size", default=5000, help="Rows generated and inserted per batch.")
+@click.option("--workers", default=0, help="Processes generating rows, 0 to generate inline.")
+def seed(users, tags, posts, comments, seed_, max_tags, chunk_size, workers):
+    """Fill the database with a synthetic dataset for load testing."""
+
+    def progress(stage, counts):
+        click.echo(f"\r{stage}: {counts[stage]}", nl=False)
+
+    counts = seed_database(
+        users, tags, posts, comments,
+        seed=seed_, max_tags=max_tags, chunk_size=chunk_size, workers=workers, progress=progress,
+    )
+    click.echo()
+    click.echo(", ".join(f"{count} {table}" for table, count in counts.items()))
+    click.echo("Rebuilding comment counters and the search index...")
+    Post.reconcile_comments_count()
+    search.rebuild()
+    click.echo(f"Done, every user's password is {SEED_PASSWORD!r}.")
+
+
+@app.cli.command("reset-metrics")
+def reset_metrics():
+    """Remove the metrics files of previous worker processes."""
+    click.echo(f"Removed {metrics.reset()} metrics files.")
+
+
+@app.cli.command("export")
+@click.argument("kind", type=click.Choice(sorted(EXPORTS)))
+@click.option("--since", help="Only rows created or changed from this ISO 8601 time on.")
+@click.option("--gzip", "compress", is_flag=True)
+@click.option("--output", type=click.File("wb"), default="-")
+def export(kind, since, compress, output):
+    """Write a table as newline-delimited JSON."""
+    try:
+        since = parse_since(since) if since else None
+    except ValueError:
+        raise click.BadParameter("not an ISO 8601 timestamp", param_hint="--since")
+    for chunk in export_ndjson(kind, since, app.config["EXPORT_BATCH_SIZE"], compress):
+        output.write(chunk)
+
+
+@app.cli.command("index-avatars")
+def index_avatars():
+    """Record avatars already on disk in the users table."""
+    indexed = 0
+    for username, avatar in image_helper.scan_avatars():
+        if not image_helper.is_avatar_name(avatar, username):
+            continue
+        path = image_helper.get_path(avatar, folder="avatars")
+        User.set_avatar(username, avatar, image_helper.content_hash(path))
+        indexed += 1
+    db.session.commit()
+    click.echo(f"Indexed {indexed} avatars.")
+
+
+@app.cli.command("send-emails")
+@click.option("--once", is_flag=True, help="Send one batch and exit.")
+@click.option("--interval", default=5.0, help="Seconds to sleep while the outbox is empty.")
+def send_emails(once, interval):
+    """Drain the email outbox."""
+    if once:
+        click.echo(drain_outbox())
+    else:
+        run_outbox_worker(interval)
+
+
+@app.cli.command("sweep-confirmations")
+@click.option("--once", is_flag=True, help="Sweep once and exit.")
+@click.option("--interval", type=float, help="Seconds between sweeps, CONFIRMATION_SWEEP_INTERVAL by default.")
+def sweep_confirmations_command(once, interval):
+    """Delete expired and superseded unconfirmed confirmations."""
+    if once:
+        deleted = sweep_confirmations()
+        click.echo(f"Deleted {deleted['superseded']} superseded and {deleted['expired']} expired confirmations.")
+    else:
+        run_confirmation_sweeper(interval or app.config["CONFIRMATION_SWEEP_INTERVAL"])
+
+
+@app.cli.command("fake-mail-server")
+@click.option("--port", default=8025)
+def fake_mail_server(port):
+    """Run a local stand-in for the Mailgun API, set MAILGUN_API_URL to its address."""
+    server = FakeMailServer(port=port)
+    click.echo(f"Fake Mailgun API listening on {server.url}")
+    server.serve_forever()
+
+
+@app.cli.command("fake-redis-server")
+@click.option("--port", default=6379)
+def fake_redis_server(port):
+    """Run a local stand-in for Redis, set JWT_REVOCATION_REDIS_URL to its address."""
+    server = FakeRespServer(port=port)
+    click.echo(f"Fake Redis listening on {server.url}")
+    server.serve_forever()
 
 
 @app.errorhandler(ValidationError)
@@ -29,11 +156,6 @@ def marshmallow_validation_error_handler(err):
     return response_with(resp.INVALID_INPUT_422, message=err.messages)
 
 
-@jwt.token_in_blacklist_loader
-def check_if_token_in_blacklist(decrypted_token):
-    return decrypted_token["jti"] in BLACKLIST
-
-
 @app.errorhandler(400)
 def bad_request(e):
     # TODO: learn python logging module
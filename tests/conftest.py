@@ -0,0 +1,87 @@
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from manage import create_app
+from api.config.config import test_dir
+from api.models.comment import Comment
+from api.models.post import Post
+from api.models.tag import Tag
+from api.models.user import User
+from api.utils.database import db
+
+
+@pytest.fixture
+def app():
+    shutil.rmtree(test_dir, ignore_errors=True)
+    app = create_app("Testing")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+@pytest.fixture
+def statements(app):
+    """Counts the SQL statements run while the test runs, reset it with `.count = 0`."""
+    counter = StatementCounter()
+    event.listen(db.engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(db.engine, "before_cursor_execute", counter)
+
+
+def make_user(username: str = "writer", **kwargs) -> User:
+    user = User(username=username, email=f"{username}@example.com", **kwargs)
+    user.password_hash = "unused"
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def auth_headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(identity=user.username)}"}
+
+
+def make_posts(author: User, count: int, tags: int = 3, comments: int = 2):
+    """`count` posts with `tags` tags and `comments` confirmed comments each, oldest first."""
+    all_tags = [Tag(name=f"tag{i}") for i in range(tags)]
+    started = datetime(2024, 1, 1)
+    posts = []
+    for i in range(count):
+        post = Post(
+            title=f"Post {i}",
+            body=f"Body of post {i}",
+            author=author,
+            timestamp=started + timedelta(minutes=i),
+            comments_count=comments,
+        )
+        post.tags = all_tags
+        for j in range(comments):
+            post.comments.append(
+                Comment(
+                    body=f"Comment {j}",
+                    user_id=author.id,
+                    timestamp=started + timedelta(minutes=i, seconds=j),
+                )
+            )
+        posts.append(post)
+    db.session.add_all(posts)
+    db.session.commit()
+    return posts
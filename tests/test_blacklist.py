@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from api.auth.blacklist import TokenBlacklist
+from api.auth.fake_resp import FakeRespServer
+
+
+@pytest.fixture
+def resp_server():
+    with FakeRespServer() as server:
+        yield server
+
+
+def _blacklist(app, **config) -> TokenBlacklist:
+    """A worker's blacklist, on the test app's store unless `config` says otherwise."""
+    app.config.update(config)
+    blacklist = TokenBlacklist()
+    blacklist.init_app(app)
+    return blacklist
+
+
+class Clock:
+    """Moves the stores' notion of now, for the server too when there is one."""
+
+    def __init__(self, monkeypatch, server=None):
+        self.offset = 0
+        monkeypatch.setattr("api.auth.blacklist.time", lambda: time.time() + self.offset)
+        if server is not None:
+            server.clock = lambda: time.time() + self.offset
+
+    def advance(self, seconds: float) -> None:
+        self.offset += seconds
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend(request, app, monkeypatch):
+    """(config of the store, its clock) for each backend."""
+    config = {"JWT_REVOCATION_BACKEND": request.param}
+    server = None
+    if request.param == "redis":
+        server = request.getfixturevalue("resp_server")
+        config.update(JWT_REVOCATION_REDIS_URL=server.url, JWT_REVOCATION_SYNC_INTERVAL=0)
+    return config, Clock(monkeypatch, server)
+
+
+@pytest.fixture
+def workers(app, backend):
+    """Two workers' blacklists sharing one store."""
+    config, _ = backend
+    return _blacklist(app, **config), _blacklist(app, **config)
+
+
+def test_a_token_revoked_on_one_worker_is_revoked_on_the_others(workers):
+    first, second = workers
+    assert not second.is_revoked("other")  # builds its filter before the revocation
+
+    first.revoke("jti", int(time.time()) + 60)
+
+    assert first.is_revoked("jti")
+    assert second.is_revoked("jti")
+    assert not second.is_revoked("other")
+
+
+def test_revocations_expire_with_the_token(workers, backend):
+    first, second = workers
+    _, clock = backend
+    first.revoke("jti", int(time.time()) + 30)
+    assert second.is_revoked("jti")
+
+    clock.advance(31)
+
+    assert not second.store.contains("jti")
+    assert not second.is_revoked("jti")
+
+
+def test_tokens_the_filter_never_saw_skip_the_store(workers, monkeypatch):
+    first, _ = workers
+    first.revoke("jti", int(time.time()) + 60)
+
+    def contains(jti):
+        raise AssertionError(f"store queried for {jti}")
+
+    monkeypatch.setattr(first.store, "contains", contains)
+    assert not any(first.is_revoked(f"never-{i}") for i in range(1000))
+
+
+def test_redis_filter_hits_skip_the_network(app, resp_server):
+    blacklist = _blacklist(
+        app,
+        JWT_REVOCATION_BACKEND="redis",
+        JWT_REVOCATION_REDIS_URL=resp_server.url,
+        JWT_REVOCATION_SYNC_INTERVAL=60,
+    )
+    blacklist.revoke("jti", int(time.time()) + 30)
+    assert blacklist.is_revoked("jti")
+
+    resp_server.commands.clear()
+    assert not blacklist.is_revoked("never")
+    assert resp_server.commands == []  # no sync due, the filter answered alone
@@ -0,0 +1,38 @@
+import pytest
+
+from api.utils.cache import CacheStats, SQLiteBackend, cache
+from tests.conftest import auth_headers, make_posts, make_user
+
+
+@pytest.fixture
+def shared_cache(app):
+    app.config["RESPONSE_CACHE_BACKEND"] = "sqlite"
+    cache.init_app(app)
+    yield cache
+    cache.clear()
+
+
+def test_a_write_evicts_the_cached_get_for_every_worker(app, client, shared_cache):
+    author = make_user()
+    (post,) = make_posts(author, 1)
+    # another worker's view of the same cache
+    other_worker = SQLiteBackend(app.config["RESPONSE_CACHE_PATH"], 1024, CacheStats())
+
+    assert client.get(f"/posts/{post.id}").status_code == 200
+    hits = shared_cache.stats.hits
+    cached = client.get(f"/posts/{post.id}")
+    assert shared_cache.stats.hits == hits + 1
+    key = f"view:/posts/{post.id}?:identity"
+    assert other_worker.get(key) is not None
+
+    response = client.put(
+        f"/posts/{post.id}",
+        json={"title": "Edited", "body": post.body, "tags": []},
+        headers=auth_headers(author),
+    )
+    assert response.status_code == 200
+
+    assert other_worker.get(key) is None
+    fresh = client.get(f"/posts/{post.id}")
+    assert fresh.get_json()["post"]["title"] == "Edited"
+    assert fresh.headers["ETag"] != cached.headers["ETag"]
@@ -0,0 +1,14 @@
+import pytest
+
+from api.utils.codec import codec
+
+
+@pytest.mark.parametrize("as_ascii, encoded", [(True, b"\\u00e9"), (False, "é".encode())])
+def test_json_as_ascii_is_honoured_by_every_backend(app, as_ascii, encoded):
+    app.config["JSON_AS_ASCII"] = as_ascii
+    for backend in ("json", "auto"):
+        app.config["JSON_BACKEND"] = backend
+        codec.init_app(app)
+        with app.test_request_context():
+            body = codec.jsonify({"name": "é"}, 200, {}).get_data()
+        assert encoded in body, backend
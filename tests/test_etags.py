@@ -0,0 +1,37 @@
+from api.models.comment import Comment
+from api.utils.database import db
+from tests.conftest import make_posts, make_user
+
+
+def test_comment_etag_follows_its_version(client):
+    (post,) = make_posts(make_user(), 1, comments=1)
+    comment_id = post.comments[0].id
+
+    first = client.get(f"/comments/{comment_id}")
+    assert first.status_code == 200
+    assert first.headers["Last-Modified"]
+    etag = {"If-None-Match": first.headers["ETag"]}
+    assert client.get(f"/comments/{comment_id}", headers=etag).status_code == 304
+
+    Comment.query.get(comment_id).body = "Edited"
+    db.session.commit()
+
+    second = client.get(f"/comments/{comment_id}", headers=etag)
+    assert second.status_code == 200
+    assert second.get_json()["comment"]["body"] == "Edited"
+
+
+def test_user_etag_changes_with_embedded_posts(client):
+    author = make_user()
+
+    first = client.get(f"/users/{author.id}")
+    assert first.status_code == 200
+    assert "Last-Modified" not in first.headers
+    etag = {"If-None-Match": first.headers["ETag"]}
+    assert client.get(f"/users/{author.id}", headers=etag).status_code == 304
+
+    make_posts(author, 1)
+
+    second = client.get(f"/users/{author.id}", headers=etag)
+    assert second.status_code == 200
+    assert len(second.get_json()["user"]["posts"]) == 1
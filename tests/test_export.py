@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from api.models.comment import Comment
+from api.models.user import User
+from api.utils.database import db
+from api.utils.export import export_rows
+from tests.conftest import make_posts, make_user
+
+
+def test_edited_comments_and_users_are_exported_since(app):
+    before = datetime(2024, 6, 1)
+    author = make_user(timestamp=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1))
+    make_posts(author, 1, tags=0, comments=2)
+    Comment.query.update({Comment.updated_at: datetime(2024, 1, 1)}, synchronize_session=False)
+    db.session.commit()
+    assert list(export_rows("comments", since=before)) == []
+    assert list(export_rows("users", since=before)) == []
+
+    edited = Comment.query.order_by(Comment.id).first()
+    edited.body = "Edited"
+    User.query.get(author.id).bio = "Edited"
+    db.session.commit()
+
+    assert [row["id"] for row in export_rows("comments", since=before)] == [edited.id]
+    assert [row["id"] for row in export_rows("users", since=before)] == [author.id]
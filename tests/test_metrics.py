@@ -0,0 +1,27 @@
+import re
+import time
+
+from api.resources import posts as post_resources
+from api.utils.metrics import metrics
+from tests.conftest import make_posts, make_user
+
+
+def _serialize_ms(response) -> float:
+    return float(re.search(r"serialize;dur=([\d.]+)", response.headers["Server-Timing"]).group(1))
+
+
+def test_hand_written_dumps_count_as_serialization(client, monkeypatch):
+    make_posts(make_user(), 3)
+    dump = post_resources.dump_post_summaries
+
+    def slow_dump(*args, **kwargs):
+        time.sleep(0.02)
+        return dump(*args, **kwargs)
+
+    monkeypatch.setattr(post_resources, "dump_post_summaries", slow_dump)
+    monkeypatch.setattr(metrics, "server_timing", True)
+
+    response = client.get("/posts")
+
+    assert response.status_code == 200
+    assert _serialize_ms(response) >= 20
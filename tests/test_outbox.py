@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.models.confirmation import Confirmation
+from api.models.outbox import FAILED, PENDING, SENT, OutboxEmail
+from api.utils.database import db
+from api.utils.email import Mailgun
+from api.utils.fake_mail import FakeMailServer
+from api.utils.outbox import drain_outbox
+
+
+@pytest.fixture
+def mail_server(monkeypatch):
+    with FakeMailServer() as server:
+        monkeypatch.setattr(Mailgun, "MAILGUN_API_URL", server.url)
+        monkeypatch.setattr(Mailgun, "MAILGUN_DOMAIN", "example.com")
+        monkeypatch.setattr(Mailgun, "MAILGUN_API_KEY", "key")
+        yield server
+
+
+def _register(client) -> OutboxEmail:
+    response = client.post(
+        "/register",
+        json={"username": "reader", "email": "reader@example.com", "password": "secret"},
+    )
+    assert response.status_code == 201
+    (email,) = OutboxEmail.query.all()
+    assert email.status == PENDING
+    return email
+
+
+def test_registration_email_is_delivered_by_the_outbox(client, mail_server):
+    email = _register(client)
+
+    assert drain_outbox() == {"sent": 1, "retried": 0, "failed": 0}
+
+    assert email.status == SENT
+    (message,) = mail_server.messages
+    assert message["to"] == ["reader@example.com"]
+    (confirmation,) = Confirmation.query.all()
+    assert f"/user_confirm/{confirmation.id}" in message["text"][0]
+    assert drain_outbox() == {"sent": 0, "retried": 0, "failed": 0}
+
+
+def test_failed_sends_are_retried_with_backoff(app, client, mail_server):
+    app.config["EMAIL_OUTBOX_MAX_ATTEMPTS"] = 3
+    mail_server.fail_first = 3
+    email = _register(client)
+
+    backoff = app.config["EMAIL_OUTBOX_BACKOFF"]
+    for attempt in (1, 2):
+        before = datetime.utcnow()
+        assert drain_outbox() == {"sent": 0, "retried": 1, "failed": 0}
+        assert (email.status, email.attempts) == (PENDING, attempt)
+        assert email.last_error
+        delay = timedelta(seconds=backoff * 2 ** (attempt - 1))
+        assert before + delay <= email.next_attempt_at <= datetime.utcnow() + delay
+
+        # not due until the backoff has passed
+        assert drain_outbox() == {"sent": 0, "retried": 0, "failed": 0}
+        email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+    assert drain_outbox() == {"sent": 0, "retried": 0, "failed": 1}
+    assert (email.status, email.attempts) == (FAILED, 3)
+    assert mail_server.messages == []
+
+
+def test_a_retried_email_is_sent_once_the_provider_recovers(client, mail_server):
+    mail_server.fail_first = 1
+    email = _register(client)
+
+    assert drain_outbox()["retried"] == 1
+    email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    assert drain_outbox() == {"sent": 1, "retried": 0, "failed": 0}
+    assert (email.status, email.attempts, email.last_error) == (SENT, 1, None)
+    assert len(mail_server.messages) == 1
@@ -0,0 +1,37 @@
+import pytest
+
+from api.utils.pagination import encode_cursor
+from tests.conftest import make_posts, make_user
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [{"a": 1}, 1],
+        ["2024-01-01T00:00:00", [1]],
+        ["2024-01-01T00:00:00", "1"],
+        ["2024-01-01T00:00:00", True],
+        ["2024-01-01T00:00:00", 1.5],
+        [1, 1],
+        [None, 1],
+        ["not a date", 1],
+        ["2024-01-01T00:00:00"],
+    ],
+)
+def test_cursors_with_values_of_the_wrong_type_are_rejected(client, values):
+    response = client.get(f"/posts?cursor={encode_cursor(values)}")
+    assert response.status_code == 400
+
+
+def test_cursor_from_a_page_continues_the_listing(app, client):
+    app.config["POSTS_PER_PAGE"] = 2
+    make_posts(make_user(), 3)
+
+    first = client.get("/posts?cursor=").get_json()
+    second = client.get(first["pagination"]["next"]).get_json()
+
+    assert [post["title"] for post in first["posts"] + second["posts"]] == [
+        "Post 2",
+        "Post 1",
+        "Post 0",
+    ]
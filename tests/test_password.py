@@ -0,0 +1,56 @@
+import pytest
+
+from api.utils.password import hasher
+from api.utils.processes import SharedSlots
+from tests.conftest import make_user
+
+
+@pytest.fixture
+def pool(app):
+    """The hasher on a pool of one with no queue, shared with other workers through LOCK_DIR."""
+    hasher.configure(
+        app.config["PASSWORD_HASH_METHOD"], workers=1, max_queue=0, lock_dir=app.config["LOCK_DIR"]
+    )
+    yield SharedSlots(app.config["LOCK_DIR"], "password", 1)
+    hasher.shutdown()
+
+
+def test_register_answers_503_while_another_worker_fills_the_pool(client, pool):
+    held = pool.acquire()  # what a request on another worker would hold
+    assert held is not None
+    try:
+        response = client.post(
+            "/register",
+            json={"username": "reader", "email": "reader@example.com", "password": "secret"},
+        )
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        held.release()
+
+    response = client.post(
+        "/register",
+        json={"username": "reader", "email": "reader@example.com", "password": "secret"},
+    )
+    assert response.status_code == 201
+
+
+def test_login_answers_503_while_the_pool_is_full(client, pool):
+    make_user("reader")
+    held = pool.acquire()
+    try:
+        response = client.post("/login", json={"username": "reader", "password": "secret"})
+        assert response.status_code == 503
+    finally:
+        held.release()
+
+
+def test_slots_are_shared_between_holders(tmp_path):
+    first = SharedSlots(str(tmp_path), "jobs", 2)
+    second = SharedSlots(str(tmp_path), "jobs", 2)
+
+    held = [first.acquire(), second.acquire()]
+    assert sorted(slot.index for slot in held) == [0, 1]
+    assert first.acquire() is None
+    held[0].release()
+    assert second.acquire().index == held[0].index
@@ -0,0 +1,78 @@
+import pytest
+
+from api.models.post import Post
+from api.models.tag import Tag
+from api.utils.database import db
+from tests.conftest import auth_headers, make_posts, make_user
+
+
+@pytest.mark.parametrize("query", ["", "?cursor="])
+def test_post_list_statements_do_not_grow_with_page_size(app, client, statements, query):
+    make_posts(make_user(), 30)
+
+    counts = {}
+    for per_page in (2, 10, 25):
+        app.config["POSTS_PER_PAGE"] = per_page
+        statements.count = 0
+        response = client.get(f"/posts{query}")
+        assert response.status_code == 200
+        assert len(response.get_json()["posts"]) == per_page
+        counts[per_page] = statements.count
+
+    assert len(set(counts.values())) == 1, counts
+
+
+def test_renaming_the_author_changes_the_post_etag(client):
+    author = make_user()
+    (post,) = make_posts(author, 1)
+
+    first = client.get(f"/posts/{post.id}")
+    assert first.status_code == 200
+    response = client.put(f"/users/{author.id}", json={"username": "renamed"})
+    assert response.status_code == 200
+
+    second = client.get(f"/posts/{post.id}", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.get_json()["post"]["author"]["username"] == "renamed"
+
+
+@pytest.mark.parametrize("method", ["patch", "put"])
+def test_updating_a_post_reuses_existing_tags(client, method):
+    author = make_user()
+    first, second = make_posts(author, 2, tags=2)
+
+    response = getattr(client, method)(
+        f"/posts/{second.id}",
+        json={"title": "Edited", "body": "Edited body", "tags": ["tag1", "new"]},
+        headers=auth_headers(author),
+    )
+
+    assert response.status_code == 200
+    assert sorted(response.get_json()["post"]["tags"]) == ["new", "tag1"]
+    assert Tag.query.count() == 3
+    assert sorted(tag.name for tag in first.tags) == ["tag0", "tag1"]
+
+
+def test_only_the_author_may_patch_a_post(client):
+    (post,) = make_posts(make_user(), 1)
+    other = make_user("other")
+
+    assert client.patch(f"/posts/{post.id}", json={"title": "Mine"}).status_code == 401
+    response = client.patch(
+        f"/posts/{post.id}", json={"title": "Mine"}, headers=auth_headers(other)
+    )
+    assert response.status_code == 403
+
+
+def test_reconcile_only_touches_wrong_counters(app):
+    right, wrong = make_posts(make_user(), 2, comments=2)
+    wrong.comments_count = 5
+    db.session.commit()
+    versions = {post.id: post.updated_at for post in (right, wrong)}
+
+    assert Post.reconcile_comments_count() == 1
+
+    db.session.expire_all()
+    assert (right.comments_count, wrong.comments_count) == (2, 2)
+    assert right.updated_at == versions[right.id]
+    assert Post.reconcile_comments_count() == 0
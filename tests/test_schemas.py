@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from api.models.comment import CommentSchema, dump_comments
+from api.models.post import Post, PostSchema, dump_post_summaries
+from tests.conftest import make_posts, make_user
+
+
+def _json(value) -> str:
+    return json.dumps(value, sort_keys=True)
+
+
+@pytest.mark.parametrize(
+    "comments, exclude",
+    [
+        (False, ["user_id", "body", "comments", "comments_next"]),
+        (True, ["user_id", "body"]),
+    ],
+)
+def test_post_summaries_match_post_schema(app, comments, exclude):
+    app.config["POST_EMBEDDED_COMMENTS"] = 2
+    make_posts(make_user(), 3, comments=3)
+    make_posts(make_user("other"), 1, tags=0, comments=0)
+
+    with app.test_request_context():
+        posts = Post.find_all_eager().order_by(Post.id).all()
+        Post.prefetch_confirmed_comments(posts)
+        expected = PostSchema(many=True, exclude=exclude).dump(posts)
+        assert _json(dump_post_summaries(posts, comments=comments)) == _json(expected)
+
+
+def test_dump_comments_matches_comment_schema(app):
+    (post,) = make_posts(make_user(), 1, comments=3)
+    comments = post.comments.all()
+    comments[0].timestamp = None
+
+    assert _json(dump_comments(comments)) == _json(CommentSchema(many=True).dump(comments))
@@ -0,0 +1,24 @@
+from api.utils.database import db
+from api.utils.search import MATCH_END, MATCH_START, highlight, search
+from tests.conftest import make_posts, make_user
+
+
+def test_highlights_escape_the_post_text(client):
+    (post,) = make_posts(make_user(), 1)
+    post.title = '<img src=x onerror="alert(1)"> hello'
+    post.body = "say hello to <script>alert(1)</script>"
+    search.index_posts([post])
+    db.session.commit()
+
+    response = client.get("/posts/search?q=hello")
+    assert response.status_code == 200
+    (result,) = response.get_json()["posts"]
+    title, body = result["highlight"]["title"], result["highlight"]["body"]
+    assert "<img" not in title and "&lt;img" in title
+    assert "<script>" not in body and "&lt;script&gt;" in body
+    assert "<mark>hello</mark>" in title and "<mark>hello</mark>" in body
+
+
+def test_only_the_markers_become_markup():
+    snippet = f'a <b>"{MATCH_START}c{MATCH_END}"</b>'
+    assert highlight(snippet) == "a &lt;b&gt;&quot;<mark>c</mark>&quot;&lt;/b&gt;"
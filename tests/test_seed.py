@@ -0,0 +1,12 @@
+from api.models.confirmation import Confirmation
+from api.models.user import User
+from api.utils.seed import seed_database
+
+
+def test_seeding_twice_with_the_same_seed_appends(app):
+    first = seed_database(users=20, tags=5, posts=10, comments=10, seed=0, chunk_size=7)
+    second = seed_database(users=20, tags=5, posts=10, comments=10, seed=0, chunk_size=7)
+
+    assert first == second
+    assert User.query.count() == 40
+    assert Confirmation.query.count() == 2 * first["confirmations"]
@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+from api.models.confirmation import Confirmation
+from api.utils.database import db
+from api.utils.metrics import Registry, metrics
+from api.utils.sweeper import sweep_confirmations
+from tests.conftest import make_user
+
+
+def _exited_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_last_sweep_is_exported_after_the_sweeper_exits(app, monkeypatch):
+    user = make_user()
+    expired = Confirmation(user.id)
+    expired.expire_at = 0
+    db.session.add(expired)
+    db.session.commit()
+
+    assert sweep_confirmations() == {"superseded": 0, "expired": 1}
+
+    # hand the file over to a process that has exited, like `sweep-confirmations --once`
+    path = os.path.join(metrics.directory, f"{os.getpid()}.json")
+    with open(path) as f:
+        snapshot = json.load(f)
+    os.remove(path)
+    snapshot["pid"] = _exited_pid()
+    with open(os.path.join(metrics.directory, f"{snapshot['pid']}.json"), "w") as f:
+        json.dump(snapshot, f)
+    monkeypatch.setattr(metrics, "_registry", Registry())
+
+    rendered = metrics.render()
+    assert 'confirmation_sweep_last_deleted_rows{reason="expired"} 1\n' in rendered
+    assert 'confirmation_sweep_last_deleted_rows{reason="superseded"} 0\n' in rendered
+    assert "confirmation_sweep_last_run_timestamp_seconds " in rendered
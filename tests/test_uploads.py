@@ -0,0 +1,54 @@
+import os
+import time
+
+import pytest
+from werkzeug.exceptions import UnsupportedMediaType
+
+from api.utils.uploads import UploadFile, init_uploads, sweep_stale_uploads
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 8
+
+
+def test_uploads_are_received_outside_the_destination(tmp_path):
+    incoming, destination = tmp_path / "incoming", tmp_path / "images"
+    destination.mkdir()
+    upload = UploadFile(str(incoming), 1024, "avatar.png")
+    upload.write(PNG)
+
+    assert os.path.dirname(upload.name) == str(incoming)
+    assert os.listdir(destination) == []
+    upload.move(str(destination / "avatar.png"))
+    assert os.listdir(destination) == ["avatar.png"]
+    assert os.listdir(incoming) == []
+
+
+@pytest.mark.parametrize("filename", ["image.svg", "image.png", None])
+def test_markup_is_not_an_image(tmp_path, filename):
+    upload = UploadFile(str(tmp_path), 1024, filename)
+    with pytest.raises(UnsupportedMediaType):
+        upload.write(b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>')
+    assert os.listdir(tmp_path) == []
+
+
+def test_only_stale_uploads_are_swept(tmp_path):
+    stale = UploadFile(str(tmp_path), 1024)
+    fresh = UploadFile(str(tmp_path), 1024)
+    old = time.time() - 7200
+    os.utime(stale.name, (old, old))
+
+    assert sweep_stale_uploads(str(tmp_path), 3600) == 1
+    assert os.listdir(tmp_path) == [os.path.basename(fresh.name)]
+    fresh.close()
+    assert sweep_stale_uploads(str(tmp_path / "missing"), 3600) == 0
+
+
+def test_uploaded_images_are_not_served_as_static_files(app, client):
+    # the images inside the static folder, like with the default config
+    app.static_folder = os.path.dirname(app.config["UPLOADED_IMAGES_DEST"])
+    init_uploads(app)
+    os.makedirs(app.config["UPLOADED_IMAGES_DEST"], exist_ok=True)
+    with open(os.path.join(app.config["UPLOADED_IMAGES_DEST"], "secret.png"), "wb") as f:
+        f.write(PNG)
+
+    assert client.get("/static/images/secret.png").status_code == 404
+    assert client.get("/static/css/../images/secret.png").status_code == 404